@@ -0,0 +1,113 @@
+"""
+Cold and warm start cost of the permissions / admin role bootstrap.
+
+Empties the bootstrap tables (permission groups, permissions, accesses, roles,
+users, bootstrap_state) of a scratch database. It then runs each implementation
+twice: once on the empty tables (first deploy) and once right after (every later
+boot and every --reload). For each run it reports statements, commits and
+seconds. "legacy" is the previous create_permissions_lifespan +
+create_role_lifespan: a SELECT per group and per permission, and a SELECT, an
+INSERT and a commit per missing access. "bulk" is utils.bootstrap.bootstrap in
+one transaction.
+
+Never point it at a production database: it truncates users and roles.
+
+Usage:
+    alembic -x db_url=postgresql://.../finance_bench upgrade head
+    python -m benchmarks.bootstrap --db-url postgresql://.../finance_bench
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from core.config import settings
+from dal.dao import PermissionGroupDAO, PermissionDAO, RoleDAO, AccessDAO, UserDAO
+from utils.bootstrap import bootstrap
+from utils.permissions import permission_groups
+from utils.utils import Hasher
+
+
+TABLES = "bootstrap_state, permission_groups, permissions, accesses, roles, users"
+
+
+async def legacy_bootstrap(session):
+    # Previous startup code, without the comments
+    for key, value in permission_groups.items():
+        permission_group = await PermissionGroupDAO.get_by_attributes(session=session, filters={"name": key}, first=True)
+        if permission_group:
+            permission_group_id = permission_group.id
+        else:
+            permission_group = await PermissionGroupDAO.add(session=session, **{"name": key})
+            permission_group_id = permission_group.id
+        for name, action in value.items():
+            permission = await PermissionDAO.get_by_attributes(session=session, filters={"group_id": permission_group_id, "name": name}, first=True)
+            if permission is None:
+                await PermissionDAO.add(session=session, **{"name": name, "action": action, "group_id": permission_group_id})
+        session.commit()
+
+    role = await RoleDAO.get_by_attributes(session=session, filters={"name": settings.admin_role, "description": 'Superuser'}, first=True)
+    if not role:
+        role = await RoleDAO.add(session=session, **{"name": settings.admin_role, "description": 'Superuser'})
+    if role is not None:
+        role_permissions = [access.permission.action for access in role.accesses] if role.accesses is not None else []
+        for key, value in permission_groups.items():
+            for name, action in value.items():
+                if action not in role_permissions:
+                    permission = await PermissionDAO.get_by_attributes(session=session, filters={"action": action}, first=True)
+                    if permission is not None:
+                        await AccessDAO.add(session=session, **{"permission_id": permission.id, "role_id": role.id})
+                        session.commit()
+        await UserDAO.add(
+            session=session,
+            **{"username": settings.admin_role, "password": Hasher.get_password_hash(settings.admin_password), "role_id": role.id}
+        )
+        session.commit()
+
+
+async def bulk_bootstrap(session):
+    await bootstrap(session=session)
+    session.commit()
+
+
+def measure(engine, implementation):
+    statements, commits = [], []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "commit", on_commit)
+    try:
+        with sessionmaker(engine, expire_on_commit=False)() as session:
+            started = time.perf_counter()
+            asyncio.run(implementation(session))
+            elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(engine, "commit", on_commit)
+    return len(statements), len(commits), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="scratch database, already migrated")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    print(f"{'bootstrap':<10} {'start':<6} {'statements':>11} {'commits':>8} {'seconds':>8}")
+    for name, implementation in [("legacy", legacy_bootstrap), ("bulk", bulk_bootstrap)]:
+        with engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE TABLE {TABLES} RESTART IDENTITY CASCADE"))
+        for start in ("cold", "warm"):
+            statements, commits, elapsed = measure(engine, implementation)
+            print(f"{name:<10} {start:<6} {statements:>11} {commits:>8} {elapsed:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Latency of fast endpoints while slow endpoints run on the same worker.
+
+Runs an in-process FastAPI app (one event loop, like a single uvicorn worker)
+with two endpoints built on the same session helpers the routers use:
+
+    /fast  ->  SELECT 1
+    /slow  ->  SELECT pg_sleep(:slow)
+
+and sends requests at a fixed arrival rate with the sync (psycopg2) and the
+async (asyncpg) session. Latency is measured from the scheduled arrival time, so
+time spent waiting for a blocked event loop is included. With the sync session
+every slow query blocks the loop and p99 of /fast grows towards the slow query
+time; with the async session it stays close to p50.
+
+Usage:
+    python -m benchmarks.concurrency --requests 400 --rate 200 --slow-ratio 0.1 --slow 0.5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from core.config import settings
+from core.session import execute, session_maker
+
+
+def build_app(get_session, slow: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/fast")
+    async def fast(db=Depends(get_session)):
+        return (await execute(db, text("SELECT 1"))).scalar()
+
+    @app.get("/slow")
+    async def slow_endpoint(db=Depends(get_session)):
+        await execute(db, text("SELECT pg_sleep(:slow)"), {"slow": slow})
+        return 1
+
+    return app
+
+
+def sync_dependency():
+    async def get_session():
+        with session_maker() as session:
+            yield session
+
+    return get_session, None
+
+
+def async_dependency(pool_size: int):
+    url = settings.ASYNC_DB_URL or make_url(settings.DB_URL).set(drivername="postgresql+asyncpg")
+    engine = create_async_engine(url, pool_size=pool_size, max_overflow=0)
+    maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def get_session():
+        async with maker() as session:
+            yield session
+
+    return get_session, engine
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(mode: str, args) -> dict:
+    if mode == "sync":
+        get_session, engine = sync_dependency()
+    else:
+        get_session, engine = async_dependency(pool_size=args.pool_size)
+
+    app = build_app(get_session, args.slow)
+    every = max(1, round(1 / args.slow_ratio)) if args.slow_ratio > 0 else 0
+    paths = ["/slow" if every and i % every == 0 else "/fast" for i in range(args.requests)]
+    latencies = {"/fast": [], "/slow": []}
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        started = time.perf_counter()
+
+        async def call(index, path):
+            arrival = started + index / args.rate
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies[path].append((time.perf_counter() - arrival) * 1000)
+
+        await asyncio.gather(*(call(index, path) for index, path in enumerate(paths)))
+        duration = time.perf_counter() - started
+
+    if engine is not None:
+        await engine.dispose()
+
+    fast = latencies["/fast"]
+    return {
+        "mode": mode,
+        "rps": len(paths) / duration,
+        "fast_p50": statistics.median(fast),
+        "fast_p95": percentile(fast, 95),
+        "fast_p99": percentile(fast, 99),
+        "slow_count": len(latencies["/slow"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=200, help="request arrivals per second")
+    parser.add_argument("--pool-size", type=int, default=20, help="async engine pool size")
+    parser.add_argument("--slow-ratio", type=float, default=0.1)
+    parser.add_argument("--slow", type=float, default=0.5, help="seconds slept by /slow")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    print(f"{'mode':<6} {'req/s':>8} {'fast p50 ms':>12} {'fast p95 ms':>12} {'fast p99 ms':>12} {'slow':>6}")
+    for mode in modes:
+        row = asyncio.run(run(mode, args))
+        print(
+            f"{row['mode']:<6} {row['rps']:>8.1f} {row['fast_p50']:>12.1f} "
+            f"{row['fast_p95']:>12.1f} {row['fast_p99']:>12.1f} {row['slow_count']:>6}"
+        )
+
+
+if __name__ == '__main__':
+    main()
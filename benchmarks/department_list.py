@@ -0,0 +1,147 @@
+"""
+Statements and duration of GET /departments as the number of departments grows.
+
+For each size in --departments it seeds that many departments, each with
+a budget per month of the year (one approved and one pending transaction per
+budget). It then requests the first page (size 50) for a year window with the
+admin scope. "legacy" is the previous handler: it loads every department, calls
+get_department_total_budget once per department and paginates the list in Python.
+"grouped" is routers.departments.get_department_list: one GROUP BY joined to the
+page, with LIMIT/OFFSET in SQL. Every size is rolled back, seed included.
+
+Never point it at a production database.
+
+Usage:
+    alembic -x db_url=postgresql://.../finance_bench upgrade head
+    python -m benchmarks.department_list --db-url postgresql://.../finance_bench --departments 10 100 1000
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+from typing import Optional
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi_pagination import Page, add_pagination, paginate
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from core.session import get_db
+from dal.dao import DepartmentDAO
+from routers.departments import departments_router
+from schemas.departments import Departments
+from utils.permissions import permission_claims
+from utils.scope import RoleScope, role_scope
+from utils.utils import create_access_token
+
+
+SEED_SQL = """
+    WITH d AS (
+        INSERT INTO departments (id, name, is_active, purchasable, over_budget, client_id, created_at)
+        SELECT gen_random_uuid(), 'Bench department ' || i, true, false, false, NULL, now()
+        FROM generate_series(1, :departments) AS i
+        RETURNING id
+    ),
+    b AS (
+        INSERT INTO budgets (id, department_id, start_date, finish_date, created_at)
+        SELECT gen_random_uuid(), d.id, make_date(:year, m, 1), (make_date(:year, m, 1) + interval '1 month - 1 day')::date, now()
+        FROM d, generate_series(1, 12) AS m
+        RETURNING id
+    )
+    INSERT INTO transactions (id, budget_id, status, value, is_income, created_at)
+    SELECT gen_random_uuid(), b.id, s, 1000, true, now()
+    FROM b, unnest(ARRAY[1, 5]) AS s
+"""
+
+
+def build_app(connection) -> FastAPI:
+    def get_session():
+        with Session(bind=connection) as session:
+            yield session
+
+    async def admin_scope():
+        return RoleScope(role_name="Администратор")
+
+    app = FastAPI()
+    app.include_router(departments_router)
+    app.dependency_overrides[get_db] = get_session
+    app.dependency_overrides[role_scope] = admin_scope
+
+    @app.get("/legacy-departments", response_model=Page[Departments])
+    async def legacy(
+            start_date: Optional[date] = None,
+            finish_date: Optional[date] = None,
+            db: Session = Depends(get_session)
+    ):
+        # Previous handler body for the admin role
+        departments = await DepartmentDAO.get_by_attributes(session=db)
+        for department in departments:
+            budget = (
+                await DepartmentDAO.get_department_total_budget(
+                    session=db, department_id=department.id, start_date=start_date, finish_date=finish_date, payment_date=None
+                )
+            )[0]
+            department.total_budget = budget
+        return paginate(departments)
+
+    add_pagination(app)
+    return app
+
+
+async def request(app, path: str, token: str):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        response = await client.get(
+            path, params={"start_date": "2025-01-01", "finish_date": "2025-12-31", "size": 50},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    return response.json(), elapsed
+
+
+def run(engine, departments: int, token: str):
+    rows = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(text(SEED_SQL), {"departments": departments, "year": 2025})
+        connection.execute(text("ANALYZE departments, budgets, transactions"))
+        app = build_app(connection)
+        totals = {}
+        for name, path in [("legacy", "/legacy-departments"), ("grouped", "/departments")]:
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(connection, "before_cursor_execute", before_cursor_execute)
+            try:
+                page, elapsed = asyncio.run(request(app, path, token))
+            finally:
+                event.remove(connection, "before_cursor_execute", before_cursor_execute)
+            totals[name] = {item["id"]: item["total_budget"] for item in page["items"]}
+            rows.append((name, departments, len(statements), elapsed))
+        transaction.rollback()
+    # The pages are ordered differently: compare the departments found on both
+    common = totals["legacy"].keys() & totals["grouped"].keys()
+    assert common and all(totals["legacy"][key] == totals["grouped"][key] for key in common)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="scratch database, already migrated")
+    parser.add_argument("--departments", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    token = create_access_token({"sub": "bench", "user": {"id": "00000000-0000-0000-0000-000000000000", **permission_claims({"Отделы": ["list"]})}})
+    print(f"{'handler':<8} {'departments':>12} {'statements':>11} {'seconds':>8}")
+    for departments in args.departments:
+        for name, count, statements, elapsed in run(engine, departments, token):
+            print(f"{name:<8} {count:>12} {statements:>11} {elapsed:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
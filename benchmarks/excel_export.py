@@ -0,0 +1,181 @@
+"""
+Peak memory and duration of POST /requests/excel.
+
+Seeds a scratch database with requests (with department, expense type, client and
+payment type, like the export joins), then exports every request and a tenth of
+them with the streaming exporter (RequestDAO.get_excel + core.session.stream +
+utils.excel_generator). Each export runs in a fresh process, so its peak RSS is
+its own; with a constant-memory exporter both sizes report about the same peak.
+--legacy also measures the previous implementation (ORM objects, a pandas DataFrame
+and df.to_excel) for comparison; expect it to need gigabytes on 500k rows.
+
+Never point it at a production database: seeding inserts rows.
+
+Usage:
+    alembic -x db_url=postgresql://.../finance_bench upgrade head
+    python -m benchmarks.excel_export --db-url postgresql://.../finance_bench --requests 500000
+    python -m benchmarks.excel_export --db-url postgresql://.../finance_bench --no-seed --legacy
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from dal.dao import RequestDAO
+
+
+SEED_SQL = [
+    """
+    INSERT INTO departments (id, name, is_active, over_budget, purchasable, created_at)
+    SELECT gen_random_uuid(), 'Excel department ' || i, true, false, false, now()
+    FROM generate_series(1, 20) AS i
+    """,
+    """
+    INSERT INTO expense_types (id, name, is_active, purchasable, checkable, created_at)
+    SELECT gen_random_uuid(), 'Excel expense type ' || i, true, false, false, now()
+    FROM generate_series(1, 30) AS i
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO payment_types (id, name, is_active, created_at)
+    VALUES (gen_random_uuid(), 'Excel payment type', true, now())
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO clients (id, tg_id, fullname, phone, is_active, web_user, created_at)
+    SELECT gen_random_uuid(), 900000000 + i, 'Excel client ' || i, '+998900000000', true, false, now()
+    FROM generate_series(1, 2000) AS i
+    ON CONFLICT (tg_id) DO NOTHING
+    """,
+    """
+    WITH d AS (SELECT array_agg(id) AS ids FROM departments WHERE name LIKE 'Excel %'),
+         e AS (SELECT array_agg(id) AS ids FROM expense_types WHERE name LIKE 'Excel %'),
+         c AS (SELECT array_agg(id) AS ids FROM clients WHERE fullname LIKE 'Excel %'),
+         p AS (SELECT id FROM payment_types WHERE name = 'Excel payment type')
+    INSERT INTO requests (
+        id, sum, status, approved, credit, currency, exchange_rate, description, buyer, supplier,
+        department_id, expense_type_id, client_id, payment_type_id, payment_time, created_at
+    )
+    SELECT gen_random_uuid(),
+           (1 + i % 1000) * 10000,
+           i % 7,
+           i % 7 <> 0,
+           i % 11 = 0,
+           CASE WHEN i % 5 = 0 THEN 'Доллар' ELSE 'Сум' END,
+           CASE WHEN i % 5 = 0 THEN 12900 END,
+           'Описание заявки ' || i,
+           'Заказчик ' || i % 300,
+           'Поставщик ' || i % 500,
+           d.ids[1 + i % array_length(d.ids, 1)],
+           e.ids[1 + i % array_length(e.ids, 1)],
+           c.ids[1 + i % array_length(c.ids, 1)],
+           p.id,
+           date_trunc('year', now()) + (i % 365) * interval '1 day' + interval '5 hours',
+           date_trunc('year', now()) + (i % 365) * interval '1 day' - interval '3 days'
+    FROM generate_series(1, :requests) AS i, d, e, c, p
+    """,
+    "ANALYZE",
+]
+
+
+async def streaming_export(session, filters):
+    from core.session import stream
+    from utils.utils import excel_generator
+
+    query = await RequestDAO.get_excel(session=session, filters=filters)
+    return await excel_generator(rows=stream(session, query))
+
+
+async def legacy_export(session, filters):
+    # Previous implementation: every row as a Requests object, then a DataFrame
+    import pandas as pd
+    from utils.utils import approved_data, excel_columns, status_data
+
+    query = await RequestDAO.get_all(session=session, filters=filters)
+    rows = session.execute(query.order_by(RequestDAO.model.number.desc())).unique().scalars().all()
+    columns = {name: [] for name in excel_columns}
+    for row in rows:
+        # Same rows as the inner joins of get_excel
+        if row.client is None or row.payment_type is None:
+            continue
+        values = [
+            row.number, row.acceptance_number, row.created_at.strftime("%d-%m-%Y"), row.department.name,
+            approved_data[row.approved], approved_data[row.credit], row.description, row.expense_type.name,
+            row.client.fullname, row.buyer, row.supplier, row.sum, row.currency,
+            row.exchange_rate if row.exchange_rate is not None else " ",
+            row.sum / row.exchange_rate if row.exchange_rate is not None else row.sum,
+            row.payment_type.name, row.payment_time.strftime("%d-%m-%Y") if row.payment_time else " ",
+            status_data[row.status],
+        ]
+        for name, value in zip(excel_columns, values):
+            columns[name].append(value)
+    file_name = "files/legacy.xlsx"
+    pd.DataFrame(columns).to_excel(file_name, index=False)
+    return file_name
+
+
+def measure(args):
+    # Runs in the child process started by main()
+    engine = create_engine(args.db_url)
+    year_start = date(date.today().year, 1, 1)
+    finish = year_start + timedelta(days=366 if args.fraction == 1 else 37)
+    filters = {"start_date": year_start - timedelta(days=3), "finish_date": finish}
+    export = legacy_export if args.implementation == "legacy" else streaming_export
+
+    started = time.perf_counter()
+    with sessionmaker(engine)() as session:
+        file_name = asyncio.run(export(session, filters))
+    elapsed = time.perf_counter() - started
+    with sessionmaker(engine)() as session:
+        query = asyncio.run(RequestDAO.get_excel(session=session, filters=filters))
+        rows = session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"rows": rows, "seconds": elapsed, "peak_rss_mb": peak_mb, "size_mb": os.path.getsize(file_name) / 2 ** 20}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="scratch database, already migrated")
+    parser.add_argument("--requests", type=int, default=500000)
+    parser.add_argument("--no-seed", action="store_true", help="reuse data seeded by a previous run")
+    parser.add_argument("--legacy", action="store_true", help="also measure the previous pandas exporter")
+    parser.add_argument("--implementation", choices=["streaming", "legacy"], help=argparse.SUPPRESS)
+    parser.add_argument("--fraction", type=int, choices=[1, 10], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.implementation:
+        return measure(args)
+
+    if not args.no_seed:
+        with create_engine(args.db_url).begin() as connection:
+            for statement in SEED_SQL:
+                connection.execute(text(statement), {"requests": args.requests})
+
+    os.makedirs("files", exist_ok=True)
+    implementations = ["streaming", "legacy"] if args.legacy else ["streaming"]
+    print(f"{'exporter':<10} {'rows':>9} {'seconds':>9} {'peak RSS MB':>12} {'xlsx MB':>8}")
+    for implementation in implementations:
+        for fraction in (10, 1):
+            with tempfile.TemporaryFile() as output:
+                subprocess.run(
+                    [sys.executable, "-m", "benchmarks.excel_export", "--db-url", args.db_url,
+                     "--implementation", implementation, "--fraction", str(fraction)],
+                    stdout=output, check=True
+                )
+                output.seek(0)
+                result = json.loads(output.read().splitlines()[-1])
+            print(f"{implementation:<10} {result['rows']:>9} {result['seconds']:>9.1f} "
+                  f"{result['peak_rss_mb']:>12.0f} {result['size_mb']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
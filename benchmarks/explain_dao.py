@@ -0,0 +1,220 @@
+"""
+EXPLAIN ANALYZE of the statements behind the heavy DAO methods.
+
+Seeds a scratch database with volume data (departments, expense types, monthly budgets
+and requests with their transactions and logs), then runs each DAO method below on a
+sync session, records every statement it sends and re-runs it with
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON). For each statement it prints the execution
+time, the top plan node and the indexes the plan used, so the effect of the indexes
+in migrations/versions can be compared before and after `alembic upgrade`.
+
+Never point it at a production database: seeding inserts rows.
+
+Usage:
+    alembic -x db_url=postgresql://.../finance_bench upgrade head
+    python -m benchmarks.explain_dao --db-url postgresql://.../finance_bench --requests 200000
+    python -m benchmarks.explain_dao --db-url postgresql://.../finance_bench --no-seed
+"""
+import argparse
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import sessionmaker
+
+from core.session import execute
+from dal.dao import BudgetDAO, DepartmentDAO, RequestDAO, TransactionDAO
+from models.budgets import Budgets
+
+
+SEED_SQL = [
+    """
+    INSERT INTO departments (id, name, is_active, over_budget, purchasable, created_at)
+    SELECT gen_random_uuid(), 'Bench department ' || i, true, false, false, now()
+    FROM generate_series(1, :departments) AS i
+    """,
+    """
+    INSERT INTO expense_types (id, name, is_active, purchasable, checkable, created_at)
+    SELECT gen_random_uuid(), 'Bench expense type ' || i, true, false, false, now()
+    FROM generate_series(1, :expense_types) AS i
+    ON CONFLICT (name) DO NOTHING
+    """,
+    """
+    INSERT INTO payment_types (id, name, is_active, created_at)
+    VALUES (gen_random_uuid(), 'Bench payment type', true, now())
+    ON CONFLICT (name) DO NOTHING
+    """,
+    # one budget per department, expense type and month of the year
+    """
+    INSERT INTO budgets (id, department_id, expense_type_id, start_date, finish_date, status, created_at)
+    SELECT gen_random_uuid(), d.id, e.id, m::date, (m + interval '1 month - 1 day')::date, 5, now()
+    FROM departments d
+    CROSS JOIN expense_types e
+    CROSS JOIN generate_series(date_trunc('year', now()), date_trunc('year', now()) + interval '11 months', interval '1 month') AS m
+    WHERE d.name LIKE 'Bench %' AND e.name LIKE 'Bench %'
+    """,
+    """
+    INSERT INTO transactions (id, budget_id, status, value, is_income, created_at)
+    SELECT gen_random_uuid(), b.id, 5, 100000000, true, b.start_date
+    FROM budgets b
+    JOIN departments d ON d.id = b.department_id
+    WHERE d.name LIKE 'Bench %'
+    """,
+    """
+    WITH d AS (SELECT array_agg(id) AS ids FROM departments WHERE name LIKE 'Bench %'),
+         e AS (SELECT array_agg(id) AS ids FROM expense_types WHERE name LIKE 'Bench %'),
+         p AS (SELECT id FROM payment_types WHERE name = 'Bench payment type')
+    INSERT INTO requests (
+        id, sum, status, approved, credit, currency, department_id, expense_type_id, payment_type_id,
+        payment_time, created_at
+    )
+    SELECT gen_random_uuid(),
+           (1 + i % 1000) * 10000,
+           (ARRAY[0, 1, 2, 3, 4, 5, 5, 5, 6])[1 + i % 9],
+           i % 7 <> 0,
+           false,
+           'Сум',
+           d.ids[1 + i % array_length(d.ids, 1)],
+           e.ids[1 + (i / 7) % array_length(e.ids, 1)],
+           p.id,
+           date_trunc('year', now()) + (i % 365) * interval '1 day' + interval '5 hours',
+           date_trunc('year', now()) + (i % 365) * interval '1 day' - interval '3 days'
+    FROM generate_series(1, :requests) AS i, d, e, p
+    """,
+    """
+    INSERT INTO transactions (id, request_id, status, value, is_income, created_at)
+    SELECT gen_random_uuid(), r.id, r.status, -r.sum, false, r.created_at
+    FROM requests r
+    LEFT JOIN transactions t ON t.request_id = r.id
+    WHERE t.id IS NULL
+    """,
+    """
+    INSERT INTO logs (id, request_id, status, sum, created_at)
+    SELECT gen_random_uuid(), r.id, s.status, CASE WHEN s.status = 0 THEN r.sum END,
+           CASE WHEN s.status = 0 THEN r.created_at ELSE r.payment_time - (r.number % 3) * interval '1 day' END
+    FROM requests r
+    CROSS JOIN LATERAL (VALUES (0), (r.status)) AS s(status)
+    LEFT JOIN logs l ON l.request_id = r.id
+    WHERE l.id IS NULL
+    """,
+    "ANALYZE",
+]
+
+
+def seed(engine, args):
+    with engine.begin() as connection:
+        for statement in SEED_SQL:
+            connection.execute(
+                text(statement),
+                {"departments": args.departments, "expense_types": args.expense_types, "requests": args.requests}
+            )
+
+
+def dao_calls(budget: Budgets, year: int):
+    start_date, finish_date = date(year, 1, 1), date(year, 12, 31)
+    month_start, month_finish = budget.start_date, budget.finish_date
+    department_id, expense_type_id = budget.department_id, budget.expense_type_id
+
+    async def request_list(session):
+        query = await RequestDAO.get_all(
+            session=session,
+            filters={"department_id": [department_id], "payment_start_date": month_start, "payment_finish_date": month_finish},
+            profile=()
+        )
+        return (await execute(session, query.order_by(RequestDAO.model.number.desc()).limit(50))).scalars().all()
+
+    return [
+        ("RequestDAO.get_all (50 rows)", request_list),
+        ("RequestDAO.get_financier_metrics", lambda s: RequestDAO.get_financier_metrics(
+            session=s, filters={"start_date": start_date, "finish_date": finish_date})),
+        ("DepartmentDAO.get_department_total_budget", lambda s: DepartmentDAO.get_department_total_budget(
+            session=s, department_id=department_id, start_date=start_date, finish_date=finish_date, payment_date=None)),
+        ("DepartmentDAO.get_department_expense", lambda s: DepartmentDAO.get_department_expense(
+            session=s, department_id=department_id, start_date=start_date, finish_date=finish_date)),
+        ("DepartmentDAO.get_department_monthly_budget", lambda s: DepartmentDAO.get_department_monthly_budget(
+            session=s, department_id=department_id, start_date=start_date, finish_date=finish_date)),
+        ("BudgetDAO.get_budget_sum", lambda s: BudgetDAO.get_budget_sum(session=s, budget_id=budget.id)),
+        ("BudgetDAO.get_filtered_budget_sum", lambda s: BudgetDAO.get_filtered_budget_sum(
+            session=s, department_id=department_id, expense_type_id=expense_type_id,
+            start_date=month_start, finish_date=month_finish)),
+        ("BudgetDAO.get_filtered_budget_expense", lambda s: BudgetDAO.get_filtered_budget_expense(
+            session=s, department_id=department_id, expense_type_id=expense_type_id,
+            start_date=month_start, finish_date=month_finish)),
+        ("BudgetDAO.get_budget_delayed_sum", lambda s: BudgetDAO.get_budget_delayed_sum(
+            session=s, department_id=department_id, expense_type_id=expense_type_id,
+            start_date=month_start, finish_date=month_finish)),
+        ("BudgetDAO.get_calendar_budget_details", lambda s: BudgetDAO.get_calendar_budget_details(
+            session=s, start_date=month_start, finish_date=month_finish, budget_id=budget.id,
+            department_id=department_id, expense_type_id=expense_type_id,
+            days=(month_finish - month_start).days + 1)),
+        ("TransactionDAO.get_all_budgets_sum", lambda s: TransactionDAO.get_all_budgets_sum(
+            session=s, filters={"start_date": start_date, "finish_date": finish_date})),
+        ("TransactionDAO.get_department_transactions", lambda s: TransactionDAO.get_department_transactions(
+            session=s, department_id=department_id, start_date=start_date, finish_date=finish_date, page=1, size=50)),
+        ("TransactionDAO.get_department_all_transactions", lambda s: TransactionDAO.get_department_all_transactions(
+            session=s, department_id=department_id, start_date=start_date, finish_date=finish_date)),
+        ("TransactionDAO.get_calendar_transactions", lambda s: TransactionDAO.get_calendar_transactions(
+            session=s, start_date=month_start, finish_date=month_finish)),
+    ]
+
+
+def index_names(node, names):
+    if "Index Name" in node:
+        names.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        index_names(child, names)
+    return names
+
+
+def explain(connection, statement, parameters):
+    plan = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters).scalar()
+    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    return plan["Execution Time"], plan["Plan"]["Node Type"], sorted(index_names(plan["Plan"], set()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="scratch database, already migrated")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--departments", type=int, default=20)
+    parser.add_argument("--expense-types", type=int, default=30)
+    parser.add_argument("--no-seed", action="store_true", help="reuse data seeded by a previous run")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    if not args.no_seed:
+        seed(engine, args)
+
+    maker = sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    with maker() as session:
+        budget = session.execute(
+            select(Budgets).filter(Budgets.start_date <= date.today(), Budgets.finish_date >= date.today())
+        ).scalars().first()
+    if budget is None:
+        raise SystemExit("No budget for the current month, run without --no-seed first")
+
+    print(f"{'method':<48} {'stmt':>4} {'ms':>9}  {'top node':<18} indexes")
+    for name, call in dao_calls(budget, date.today().year):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        with maker() as session:
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            try:
+                asyncio.run(call(session))
+            finally:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        with engine.connect() as connection:
+            for number, (statement, parameters) in enumerate(statements, start=1):
+                if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                elapsed, node, indexes = explain(connection, statement, parameters)
+                print(f"{name:<48} {number:>4} {elapsed:>9.2f}  {node:<18} {', '.join(indexes) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
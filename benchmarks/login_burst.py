@@ -0,0 +1,193 @@
+"""
+Login throughput under a burst, e.g. the morning when every bot user authenticates.
+
+Seeds a scratch database with the bootstrap permissions and `--users` users of the
+admin role, then sends one POST /login per user, `--concurrency` at a time, to an
+in-process app (one event loop, like a single uvicorn worker) with the sync session.
+It reports statements, seconds, logins per second, p95 latency and the longest stall
+of the event loop, measured by a task that wakes up every 10 ms.
+
+    legacy  the previous handler: bcrypt on the event loop, then lazy loads of
+            role.accesses, access.permission and permission.group
+    cold    routers.users.login without the role cache (no LISTEN connection):
+            one query with the role's permissions, bcrypt in the thread pool
+    cached  the same with utils.cache.listen running: the permissions subquery is
+            skipped once the role is cached
+
+bcrypt dominates the seconds; the statements and the loop stall are what changed.
+Never point it at a production database: it truncates users and roles.
+
+Usage:
+    alembic -x db_url=postgresql://.../finance_bench upgrade head
+    python -m benchmarks.login_burst --db-url postgresql://.../finance_bench --users 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.config import settings
+from dal.dao import UserDAO
+from routers.users import users_router
+from utils.bootstrap import bootstrap
+from utils.cache import listen, role_cache
+from utils.permissions import permission_claims
+from utils.utils import Hasher, create_access_token
+
+
+TABLES = "bootstrap_state, permission_groups, permissions, accesses, roles, users"
+
+PASSWORD = "burst-password"
+
+
+async def legacy_login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = None):
+    # Previous /login handler, without the comments
+    user = await UserDAO.get_by_attributes(session=session, filters={"username": form_data.username}, first=True)
+    if not user or not Hasher.verify_password(form_data.password, user.password):
+        raise HTTPException(status_code=404, detail="Invalid username or password")
+
+    permissions = {}
+    if user.role.accesses:
+        for access in user.role.accesses:
+            try:
+                permissions[access.permission.group.name].append(access.permission.name)
+            except KeyError:
+                permissions[access.permission.group.name] = [access.permission.name]
+
+    user_info = {
+        "id": str(user.id),
+        "role_id": str(user.role_id),
+        "fullname": user.fullname,
+        "username": user.username,
+        **permission_claims(permissions)
+    }
+    data = {"sub": user.username, "exp": datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES), "user": user_info}
+    return {"access_token": create_access_token(data=data), "token_type": "Bearer"}
+
+
+def build_app(session_factory) -> FastAPI:
+    from core.session import get_db
+
+    def get_session():
+        with session_factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(users_router)
+    app.dependency_overrides[get_db] = get_session
+
+    @app.post("/legacy-login")
+    async def legacy(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+        return await legacy_login(form_data=form_data, session=session)
+
+    return app
+
+
+def seed(engine, users: int):
+    with engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE TABLE {TABLES} RESTART IDENTITY CASCADE"))
+    with sessionmaker(engine)() as session:
+        asyncio.run(bootstrap(session=session))
+        session.commit()
+    with engine.begin() as connection:
+        # Один хеш на всех: проверка каждого пароля всё равно стоит полный bcrypt
+        connection.execute(
+            text("""
+                INSERT INTO users (id, username, fullname, password, role_id, is_active, created_at)
+                SELECT gen_random_uuid(), 'burst-user-' || i, 'Burst user ' || i, :password,
+                       (SELECT id FROM roles WHERE name = :role), true, now()
+                FROM generate_series(1, :users) AS i
+            """),
+            {"password": Hasher.get_password_hash(PASSWORD), "role": settings.admin_role, "users": users}
+        )
+        connection.execute(text("ANALYZE users, roles, accesses, permissions, permission_groups"))
+
+
+async def burst(app, path: str, users: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, stalls = [], []
+    done = asyncio.Event()
+
+    async def watch_loop():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - started - 0.01)
+
+    async def login(client, i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(path, data={"username": f"burst-user-{i}", "password": PASSWORD})
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    watcher = asyncio.create_task(watch_loop())
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(login(client, i) for i in range(1, users + 1)))
+        elapsed = time.perf_counter() - started
+    done.set()
+    await watcher
+    return elapsed, latencies, max(stalls) if stalls else 0.0
+
+
+async def run(engine, name: str, args):
+    app = build_app(sessionmaker(engine, expire_on_commit=False, autoflush=False))
+    stop = asyncio.Event()
+    listener = None
+    if name == "cached":
+        dsn = make_url(args.db_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        listener = asyncio.create_task(listen(dsn=dsn, stop=stop))
+        while not role_cache.connected:
+            await asyncio.sleep(0.05)
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *rest):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        elapsed, latencies, stall = await burst(app, "/legacy-login" if name == "legacy" else "/login", args.users, args.concurrency)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        stop.set()
+        if listener is not None:
+            await listener
+    return {
+        "name": name,
+        "statements": len(statements),
+        "seconds": elapsed,
+        "rate": args.users / elapsed,
+        "p95": statistics.quantiles(latencies, n=20)[-1] * 1000,
+        "stall": stall * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="scratch database, already migrated")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url, pool_size=args.concurrency, max_overflow=0)
+    seed(engine, args.users)
+    print(f"{'login':<7} {'statements':>11} {'seconds':>8} {'logins/s':>9} {'p95 ms':>8} {'loop stall ms':>14}")
+    for name in ("legacy", "cold", "cached"):
+        row = asyncio.run(run(engine, name, args))
+        print(
+            f"{row['name']:<7} {row['statements']:>11} {row['seconds']:>8.2f} {row['rate']:>9.1f} "
+            f"{row['p95']:>8.0f} {row['stall']:>14.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Token size and cost of the PermissionChecker dependency.
+
+Builds the token of a user holding every permission twice. The "map" token is the
+previous format: the {group: [name, ...]} map and the password hash. The "mask"
+token carries the permission bitmask of utils.permissions. For each token it
+reports its size and the per-call time of the check alone and of decoding the JWT
+plus the check, which is what every protected request pays. No database needed.
+
+Usage:
+    python -m benchmarks.permission_checker --calls 100000
+"""
+import argparse
+import timeit
+
+from jose import jwt
+
+from core.config import settings
+from utils.permissions import permission_claims, permission_groups
+from utils.utils import PermissionChecker, create_access_token, token_permission_mask
+
+
+REQUIRED = {"Заявки": ["read", "accounting"]}
+
+USER = {
+    "id": "5f0c1c9e-9b1e-4c55-8a3c-2f3f4a0e6b71",
+    "role_id": "0b4a8c7e-2d6f-4e1a-9c3b-7a5d8e9f0a12",
+    "fullname": "Администратор",
+    "username": "admin",
+}
+
+
+def map_check(user: dict, required_permissions: dict):
+    # Previous PermissionChecker.__call__
+    user_permissions = user['permissions']
+    permission_group, required = next(iter(required_permissions.items()))
+    user_permissions = user_permissions.get(permission_group, None)
+    need_permissions = set(required).intersection(user_permissions) if user_permissions else None
+    return bool(need_permissions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    permissions = {group: list(names) for group, names in permission_groups.items()}
+    map_token = create_access_token({"sub": "admin", "user": {
+        **USER, "password": "$2b$12$" + "x" * 53, "permissions": permissions
+    }})
+    mask_token = create_access_token({"sub": "admin", "user": {**USER, **permission_claims(permissions)}})
+    checker = PermissionChecker(required_permissions=REQUIRED)
+
+    def decode(token):
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])["user"]
+
+    map_user = decode(map_token)
+    mask_user = decode(mask_token)
+    mask_user["permission_mask"] = token_permission_mask(mask_user)
+
+    def map_request():
+        map_check(decode(map_token), REQUIRED)
+
+    def mask_request():
+        user = decode(mask_token)
+        user["permission_mask"] = token_permission_mask(user)
+        checker(user)
+
+    rows = [
+        ("map", len(map_token), lambda: map_check(map_user, REQUIRED), map_request),
+        ("mask", len(mask_token), lambda: checker(mask_user), mask_request),
+    ]
+    print(f"{'token':<6} {'bytes':>7} {'check us':>9} {'decode+check us':>16}")
+    for name, size, check, request in rows:
+        check_us = timeit.timeit(check, number=args.calls) / args.calls * 1e6
+        request_us = timeit.timeit(request, number=args.calls // 10) / (args.calls // 10) * 1e6
+        print(f"{name:<6} {size:>7} {check_us:>9.2f} {request_us:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Round trips and duration of the request status updater job.
+
+Seeds a scratch database with `--requests` approved requests due today (each with a
+client and a transaction) and as many overdue ones, then runs the job's two bulk
+statements (RequestDAO.mark_payment_due / mark_overdue) and counts the statements
+sent to the server. --legacy also runs the previous per-request loop (RequestDAO.update,
+TransactionDAO.get_by_attributes and TransactionDAO.update, notify per row) on the
+same rows for comparison; it needs minutes from a few thousand rows. Every run is rolled back, seed included, so the database
+is left as it was.
+
+Never point it at a production database.
+
+Usage:
+    alembic -x db_url=postgresql://.../finance_bench upgrade head
+    python -m benchmarks.status_updater --db-url postgresql://.../finance_bench --requests 10000
+    python -m benchmarks.status_updater --db-url postgresql://.../finance_bench --requests 1000 --legacy
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, create_engine, event, select, text
+from sqlalchemy.orm import Session
+
+from core.config import timezonetash
+from dal.base import day_bounds
+from dal.dao import RequestDAO, TransactionDAO
+from utils.notifications import notify
+
+
+SEED_SQL = """
+    WITH c AS (
+        INSERT INTO clients (id, tg_id, fullname, phone, is_active, web_user, created_at)
+        SELECT gen_random_uuid(), 800000000 + i, 'Status client ' || i, '+998900000000', true, false, now()
+        FROM generate_series(1, :requests * 2) AS i
+        RETURNING id, tg_id
+    ),
+    r AS (
+        INSERT INTO requests (id, sum, status, approved, credit, currency, client_id, payment_time, created_at)
+        SELECT gen_random_uuid(), 10000, CASE WHEN c.tg_id % 2 = 0 THEN 1 ELSE 6 END, true, false, 'Сум', c.id,
+               CASE WHEN c.tg_id - 800000000 <= :requests THEN :today ELSE :today - interval '3 days' END,
+               now() - interval '10 days'
+        FROM c
+        RETURNING id, status
+    )
+    INSERT INTO transactions (id, request_id, status, value, is_income, created_at)
+    SELECT gen_random_uuid(), r.id, r.status, -10000, false, now()
+    FROM r
+"""
+
+
+async def bulk_job(session, today):
+    due = await RequestDAO.mark_payment_due(session=session, day=today)
+    overdue = await RequestDAO.mark_overdue(session=session, day=today)
+    return due + overdue
+
+
+async def legacy_job(session, today):
+    # Previous implementation: three or more round trips per request
+    changed = 0
+    start, end = day_bounds(today)
+    for status, condition in [
+        (2, and_(RequestDAO.model.status.in_([1, 6]), RequestDAO.model.payment_time >= start, RequestDAO.model.payment_time < end)),
+        (3, and_(RequestDAO.model.status.in_([1, 2, 6]), RequestDAO.model.payment_time < start)),
+    ]:
+        requests = session.execute(
+            select(RequestDAO.model).filter(condition, RequestDAO.model.approved == True)
+        ).scalars().all()
+        for request in requests:
+            updated_request = await RequestDAO.update(session=session, data={"id": request.id, "status": status})
+            transaction = await TransactionDAO.get_by_attributes(session=session, filters={"request_id": updated_request.id}, first=True)
+            if transaction:
+                await TransactionDAO.update(session=session, data={"id": transaction.id, "status": status})
+            if status == 2:
+                await notify(session=session, chat_id=request.client.tg_id if request.client else None, text=f"Сегодня срок оплаты вашей заявки #{request.number}")
+            changed += 1
+    session.flush()
+    return changed
+
+
+def run(engine, job, requests):
+    today = datetime.now(timezonetash).date()
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(text(SEED_SQL), {"requests": requests, "today": day_bounds(today)[0].replace(hour=12)})
+        connection.execute(text("ANALYZE requests, transactions, clients"))
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(connection, "before_cursor_execute", before_cursor_execute)
+        try:
+            with Session(bind=connection) as session:
+                started = time.perf_counter()
+                changed = asyncio.run(job(session, today))
+                elapsed = time.perf_counter() - started
+        finally:
+            event.remove(connection, "before_cursor_execute", before_cursor_execute)
+            transaction.rollback()
+    return changed, len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", required=True, help="scratch database, already migrated")
+    parser.add_argument("--requests", type=int, default=10000, help="requests due today; as many are overdue")
+    parser.add_argument("--legacy", action="store_true", help="also run the previous per-request loop")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    jobs = [("bulk", bulk_job)] + ([("legacy", legacy_job)] if args.legacy else [])
+    print(f"{'job':<8} {'changed':>9} {'statements':>11} {'seconds':>9}")
+    for name, job in jobs:
+        changed, statements, elapsed = run(engine, job, args.requests)
+        print(f"{name:<8} {changed:>9} {statements:>11} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
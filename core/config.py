@@ -1,4 +1,6 @@
 import os
+from typing import Optional
+
 import pytz
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -17,6 +19,9 @@ class Settings(BaseSettings):
 
     BASE_URL: str = os.getenv("BASE_URL")
     DB_URL: str = os.getenv("DB_URL")
+    # Set DB_ASYNC=true to serve requests from an asyncpg AsyncSession instead of psycopg2
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", False)
+    ASYNC_DB_URL: Optional[str] = os.getenv("ASYNC_DB_URL")
     SQLALCHEMY_URL: str = os.getenv("SQLALCHEMY_URL")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
     ALGORITHM: str = os.getenv("ALGORITHM", 'HS256')
@@ -28,6 +33,21 @@ class Settings(BaseSettings):
     CHAT_GROUP: str = os.getenv("CHAT_GROUP")
     ERROR_GROUP: str = os.getenv("ERROR_GROUP")
     ERROR_BOT: str = os.getenv("ERROR_BOT")
+    # Bot API server; point it at a fake server in tests
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    # Background exports (utils/reports.py): worker processes and how long a finished file is kept
+    REPORT_WORKERS: int = os.getenv("REPORT_WORKERS", 2)
+    REPORT_TTL_HOURS: int = os.getenv("REPORT_TTL_HOURS", 24)
+    # Dashboard result cache (utils/cache.py): entries per worker and their lifetime in seconds
+    RESULT_CACHE_SIZE: int = os.getenv("RESULT_CACHE_SIZE", 512)
+    RESULT_CACHE_TTL: int = os.getenv("RESULT_CACHE_TTL", 60)
+    # Login permission cache (utils/cache.py role_cache): roles per worker and their lifetime in seconds
+    ROLE_CACHE_SIZE: int = os.getenv("ROLE_CACHE_SIZE", 256)
+    ROLE_CACHE_TTL: int = os.getenv("ROLE_CACHE_TTL", 3600)
+    # Exchange rates (utils/exchange_rates.py): seconds an earlier day's rate stands in for the requested day
+    EXCHANGE_RATE_FALLBACK_TTL: int = os.getenv("EXCHANGE_RATE_FALLBACK_TTL", 60)
+    # Scheduler leadership (utils/leader.py): how often followers try to take over the lease
+    LEADER_RETRY_SECONDS: int = os.getenv("LEADER_RETRY_SECONDS", 15)
 
     docs_username: str = os.getenv("DOCS_USERNAME")
     docs_password: str = os.getenv("DOCS_PASSWORD")
@@ -40,3 +60,8 @@ class Settings(BaseSettings):
 
 # Initialize settings
 settings = Settings()
+
+
+# Test database used by tests/conftest.py: an async (postgresql+asyncpg) url and a plain one for asyncpg
+TEST_DB_URL = os.getenv("TEST_DB_URL")
+TEST_SQLALCHEMY_URL = os.getenv("TEST_SQLALCHEMY_URL")
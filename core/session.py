@@ -1,7 +1,7 @@
 from contextlib import asynccontextmanager, contextmanager
 from typing import Generator, AsyncGenerator
 import asyncio
-from sqlalchemy import Sequence, text, create_engine
+from sqlalchemy import Sequence, text, create_engine, make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session, create_session, sessionmaker
 
@@ -15,13 +15,21 @@ if settings.DB_URL is None:
     raise ValueError("DB_URL environment variable is not found")
 
 
-# engine = create_async_engine(settings.DB_URL, future=True, echo=True)
-# async_session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 engine = create_engine(settings.DB_URL, future=True, echo=False)
 session_maker = sessionmaker(engine, expire_on_commit=False, autocommit=False, autoflush=False)
 # loop = asyncio.get_event_loop_policy().get_event_loop()
 
 
+# Async engine is only created when the deployment opts in with DB_ASYNC=true.
+# Startup tasks and the scheduler keep using the sync `session_maker` above.
+async_engine = None
+async_session_maker = None
+if settings.DB_ASYNC:
+    async_db_url = settings.ASYNC_DB_URL or make_url(settings.DB_URL).set(drivername="postgresql+asyncpg")
+    async_engine = create_async_engine(async_db_url, future=True, echo=False)
+    async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False, class_=AsyncSession)
+
+
 @asynccontextmanager
 async def create_sequence():
     """Ensure the sequence exists before creating tables."""
@@ -44,19 +52,67 @@ async def create_sequence():
 # asyncio.run(create_sequence())
 
 
-# async def get_db():
-#     session: AsyncSession = async_session_maker()
-#     try:
-#         yield session
-#     finally:
-#         await session.close()
+async def get_db() -> Session:
+    if async_session_maker is not None:
+        async with async_session_maker() as session:
+            yield session
+    else:
+        with session_maker() as session:
+            yield session  # Ensure session is properly yielded
+            session.close()
+
+
 
+# ---------- Session helpers working for both Session and AsyncSession ----------
 
+async def execute(session, statement, params=None):
+    if isinstance(session, AsyncSession):
+        return await session.execute(statement, params)
+    return session.execute(statement, params)
 
-async def get_db() -> Session:
-    with session_maker() as session:
-        yield session  # Ensure session is properly yielded
-        session.close()
+
+async def flush(session):
+    if isinstance(session, AsyncSession):
+        return await session.flush()
+    return session.flush()
+
+
+async def refresh(session, instance, attribute_names=None):
+    if isinstance(session, AsyncSession):
+        return await session.refresh(instance, attribute_names)
+    return session.refresh(instance, attribute_names)
+
+
+async def commit(session):
+    if isinstance(session, AsyncSession):
+        return await session.commit()
+    return session.commit()
+
+
+async def rollback(session):
+    if isinstance(session, AsyncSession):
+        return await session.rollback()
+    return session.rollback()
+
+
+async def close(session):
+    if isinstance(session, AsyncSession):
+        return await session.close()
+    return session.close()
+
+
+async def stream(session, statement, size=2000):
+    """
+    Yields the rows of `statement` in lists of `size`, read from a server-side cursor.
+    """
+    statement = statement.execution_options(yield_per=size)
+    if isinstance(session, AsyncSession):
+        result = await session.stream(statement)
+        async for partition in result.partitions():
+            yield partition
+    else:
+        for partition in session.execute(statement).partitions():
+            yield partition
 
 
 
@@ -1,13 +1,49 @@
 import re
+from datetime import date, datetime, time, timedelta
 from typing import List, Any, Dict, Optional
 
-from sqlalchemy import select, inspect, update, delete, and_, func
+from fastapi_pagination.api import create_page, resolve_params
+from fastapi_pagination.ext.sqlalchemy import paginate as sql_paginate, apaginate as sql_apaginate
+from sqlalchemy import select, inspect, update, delete, and_, func, cast, Date
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, Session
 
+from core.config import timezonetash
+from core.session import execute, flush, refresh, commit, rollback
+
+
+def day_bounds(day: date):
+    """
+    Returns Tashkent midnight of `day` and of the next day.
+
+    Filtering a timestamp column with `column >= start AND column < end` selects the
+    same rows as `func.date(column) == day` but keeps the column bare, so an index on
+    it can be used.
+    """
+    start = timezonetash.localize(datetime.combine(day, time.min))
+    end = timezonetash.localize(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def tashkent_day(column):
+    """
+    Tashkent calendar day of a timestamptz column, the day `day_bounds` selects.
+    """
+    return cast(func.timezone(timezonetash.zone, column), Date)
+
+
+def tashkent_month(column):
+    """
+    First day of the Tashkent calendar month of a timestamptz column.
+    """
+    return cast(func.date_trunc('month', func.timezone(timezonetash.zone, column)), Date)
+
 
 class BaseDAO:
     model = None  # Устанавливается в дочернем классе
+    list_profile = ()  # loader options applied by get_all, see dal/profiles.py
+    detail_profile = ()  # loader options applied by get_by_attributes
 
     @classmethod
     async def add(cls, session: Session, **values):
@@ -15,11 +51,11 @@ class BaseDAO:
         new_instance = cls.model(**values)
         session.add(new_instance)
         try:
-            session.flush()
-            session.refresh(new_instance)
+            await flush(session)
+            await refresh(session, new_instance)
             return new_instance
         except SQLAlchemyError as e:
-            session.rollback()
+            await rollback(session)
             print("SQLAlchemyError: ", e)
             return None
 
@@ -31,31 +67,32 @@ class BaseDAO:
         session.add_all(new_instances)
         try:
             # await session.commit()
-            session.flush()
+            await flush(session)
             # session.refresh(new_instances)
             return new_instances
         except SQLAlchemyError as e:
-            session.rollback()
+            await rollback(session)
             print("ACCESSES ERROR: \n", e)
             return None
 
 
     @classmethod
-    async def get_by_attributes(cls, session: Session, filters: Dict[str, Any] = None, first: bool = False):
+    async def get_by_attributes(cls, session: Session, filters: Dict[str, Any] = None, first: bool = False, profile=None):
         """
         Retrieves records filtered by given attributes.
 
         :param session: AsyncSession - SQLAlchemy async session.
         :param filters: Dict[str, Any] - Dictionary where keys are column names and values are filter values.
         :param first: bool - Whether to return only the first match.
+        :param profile: Loader options to use instead of `cls.detail_profile`.
         :return: Single model instance if `first=True`, else a list of instances.
         """
         try:
-            query = select(cls.model)
+            query = select(cls.model).options(*(cls.detail_profile if profile is None else profile))
             if filters is not None:
                 query = query.filter_by(**filters)
 
-            result = session.execute(query)
+            result = await execute(session, query)
             return result.scalars().first() if first else result.scalars().all()
         except SQLAlchemyError as e:
             print("SQLAlchemyError: \n", e)
@@ -63,9 +100,9 @@ class BaseDAO:
 
 
     @classmethod
-    async def get_all(cls, session: Session, filters: dict = None, payment_date: Optional[bool] = False):
+    async def get_all(cls, session: Session, filters: dict = None, payment_date: Optional[bool] = False, profile=None):
         try:
-            query = select(cls.model)
+            query = select(cls.model).options(*(cls.list_profile if profile is None else profile))
             if filters is not None:
                 conditions = []
                 for k, v in filters.items():
@@ -108,15 +145,15 @@ class BaseDAO:
                             if v is None:
                                 conditions.append(column.isnot(v))
                             else:
-                                conditions.append(func.date(column) == v)
-                        elif k == "payment_date":
-                            conditions.append(func.date(column) == v)
-                        elif k == "created_at":
-                            conditions.append(func.date(column) == v)
+                                start, end = day_bounds(v)
+                                conditions.append(and_(column >= start, column < end))
+                        elif k == "payment_date" or k == "created_at":
+                            start, end = day_bounds(v)
+                            conditions.append(and_(column >= start, column < end))
                         elif k == "start_date":
-                            conditions.append(func.date(column) >= v)
+                            conditions.append(column >= day_bounds(v)[0])
                         elif k == "finish_date":
-                            conditions.append(func.date(column) <= v)
+                            conditions.append(column < day_bounds(v)[1])
                         else:
                             if isinstance(v, str):
                                 conditions.append(column.ilike(f"%{v}%"))
@@ -137,6 +174,45 @@ class BaseDAO:
             return None
 
 
+    @classmethod
+    async def paginate(cls, session: Session, query, transformer=None, cursor=None, cursor_column=None):
+        """
+        Returns one page of `query` (usually built by `get_all`) for a `Page[...]` response.
+
+        Items are fetched with LIMIT/OFFSET and the total with a separate COUNT,
+        so only the rows of the requested page are loaded from the database.
+
+        With `cursor_column` (a unique column the query is ordered by descending) the
+        page also gets `next_cursor`, and passing it back as `cursor` seeks with
+        `cursor_column < cursor` instead of OFFSET, so deep pages cost the same as the first.
+
+        :param session: Session or AsyncSession.
+        :param query: Select statement to paginate; it should already be ordered.
+        :param transformer: Optional callable applied to the list of page items.
+        :param cursor: Value of `cursor_column` of the last item of the previous page.
+        :param cursor_column: Keyset column, e.g. `Requests.number`.
+        :return: Page filled from the request's pagination params.
+        """
+        if cursor_column is not None and cursor is not None:
+            params = resolve_params()
+            items_query = query.filter(cursor_column < cursor).limit(params.size)
+            items = (await execute(session, items_query)).scalars().all()
+            if transformer is not None:
+                items = transformer(items)
+            total_query = select(func.count()).select_from(query.order_by(None).subquery())
+            total = (await execute(session, total_query)).scalar()
+            page = create_page(items, total=total, params=params)
+        elif isinstance(session, AsyncSession):
+            page = await sql_apaginate(session, query, transformer=transformer)
+        else:
+            page = sql_paginate(session, query, transformer=transformer)
+
+        if cursor_column is not None and hasattr(page, "next_cursor"):
+            if page.items and len(page.items) == page.size:
+                page.next_cursor = getattr(page.items[-1], cursor_column.key)
+        return page
+
+
     @classmethod
     async def update(cls, session: Session, data):
         try:
@@ -156,23 +232,37 @@ class BaseDAO:
                     select(cls.model)
                     .where(cls.model.id == obj_id)
                 )
-            result = session.execute(query)
+            result = await execute(session, query)
 
             # await session.commit()
-            session.flush()
+            await flush(session)
             instance = result.scalars().first()  # Get the updated instance
             if instance:
-                session.refresh(instance)  # Refresh without re-querying
+                await refresh(session, instance)  # Refresh without re-querying
 
             return instance
 
         except SQLAlchemyError as e:
             print("cls model error: ", cls.model)
-            session.rollback()
+            await rollback(session)
             print("SQLAlchemyError: \n", e)
             return None
 
 
+    @classmethod
+    def assign(cls, instance, data: dict):
+        """
+        Sets `data` on a loaded instance without touching the database.
+
+        Unlike `update`, no statement is sent and loaded relationships are kept: the
+        session writes the changed columns with its next flush (at the latest, at
+        commit), so a handler can make several changes and commit them once.
+        """
+        for key, value in data.items():
+            setattr(instance, key, value)
+        return instance
+
+
     @classmethod
     async def delete(cls, session: Session, filters: dict):
         try:
@@ -181,12 +271,12 @@ class BaseDAO:
                 .filter_by(**filters)
                 # .returning(cls.model)
             )
-            session.execute(query)
-            session.commit()
+            await execute(session, query)
+            await commit(session)
             return True
 
         except SQLAlchemyError as e:
-            session.rollback()
+            await rollback(session)
             print(e)
             return None
 
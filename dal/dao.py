@@ -1,14 +1,20 @@
+import json
+import uuid
 from collections import defaultdict
 from datetime import timedelta, date
 from typing import Optional
 
-from sqlalchemy import func, and_, text, or_, case, select, literal_column, cast, Date, distinct, extract, outerjoin
+from sqlalchemy import func, and_, text, or_, case, select, literal_column, cast, Date, DateTime, String, distinct, extract, outerjoin, true, update, delete, literal, null, type_coerce, JSON
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 
-from dal.base import BaseDAO
+from core.session import execute
+from dal import profiles
+from dal.base import BaseDAO, day_bounds, tashkent_day, tashkent_month
 from models.receipts import Receipts
 from models.accesses import Accesses
+from models.budget_ledger import BudgetLedger
 from models.budgets import Budgets
 from models.buyers import Buyers
 from models.cities import Cities
@@ -19,7 +25,12 @@ from models.departments import Departments
 from models.expense_types import ExpenseTypes
 from models.files import Files
 from models.invoices import Invoices
+from models.job_runs import JobRuns
 from models.logs import Logs
+from models.notifications import Notifications
+from models.reports import Reports
+from models.request_rollups import RequestRollups
+from models.rollup_marks import RollupMarks
 from models.payer_companies import PayerCompanies
 from models.payment_types import PaymentTypes
 from models.permission_groups import PermissionGroups
@@ -33,6 +44,7 @@ from models.transactions import Transactions
 from models.users import Users
 from models.limits import Limits
 from models.currencies import Currencies
+from models.exchange_rates import ExchangeRates
 
 
 class PermissionGroupDAO(BaseDAO):
@@ -46,6 +58,34 @@ class PermissionDAO(BaseDAO):
 class RoleDAO(BaseDAO):
     model = Roles
 
+    @classmethod
+    async def get_scope(cls, session: Session, role_id=None, user_id=None):
+        """
+        One row with the role's name and its department, expense type and checkable
+        expense type ids; the role is `role_id` or the role of `user_id`. None without a role.
+        """
+        def ids(column, *conditions):
+            return select(
+                func.coalesce(func.array_agg(column), literal_column("'{}'::uuid[]"))
+            ).filter(*conditions).scalar_subquery()
+
+        query = select(
+            Roles.id,
+            Roles.name,
+            ids(RoleDepartments.department_id, RoleDepartments.role_id == Roles.id).label("departments"),
+            ids(RoleExpenseTypes.expense_type_id, RoleExpenseTypes.role_id == Roles.id).label("expense_types"),
+            ids(
+                RoleExpenseTypes.expense_type_id,
+                RoleExpenseTypes.role_id == Roles.id,
+                RoleExpenseTypes.expense_type_id.in_(select(ExpenseTypes.id).filter(ExpenseTypes.checkable == True))
+            ).label("checkable_expense_types")
+        )
+        if role_id is not None:
+            query = query.filter(Roles.id == role_id)
+        else:
+            query = query.filter(Roles.id == select(Users.role_id).filter(Users.id == user_id).scalar_subquery())
+        return (await execute(session, query)).first()
+
 
 class RoleDepartmentDAO(BaseDAO):
     model = RoleDepartments
@@ -53,6 +93,7 @@ class RoleDepartmentDAO(BaseDAO):
 
 class RoleExpenseTypeDAO(BaseDAO):
     model = RoleExpenseTypes
+    detail_profile = profiles.ROLE_EXPENSE_TYPES
 
 
 class AccessDAO(BaseDAO):
@@ -61,6 +102,41 @@ class AccessDAO(BaseDAO):
 
 class UserDAO(BaseDAO):
     model = Users
+    detail_profile = profiles.USER_SCOPE
+
+    @classmethod
+    async def get_for_login(cls, session: Session, filters: dict, cached_roles=(), clients: bool = False):
+        """
+        The user with its role's [[group, permission], ...] pairs (and client ids) in one row,
+        or None. The pairs are NULL for a role in `cached_roles`: Postgres skips that subquery.
+        """
+        permissions = select(
+            func.coalesce(
+                func.json_agg(func.json_build_array(PermissionGroups.name, Permissions.name)),
+                literal_column("'[]'::json")
+            )
+        ).select_from(
+            Accesses
+        ).join(
+            Permissions, Permissions.id == Accesses.permission_id
+        ).join(
+            PermissionGroups, PermissionGroups.id == Permissions.group_id
+        ).filter(
+            Accesses.role_id == Users.role_id
+        ).scalar_subquery()
+        if cached_roles:
+            permissions = case((Users.role_id.in_(list(cached_roles)), null()), else_=permissions)
+        columns = [Users, type_coerce(permissions, JSON).label("permissions")]
+        if clients:
+            columns.append(
+                select(
+                    func.coalesce(func.array_agg(cast(Clients.id, String)), literal_column("'{}'::varchar[]"))
+                ).filter(
+                    Clients.user_id == Users.id
+                ).scalar_subquery().label("clients")
+            )
+        query = select(*columns).filter_by(**filters).limit(1)
+        return (await execute(session, query)).first()
 
 
 class PayerCompanyDAO(BaseDAO):
@@ -71,15 +147,99 @@ class CurrencyDAO(BaseDAO):
     model = Currencies
 
 
+class ExchangeRateDAO(BaseDAO):
+    model = ExchangeRates
+
+    @classmethod
+    async def get_rate(cls, session: Session, ccy: str, rate_date: date):
+        # Последний известный курс на дату: ЦБ не публикует курсы на выходные. Возвращает rate и rate_date
+        query = select(
+            ExchangeRates.rate, ExchangeRates.rate_date
+        ).filter(
+            and_(
+                ExchangeRates.ccy == ccy,
+                ExchangeRates.rate_date <= rate_date
+            )
+        ).order_by(
+            ExchangeRates.rate_date.desc()
+        ).limit(1)
+        return (await execute(session, query)).first()
+
+    @classmethod
+    async def add_rates(cls, session: Session, rates: list):
+        """
+        Inserts (ccy, rate_date, rate) rows, keeping rates already stored for the same day.
+        """
+        if not rates:
+            return
+        query = insert(ExchangeRates).values(
+            [{"ccy": ccy, "rate_date": rate_date, "rate": rate} for ccy, rate_date, rate in rates]
+        ).on_conflict_do_nothing(
+            constraint="uq_exchange_rates_ccy_rate_date"
+        )
+        await execute(session, query)
+
+
 class DepartmentDAO(BaseDAO):
     model = Departments
+    list_profile = profiles.DEPARTMENTS
+    detail_profile = profiles.DEPARTMENTS
+
+    @classmethod
+    def total_budgets(cls, start_date: Optional[date] = None, finish_date: Optional[date] = None):
+        """
+        get_department_total_budget of every department as one GROUP BY subquery
+        (department_id, total_budget), with the same window on the budget dates.
+        """
+        query = select(
+            Budgets.department_id,
+            func.sum(Transactions.value).label("total_budget")
+        ).join(
+            Budgets, Transactions.budget_id == Budgets.id
+        ).filter(
+            and_(
+                Transactions.budget_id.isnot(None),
+                Transactions.status == 5
+            )
+        )
+        if start_date is not None and finish_date is not None:
+            query = query.filter(
+                and_(
+                    Budgets.start_date.between(start_date, finish_date),
+                    Budgets.finish_date.between(start_date, finish_date)
+                )
+            )
+        return query.group_by(Budgets.department_id).subquery()
+
+    @classmethod
+    async def get_all_with_total_budget(
+            cls, filters: Optional[dict] = None, department_ids: Optional[list] = None,
+            start_date: Optional[date] = None, finish_date: Optional[date] = None
+    ):
+        """
+        Query of (Departments, total_budget) rows for `paginate`, restricted to `department_ids`
+        (None: every department); total_budget is NULL for a department without budgets.
+        """
+        totals = cls.total_budgets(start_date=start_date, finish_date=finish_date)
+        query = select(
+            Departments, totals.c.total_budget
+        ).options(
+            *cls.list_profile
+        ).filter_by(
+            **(filters or {})
+        ).outerjoin(
+            totals, totals.c.department_id == Departments.id
+        )
+        if department_ids is not None:
+            query = query.filter(Departments.id.in_(department_ids))
+        return query.order_by(Departments.created_at, Departments.id)
 
     @classmethod
     async def get_department_total_budget(cls, session: Session, department_id, start_date, finish_date, payment_date):
-        result = session.query(
+        result = select(
             func.sum(Transactions.value)
         ).join(
-            Budgets
+            Budgets, Transactions.budget_id == Budgets.id
         ).filter(
             and_(
                 Budgets.department_id == department_id,
@@ -102,14 +262,14 @@ class DepartmentDAO(BaseDAO):
                 )
             )
 
-        return result.first()
+        return (await execute(session, result)).first()
 
 
     @classmethod
     async def get_department_expense(cls, session: Session, department_id, start_date, finish_date, payment_date: Optional[date] = None):
         result = [0]
         if start_date is not None and finish_date is not None:
-            result = session.query(
+            result = select(
                 func.sum(Transactions.value)
             ).join(
                 Requests, Transactions.request_id == Requests.id
@@ -133,13 +293,14 @@ class DepartmentDAO(BaseDAO):
                         )
                     )
                 )
-            ).first()
+            )
+            result = (await execute(session, result)).first()
 
         if payment_date is not None:
             current_year = float(payment_date.year)
             current_month = float(payment_date.month)
 
-            result = session.query(
+            result = select(
                 func.sum(Transactions.value)
             ).join(
                 Requests, Transactions.request_id == Requests.id
@@ -164,149 +325,171 @@ class DepartmentDAO(BaseDAO):
                         )
                     )
                 )
-            ).first()
+            )
+            result = (await execute(session, result)).first()
 
         return result
 
 
     @classmethod
     async def get_department_monthly_budget(cls, session: Session, department_id, start_date, finish_date):
+        """
+        Budget, expense, pending and delayed sums of a department per (year, month, type), with the
+        pending, delayed and not approved request counts of the month on every row.
+
+        The counts are grouped once per month in their own CTEs and joined to the monthly sums,
+        and budget transactions are summed per budget period before it is expanded into months.
+        """
         query = """
-            SELECT 
-                EXTRACT(YEAR FROM budget_months.month_series) AS year,
-                EXTRACT(MONTH FROM budget_months.month_series) AS month,
-                value_type AS type,
-                SUM(value) AS sum,
-                (
-                    SELECT 
-                        COUNT(r.id) AS value
-                    FROM transactions t
-                    INNER JOIN requests r ON t.request_id = r.id
-                    WHERE t.request_id IS NOT NULL 
-                    AND r.department_id = :department_id 
-                    AND t.status = 0
-                    AND r.status = 0 
-                    AND EXTRACT(YEAR FROM t.created_at::DATE) = EXTRACT(YEAR FROM budget_months.month_series)
-                    AND EXTRACT(MONTH FROM t.created_at::DATE) = EXTRACT(MONTH FROM budget_months.month_series)
-                ) AS pending_requests,
-                (
-                    SELECT 
-                        COUNT(r.id) AS value
-                    FROM transactions t
-                    INNER JOIN requests r ON t.request_id = r.id
-                    WHERE t.request_id IS NOT NULL 
-                    AND r.department_id = :department_id 
-                    AND t.status = 6
-                    AND r.status = 6 
-                    AND EXTRACT(YEAR FROM r.payment_time::DATE) = EXTRACT(YEAR FROM budget_months.month_series)
-                    AND EXTRACT(MONTH FROM r.payment_time::DATE) = EXTRACT(MONTH FROM budget_months.month_series)
-                ) AS delayed_requests,
-                (
-                    SELECT 
-                        COUNT(r.id) AS value
-                    FROM transactions t
-                    INNER JOIN requests r ON t.request_id = r.id
-                    WHERE t.request_id IS NOT NULL 
-                    AND r.department_id = :department_id 
-                    AND r.approved IS False 
-                    AND r.status IN (0,1,2,3)
-                ) AS not_approved_requests
-            
-            FROM (
-                    SELECT 
-                        generate_series(b.start_date, b.finish_date, INTERVAL '1 month') AS month_series,
-                        'budget' AS value_type,
-                        t.value AS value
-                    FROM transactions t
-                    INNER JOIN budgets b ON t.budget_id = b.id
-                    WHERE t.budget_id IS NOT NULL 
-                    AND b.department_id = :department_id 
-                    AND t.status = 5 
-                    AND b.start_date BETWEEN :start_date AND :finish_date 
-                    AND b.finish_date BETWEEN :start_date AND :finish_date
-                
-                    UNION ALL
-                
-                    SELECT 
-                        r.payment_time AS month_series,
-                        'expense' AS value_type,
-                        t.value AS value
-                    FROM transactions t
-                    INNER JOIN requests r ON t.request_id = r.id
-                    INNER JOIN expense_types e ON r.expense_type_id = e.id
-                    WHERE 
-                        t.request_id IS NOT NULL 
-                        AND r.department_id = :department_id 
-                        AND t.status <> 4 
-                        AND r.credit IS NOT True
-                        AND r.payment_time::DATE BETWEEN :start_date AND :finish_date
-                        AND (
-                                r.approved IS TRUE 
-                                OR (
-                                    r.approved IS FALSE 
-                                    AND e.purchasable IS TRUE
-                                )
-                        )
-                    
-                    UNION ALL
-                    
-                    SELECT 
-                        t.created_at AS month_series,
-                        'pending' AS value_type,
-                        t.value AS value
-                    FROM transactions t
-                    INNER JOIN requests r ON t.request_id = r.id
-                    WHERE t.request_id IS NOT NULL 
-                    AND r.department_id = :department_id 
-                    AND t.status = 0 
-                    AND r.status = 0 
-                    AND t.created_at::DATE BETWEEN :start_date AND :finish_date
-                    
-                    UNION ALL
-                    
-                    SELECT 
-                        r.payment_time AS month_series,
-                        'delayed' AS value_type,
-                        t.value AS value
-                    FROM transactions t
-                    INNER JOIN requests r ON t.request_id = r.id
-                    WHERE t.request_id IS NOT NULL 
-                    AND r.department_id = :department_id 
-                    AND t.status = 6
-                    AND r.status = 6 
+            WITH budget_periods AS (
+                SELECT
+                    b.start_date,
+                    b.finish_date,
+                    SUM(t.value) AS value
+                FROM transactions t
+                INNER JOIN budgets b ON t.budget_id = b.id
+                WHERE t.budget_id IS NOT NULL
+                AND b.department_id = :department_id
+                AND t.status = 5
+                AND b.start_date BETWEEN :start_date AND :finish_date
+                AND b.finish_date BETWEEN :start_date AND :finish_date
+                GROUP BY b.start_date, b.finish_date
+            ),
+            budget_months AS (
+                SELECT
+                    generate_series(start_date, finish_date, INTERVAL '1 month') AS month_series,
+                    'budget' AS value_type,
+                    value
+                FROM budget_periods
+
+                UNION ALL
+
+                SELECT
+                    r.payment_time AS month_series,
+                    'expense' AS value_type,
+                    t.value AS value
+                FROM transactions t
+                INNER JOIN requests r ON t.request_id = r.id
+                INNER JOIN expense_types e ON r.expense_type_id = e.id
+                WHERE
+                    t.request_id IS NOT NULL
+                    AND r.department_id = :department_id
+                    AND t.status <> 4
+                    AND r.credit IS NOT True
                     AND r.payment_time::DATE BETWEEN :start_date AND :finish_date
-            ) AS budget_months
-            
-            GROUP BY year, month, value_type, pending_requests, delayed_requests, not_approved_requests
-            ORDER BY year, month, value_type;
+                    AND (
+                            r.approved IS TRUE
+                            OR (
+                                r.approved IS FALSE
+                                AND e.purchasable IS TRUE
+                            )
+                    )
+
+                UNION ALL
+
+                SELECT
+                    t.created_at AS month_series,
+                    'pending' AS value_type,
+                    t.value AS value
+                FROM transactions t
+                INNER JOIN requests r ON t.request_id = r.id
+                WHERE t.request_id IS NOT NULL
+                AND r.department_id = :department_id
+                AND t.status = 0
+                AND r.status = 0
+                AND t.created_at::DATE BETWEEN :start_date AND :finish_date
+
+                UNION ALL
+
+                SELECT
+                    r.payment_time AS month_series,
+                    'delayed' AS value_type,
+                    t.value AS value
+                FROM transactions t
+                INNER JOIN requests r ON t.request_id = r.id
+                WHERE t.request_id IS NOT NULL
+                AND r.department_id = :department_id
+                AND t.status = 6
+                AND r.status = 6
+                AND r.payment_time::DATE BETWEEN :start_date AND :finish_date
+            ),
+            monthly AS (
+                SELECT
+                    EXTRACT(YEAR FROM month_series) AS year,
+                    EXTRACT(MONTH FROM month_series) AS month,
+                    value_type AS type,
+                    SUM(value) AS sum
+                FROM budget_months
+                GROUP BY year, month, value_type
+            ),
+            -- Все строки попадают в месяцы окна: счётчики считаются только по ним
+            pending AS (
+                SELECT
+                    EXTRACT(YEAR FROM t.created_at::DATE) AS year,
+                    EXTRACT(MONTH FROM t.created_at::DATE) AS month,
+                    COUNT(r.id) AS value
+                FROM transactions t
+                INNER JOIN requests r ON t.request_id = r.id
+                WHERE t.request_id IS NOT NULL
+                AND r.department_id = :department_id
+                AND t.status = 0
+                AND r.status = 0
+                AND t.created_at::DATE >= date_trunc('month', CAST(:start_date AS DATE))::DATE
+                AND t.created_at::DATE < (date_trunc('month', CAST(:finish_date AS DATE)) + INTERVAL '1 month')::DATE
+                GROUP BY 1, 2
+            ),
+            delayed AS (
+                SELECT
+                    EXTRACT(YEAR FROM r.payment_time::DATE) AS year,
+                    EXTRACT(MONTH FROM r.payment_time::DATE) AS month,
+                    COUNT(r.id) AS value
+                FROM transactions t
+                INNER JOIN requests r ON t.request_id = r.id
+                WHERE t.request_id IS NOT NULL
+                AND r.department_id = :department_id
+                AND t.status = 6
+                AND r.status = 6
+                AND r.payment_time::DATE >= date_trunc('month', CAST(:start_date AS DATE))::DATE
+                AND r.payment_time::DATE < (date_trunc('month', CAST(:finish_date AS DATE)) + INTERVAL '1 month')::DATE
+                GROUP BY 1, 2
+            ),
+            not_approved AS (
+                SELECT
+                    COUNT(r.id) AS value
+                FROM transactions t
+                INNER JOIN requests r ON t.request_id = r.id
+                WHERE t.request_id IS NOT NULL
+                AND r.department_id = :department_id
+                AND r.approved IS False
+                AND r.status IN (0,1,2,3)
+            )
+
+            SELECT
+                m.year,
+                m.month,
+                m.type,
+                m.sum,
+                COALESCE(p.value, 0) AS pending_requests,
+                COALESCE(d.value, 0) AS delayed_requests,
+                n.value AS not_approved_requests
+            FROM monthly m
+            LEFT JOIN pending p ON p.year = m.year AND p.month = m.month
+            LEFT JOIN delayed d ON d.year = m.year AND d.month = m.month
+            CROSS JOIN not_approved n
+            ORDER BY m.year, m.month, m.type;
         """
         params = {
             "department_id": department_id,
             "start_date": start_date,
             "finish_date": finish_date
         }
-
-        # Add strict filters only if dates are provided
-        # if start_date is not None:
-        #     query += " AND b.start_date BETWEEN :start_date AND :finish_date"
-        #     params["start_date"] = start_date
-        # if finish_date is not None:
-        #     query += " AND b.finish_date BETWEEN :start_date AND :finish_date"
-        #     params["finish_date"] = finish_date
-
-
-        # query += """
-        #     ) AS budget_months
-        #     GROUP BY year, month, value_type
-        #     ORDER BY year, month, value_type;
-        # """
-
-        result = session.execute(text(query), params).fetchall()
+        result = (await execute(session, text(query), params)).fetchall()
         return result
 
 
 class ClientDAO(BaseDAO):
     model = Clients
+    list_profile = profiles.CLIENTS
 
 
 class ExpenseTypeDAO(BaseDAO):
@@ -327,6 +510,8 @@ class SupplierDAO(BaseDAO):
 
 class RequestDAO(BaseDAO):
     model = Requests
+    list_profile = profiles.REQUESTS
+    detail_profile = profiles.REQUEST
 
     @classmethod
     async def sum_count_query(cls, session: Session, filters: dict = None, payment_date: Optional[bool] = False):
@@ -343,7 +528,7 @@ class RequestDAO(BaseDAO):
             func.sum(subq.c.sum).label("total_sum")
         ).select_from(subq)
 
-        query = session.execute(query).first()
+        query = (await execute(session, query)).first()
 
         return {
             "total_requests": query.total_requests or 0,
@@ -375,16 +560,15 @@ class RequestDAO(BaseDAO):
                 case((subq.c.paid_at >= subq.c.payment_date, 1), else_=0)
             ).label("paid_requests_in_time"),
             (
-                (
-                    func.sum(case((subq.c.paid_at >= subq.c.payment_date, 1), else_=0)) /
-                    func.count(subq.c.id)
-                ) * 100
+                # * 100.0 до деления: целочисленное деление давало 0 или 100
+                func.sum(case((subq.c.paid_at >= subq.c.payment_date, 1), else_=0)) * 100.0 /
+                func.nullif(func.count(subq.c.id), 0)
             ).label("paid_requests_in_time_percent")
         ).select_from(
             subq
         )
 
-        query = session.execute(query).first()
+        query = (await execute(session, query)).first()
 
         return {
             "paid_requests_in_time": query.paid_requests_in_time or 0,
@@ -437,7 +621,7 @@ class RequestDAO(BaseDAO):
                 extract('month', base_query.c.log_date).asc()
             )
         )
-        department_monthly_expenses = session.execute(department_monthly_expenses_stmt).all()
+        department_monthly_expenses = (await execute(session, department_monthly_expenses_stmt)).all()
 
         # Global (all departments) monthly expenses
         monthly_expenses_stmt = (
@@ -455,7 +639,7 @@ class RequestDAO(BaseDAO):
                 extract('month', base_query.c.log_date).asc()
             )
         )
-        monthly_expenses = session.execute(monthly_expenses_stmt).all()
+        monthly_expenses = (await execute(session, monthly_expenses_stmt)).all()
 
         return department_monthly_expenses, monthly_expenses
 
@@ -493,7 +677,7 @@ class RequestDAO(BaseDAO):
             subq.c.currency
         )
 
-        query = session.execute(query).all()
+        query = (await execute(session, query)).all()
 
         return [
             {
@@ -572,7 +756,7 @@ class RequestDAO(BaseDAO):
             ).label("paid_requests_sum"),
             case(
                 (func.count(subq.c.id) > 0,
-                 (func.sum(case((subq.c.status == 5, 1), else_=0)) / func.count(subq.c.id)) * 100),
+                 func.sum(case((subq.c.status == 5, 1), else_=0)) * 100.0 / func.count(subq.c.id)),
                 else_=0
             ).label("paid_requests_percent")
         ).group_by(
@@ -582,17 +766,39 @@ class RequestDAO(BaseDAO):
         )
 
         # Step 7: Execute and return results
-        result = session.execute(department_requests).all()
+        result = (await execute(session, department_requests)).all()
         return result
 
     @classmethod
     async def get_excel(cls, session: Session, filters):
-
+        """
+        Flat projection of the export columns: no ORM objects and no relationship
+        loads, so core.session.stream can read it in chunks.
+        """
         query = await cls.get_all(
             session=session,
-            filters=filters if filters else None
+            filters=filters if filters else None,
+            profile=()
         )
-        query = query.join(
+        return query.with_only_columns(
+            cls.model.number,
+            cls.model.acceptance_number,
+            cls.model.created_at,
+            Departments.name.label("department"),
+            cls.model.approved,
+            cls.model.credit,
+            cls.model.description,
+            ExpenseTypes.name.label("expense_type"),
+            Clients.fullname.label("client"),
+            cls.model.buyer,
+            cls.model.supplier,
+            cls.model.sum,
+            cls.model.currency,
+            cls.model.exchange_rate,
+            PaymentTypes.name.label("payment_type"),
+            cls.model.payment_time,
+            cls.model.status
+        ).join(
             Departments, cls.model.department_id == Departments.id
         ).join(
             ExpenseTypes, cls.model.expense_type_id == ExpenseTypes.id
@@ -600,8 +806,89 @@ class RequestDAO(BaseDAO):
             Clients, cls.model.client_id == Clients.id
         ).join(
             PaymentTypes, cls.model.payment_type_id == PaymentTypes.id
+        ).order_by(cls.model.number.desc())
+
+    @classmethod
+    async def transition_status(cls, session: Session, condition, status: int, message: Optional[str] = None):
+        """
+        Sets `status` on every request matching `condition` and on their transactions
+        in one statement. With `message` ("{number}" is replaced by the request number)
+        the same statement queues a Telegram notification to each client.
+        Returns how many requests changed.
+        """
+        changed = update(
+            Requests
+        ).where(
+            condition
+        ).values(
+            status=status,
+            updated_at=func.now()
+        ).returning(
+            Requests.id, Requests.number, Requests.client_id
+        ).cte("changed")
+
+        synced = update(
+            Transactions
+        ).where(
+            Transactions.request_id == changed.c.id
+        ).values(
+            status=status,
+            updated_at=func.now()
+        ).cte("synced")
+
+        query = select(func.count()).select_from(changed).add_cte(synced)
+        if message is not None:
+            # Заявки без клиента пропускаются, как в notify()
+            queued = insert(Notifications).from_select(
+                ["id", "bot", "method", "chat_id", "payload", "status", "attempts", "next_attempt_at", "created_at"],
+                select(
+                    func.gen_random_uuid(),
+                    literal("main"),
+                    literal("sendMessage"),
+                    cast(Clients.tg_id, String),
+                    func.json_build_object("text", func.replace(message, "{number}", cast(changed.c.number, String))),
+                    literal(0),
+                    literal(0),
+                    func.now(),
+                    func.now()
+                ).join_from(
+                    changed, Clients, changed.c.client_id == Clients.id
+                ).where(
+                    Clients.tg_id.isnot(None)
+                ).order_by(changed.c.number)
+            ).cte("queued")
+            query = query.add_cte(queued)
+
+        return (await execute(session, query)).scalar()
+
+    @classmethod
+    async def mark_payment_due(cls, session: Session, day: date):
+        # Одобренные заявки с оплатой сегодня: 1, 6 -> 2 «В ожидании оплаты»
+        start, end = day_bounds(day)
+        return await cls.transition_status(
+            session=session,
+            condition=and_(
+                Requests.status.in_([1, 6]),
+                Requests.approved == True,
+                Requests.payment_time >= start,
+                Requests.payment_time < end
+            ),
+            status=2,
+            message="Сегодня срок оплаты вашей заявки #{number}"
+        )
+
+    @classmethod
+    async def mark_overdue(cls, session: Session, day: date):
+        # Срок оплаты прошёл: 1, 2, 6 -> 3 «Просрочена»; уже просроченные не трогаем
+        return await cls.transition_status(
+            session=session,
+            condition=and_(
+                Requests.status.in_([1, 2, 6]),
+                Requests.approved == True,
+                Requests.payment_time < day_bounds(day)[0]
+            ),
+            status=3
         )
-        return session.execute(query.order_by(cls.model.number.desc())).scalars().all()
 
     @classmethod
     async def get_financier_metrics(cls, session: Session, filters: dict = None):
@@ -720,7 +1007,7 @@ class LogDAO(BaseDAO):
 
     @classmethod
     async def get_request_logs_with_sum(cls, session: Session, request_id):
-        result = session.query(
+        result = select(
             cls.model
         ).filter(
             and_(
@@ -729,10 +1016,361 @@ class LogDAO(BaseDAO):
             )
         ).order_by(
             cls.model.created_at.desc()
-        ).all()
+        )
+        result = (await execute(session, result)).scalars().all()
         return result
 
 
+class NotificationDAO(BaseDAO):
+    model = Notifications
+
+    @classmethod
+    async def claim_due(cls, session: Session, limit: int, chat_interval: timedelta = timedelta(0)):
+        # SKIP LOCKED: несколько воркеров (по одному на процесс) не отправят одно сообщение дважды
+        earlier = aliased(Notifications)
+        sent = aliased(Notifications)
+        query = select(
+            Notifications
+        ).filter(
+            and_(
+                Notifications.status == 0,
+                Notifications.next_attempt_at <= func.now(),
+                # Берётся только первое неотправленное сообщение чата: пока раннее отложено или
+                # заблокировано другим воркером (SKIP LOCKED его пропустит), следующие его ждут
+                ~select(earlier.id).filter(
+                    and_(
+                        earlier.chat_id == Notifications.chat_id,
+                        earlier.status == 0,
+                        earlier.number < Notifications.number
+                    )
+                ).exists(),
+                # Лимит Telegram на чат общий для всех процессов: время отправки хранится в строке
+                ~select(sent.id).filter(
+                    and_(
+                        sent.chat_id == Notifications.chat_id,
+                        sent.sent_at > func.now() - chat_interval
+                    )
+                ).exists()
+            )
+        ).order_by(
+            Notifications.next_attempt_at,
+            Notifications.number
+        ).limit(limit).with_for_update(skip_locked=True)
+        return (await execute(session, query)).scalars().all()
+
+
+class ReportDAO(BaseDAO):
+    model = Reports
+
+    @classmethod
+    async def enqueue(cls, session: Session, kind: str, filters: dict, filters_hash: str, user_id=None):
+        """
+        Returns the queued or running report with the same filters, creating it if there is none.
+        """
+        active = and_(
+            Reports.kind == kind,
+            Reports.filters_hash == filters_hash,
+            Reports.status.in_([0, 1])
+        )
+        # Задача могла завершиться между INSERT и SELECT — тогда ставим новую
+        for _ in range(3):
+            query = insert(Reports).values(
+                id=uuid.uuid4(), kind=kind, filters=filters, filters_hash=filters_hash, user_id=user_id
+            ).on_conflict_do_nothing(
+                index_elements=[Reports.kind, Reports.filters_hash],
+                index_where=Reports.status.in_([0, 1])
+            ).returning(Reports.id)
+            report_id = (await execute(session, query)).scalar()
+            if report_id is None:
+                report_id = (await execute(session, select(Reports.id).filter(active))).scalar()
+            if report_id is not None:
+                return (await execute(session, select(Reports).filter(Reports.id == report_id))).scalar_one()
+        return None
+
+    @classmethod
+    async def claim(cls, session: Session, limit: int, stale_after: timedelta):
+        # SKIP LOCKED: воркеры разных процессов API не возьмут одну задачу; зависшие (процесс упал) берутся заново
+        query = select(
+            Reports.id
+        ).filter(
+            or_(
+                Reports.status == 0,
+                and_(
+                    Reports.status == 1,
+                    Reports.updated_at < func.now() - stale_after
+                )
+            )
+        ).order_by(
+            Reports.created_at
+        ).limit(limit).with_for_update(skip_locked=True)
+        ids = (await execute(session, query)).scalars().all()
+        if ids:
+            await execute(
+                session,
+                update(Reports).where(Reports.id.in_(ids)).values(
+                    status=1, progress=0, started_at=func.now(), updated_at=func.now()
+                )
+            )
+        return ids
+
+    @classmethod
+    async def set_state(cls, session: Session, report_id, **values):
+        await execute(session, update(Reports).where(Reports.id == report_id).values(updated_at=func.now(), **values))
+
+    @classmethod
+    async def delete_expired(cls, session: Session):
+        # Возвращает пути файлов удалённых отчётов
+        query = delete(Reports).where(Reports.expires_at < func.now()).returning(Reports.file_path)
+        return (await execute(session, query)).scalars().all()
+
+
+class JobRunDAO(BaseDAO):
+    model = JobRuns
+
+    @classmethod
+    async def start(cls, session: Session, job: str, worker: str):
+        query = insert(JobRuns).values(id=uuid.uuid4(), job=job, worker=worker, status=0, started_at=func.now()).returning(JobRuns.id)
+        return (await execute(session, query)).scalar()
+
+    @classmethod
+    async def finish(cls, session: Session, run_id, status: int, duration: float, result: Optional[str] = None, error: Optional[str] = None):
+        await execute(
+            session,
+            update(JobRuns).where(JobRuns.id == run_id).values(
+                status=status, duration=duration, result=result, error=error, finished_at=func.now()
+            )
+        )
+
+
+class RequestRollupDAO(BaseDAO):
+    model = RequestRollups
+
+    # pg_advisory_xact_lock: пересчёт идёт в одной транзакции за раз
+    LOCK_ID = 7201301
+
+    AXES = ("created", "payment", "paid", "transactions")
+
+    @classmethod
+    def _day_filter(cls, column, days):
+        # Диапазон по индексу на column, затем точные дни
+        if days is None:
+            return true()
+        return and_(
+            column >= day_bounds(min(days))[0],
+            column < day_bounds(max(days))[1],
+            tashkent_day(column).in_(days)
+        )
+
+    @classmethod
+    def _axis_query(cls, axis: str, days=None):
+        """
+        Rollup rows of one axis, for the given Tashkent days or for the whole history.
+        """
+        r = Requests
+        keys = [r.department_id, r.expense_type_id, r.currency, r.status, r.approved]
+        converted = case((r.currency != "Сум", r.sum / func.nullif(r.exchange_rate, 0)), else_=r.sum)
+
+        if axis == "transactions":
+            day = tashkent_day(Transactions.created_at)
+            return select(
+                func.gen_random_uuid(), literal(axis), day, null(), null(), null(), Transactions.status, null(),
+                func.count(), func.coalesce(func.sum(Transactions.value), 0), literal(0), literal(0), literal(0)
+            ).where(
+                Transactions.created_at.isnot(None),
+                cls._day_filter(Transactions.created_at, days)
+            ).group_by(day, Transactions.status)
+
+        paid_logs = literal(0)
+        paid_logs_in_time = literal(0)
+        if axis == "created":
+            day = tashkent_day(r.created_at)
+            log_day = tashkent_day(Logs.created_at)
+            # Дни оплаты заявки, как в paid_in_time: один на каждый день лога со статусом 5
+            paid = select(
+                func.count(distinct(log_day)).label("paid_logs"),
+                func.count(distinct(log_day)).filter(log_day >= tashkent_day(r.payment_time)).label("in_time")
+            ).where(
+                Logs.request_id == r.id,
+                Logs.status == 5
+            ).lateral()
+            paid_logs = func.coalesce(func.sum(paid.c.paid_logs), 0)
+            paid_logs_in_time = func.coalesce(func.sum(paid.c.in_time), 0)
+            query = select(r).join(paid, true()).where(r.created_at.isnot(None), cls._day_filter(r.created_at, days))
+        elif axis == "payment":
+            day = tashkent_day(r.payment_time)
+            query = select(r).where(r.payment_time.isnot(None), cls._day_filter(r.payment_time, days))
+        else:
+            # Первый лог оплаты, как DISTINCT ON в department_monthly_expenses
+            paid_at = select(
+                func.min(Logs.created_at)
+            ).where(
+                Logs.request_id == r.id,
+                Logs.status == 5
+            ).scalar_subquery()
+            day = tashkent_day(paid_at)
+            query = select(r).where(r.status == 5, paid_at.isnot(None))
+            if days is not None:
+                query = query.where(
+                    r.id.in_(select(Logs.request_id).where(Logs.status == 5, cls._day_filter(Logs.created_at, days))),
+                    day.in_(days)
+                )
+
+        return query.with_only_columns(
+            func.gen_random_uuid(), literal(axis), day, *keys,
+            func.count(), func.coalesce(func.sum(r.sum), 0), func.coalesce(func.sum(converted), 0),
+            paid_logs, paid_logs_in_time
+        ).group_by(day, *keys)
+
+    @classmethod
+    async def _recompute(cls, session: Session, axis: str, days=None):
+        m = RequestRollups
+        condition = m.axis == axis if days is None else and_(m.axis == axis, m.day.in_(days))
+        await execute(session, delete(m).where(condition))
+        await execute(
+            session,
+            insert(m).from_select(
+                [m.id, m.axis, m.day, m.department_id, m.expense_type_id, m.currency, m.status, m.approved,
+                 m.requests, m.sum, m.converted_sum, m.paid_logs, m.paid_logs_in_time],
+                cls._axis_query(axis, days)
+            )
+        )
+
+    @classmethod
+    async def refresh(cls, session: Session) -> int:
+        """
+        Recomputes the days marked by the triggers since the last refresh and returns
+        how many (axis, day) pairs were recomputed. Does not commit.
+        """
+        await execute(session, select(func.pg_advisory_xact_lock(cls.LOCK_ID)))
+        # Отметки незавершённых транзакций не видны и останутся до следующего refresh
+        marks = (await execute(session, delete(RollupMarks).returning(RollupMarks.axis, RollupMarks.day))).all()
+        days = defaultdict(set)
+        for axis, day in marks:
+            days[axis].add(day)
+        for axis, axis_days in days.items():
+            await cls._recompute(session, axis, sorted(axis_days))
+        months = sorted({day.strftime("%Y-%m") for axis_days in days.values() for day in axis_days})
+        if months:
+            # Канал utils/cache.CHANNEL: с commit кэш /financier-panel сбрасывается во всех воркерах
+            await execute(
+                session,
+                text("SELECT pg_notify('result_cache', :payload)"),
+                {"payload": json.dumps([[None, month] for month in months])}
+            )
+        return sum(len(axis_days) for axis_days in days.values())
+
+    @classmethod
+    async def rebuild(cls, session: Session):
+        # Полный пересчёт; не коммитит
+        await execute(session, select(func.pg_advisory_xact_lock(cls.LOCK_ID)))
+        await execute(session, delete(RollupMarks))
+        for axis in cls.AXES:
+            await cls._recompute(session, axis)
+
+    @classmethod
+    async def get_financier_metrics(cls, session: Session, filters: dict = None):
+        """
+        /financier-panel from request_rollups; the same result as RequestDAO.get_financier_metrics.
+        """
+        m = RequestRollups
+        filters = filters or {}
+        in_range = true()
+        if filters.get("start_date") is not None:
+            in_range = and_(in_range, m.day >= filters["start_date"])
+        if filters.get("finish_date") is not None:
+            in_range = and_(in_range, m.day <= filters["finish_date"])
+
+        created = m.axis == "created"
+        open_status = m.status.in_([0, 1, 2, 3])
+        paid = and_(m.approved == True, m.status == 5)
+
+        totals = (await execute(session, select(
+            func.sum(m.requests).filter(created, m.approved == True, open_status).label("unpaid_requests"),
+            func.sum(m.sum).filter(created, m.approved == True, open_status).label("unpaid_sum"),
+            func.sum(m.requests).filter(created, m.approved == False, open_status).label("not_approved_requests"),
+            func.sum(m.sum).filter(created, m.approved == False, open_status).label("not_approved_sum"),
+            func.sum(m.requests).filter(m.axis == "payment", paid).label("paid_requests"),
+            func.sum(m.sum).filter(m.axis == "payment", paid).label("paid_sum"),
+            func.sum(m.paid_logs).filter(created).label("paid_logs"),
+            func.sum(m.paid_logs_in_time).filter(created).label("paid_logs_in_time"),
+            func.sum(m.sum).filter(m.axis == "transactions", m.status == 5).label("all_budget")
+        ).where(m.axis.in_(["created", "payment", "transactions"]), in_range))).first()
+
+        currencies = (await execute(session, select(
+            m.currency,
+            func.sum(m.requests).label("total_requests"),
+            func.sum(m.converted_sum).label("total_sum")
+        ).where(created, paid, in_range).group_by(m.currency).order_by(m.currency))).all()
+
+        # Все отделы, в том числе без заявок за период
+        departments = (await execute(session, select(
+            Departments.name,
+            func.coalesce(func.sum(m.requests), 0).label("total_requests"),
+            func.coalesce(func.sum(m.sum), 0).label("total_sum"),
+            func.coalesce(func.sum(m.requests).filter(m.status == 5), 0).label("paid_requests"),
+            func.coalesce(func.sum(m.sum).filter(m.status == 5), 0).label("paid_requests_sum")
+        ).select_from(Departments).outerjoin(
+            m, and_(m.department_id == Departments.id, created, in_range)
+        ).group_by(Departments.name).order_by(Departments.name))).all()
+
+        # Расходы по месяцам — за всё время, без фильтра дат
+        months = (await execute(session, select(
+            Departments.name,
+            extract("year", m.day).label("year"),
+            extract("month", m.day).label("month"),
+            func.sum(m.sum).label("expense")
+        ).join(
+            Departments, m.department_id == Departments.id
+        ).where(m.axis == "paid", paid).group_by(
+            Departments.name, extract("year", m.day), extract("month", m.day)
+        ))).all()
+
+        monthly_expenses = defaultdict(lambda: {str(month): 0.0 for month in range(1, 13)})
+        department_expenses = defaultdict(lambda: defaultdict(dict))
+        for department, year, month, expense in months:
+            year, month = str(int(year)), str(int(month))
+            monthly_expenses[year][month] += float(expense)
+            department_expenses[department][year][month] = float(expense)
+
+        paid_logs = totals.paid_logs or 0
+        return {
+            "unpaid_requests": {
+                "total_requests": totals.unpaid_requests or 0,
+                "total_sum": float(totals.unpaid_sum or 0)
+            },
+            "paid_requests": {
+                "total_requests": totals.paid_requests or 0,
+                "total_sum": float(totals.paid_sum or 0),
+                "paid_requests_in_time": totals.paid_logs_in_time or 0,
+                "paid_requests_in_time_percent": float(totals.paid_logs_in_time * 100 / paid_logs) if paid_logs else 0.0
+            },
+            "monthly_expenses": dict(monthly_expenses),
+            "department_metrics": {
+                row.name: {
+                    "total_requests": row.total_requests,
+                    "total_sum": float(row.total_sum),
+                    "paid_requests": row.paid_requests,
+                    "paid_requests_sum": float(row.paid_requests_sum),
+                    "paid_requests_percent": float(row.paid_requests * 100 / row.total_requests) if row.total_requests else 0.0,
+                    "monthly_expenses": {year: dict(months) for year, months in department_expenses.get(row.name, {}).items()}
+                }
+                for row in departments
+            },
+            "not_approved_requests": {
+                "total_requests": totals.not_approved_requests or 0,
+                "total_sum": float(totals.not_approved_sum or 0)
+            },
+            "currency_metrics": [
+                {
+                    "currency": row.currency,
+                    "total_requests": row.total_requests or 0,
+                    "total_sum": float(row.total_sum or 0)
+                } for row in currencies
+            ],
+            "all_budget": totals.all_budget
+        }
+
+
 class LimitDAO(BaseDAO):
     model = Limits
 
@@ -747,22 +1385,118 @@ class CityDAO(BaseDAO):
 
 class BudgetDAO(BaseDAO):
     model = Budgets
+    list_profile = profiles.BUDGETS
+    detail_profile = profiles.BUDGETS
 
     @classmethod
     async def get_budget_sum(cls, session: Session, budget_id):
-        result = session.query(
+        result = select(
             func.sum(Transactions.value)
         ).filter(
             and_(
                 Transactions.budget_id == budget_id,
                 Transactions.status == 5
             )
-        ).first()
+        )
+        result = (await execute(session, result)).first()
         return result
 
+    @classmethod
+    async def get_department_budgets(cls, session: Session, department_id, start_date: date, finish_date: date):
+        """
+        Budgets of a department for exactly `start_date`..`finish_date` with their figures, in one statement.
+
+        Returns (Budgets, value, expense_value, balance_value, delayed) rows with the numbers of
+        get_budget_sum, get_filtered_budget_expense and get_budget_delayed_sum: the expense and
+        delayed sums are FILTER aggregates of the department's requests grouped by expense_type_id.
+        Expense and delayed are positive, and missing sums are 0.
+        """
+        if start_date == finish_date:
+            window = and_(
+                func.date_part('year', Requests.payment_time) == float(start_date.year),
+                func.date_part('month', Requests.payment_time) == float(start_date.month)
+            )
+        else:
+            window = func.date(Requests.payment_time).between(start_date, finish_date)
+
+        values = select(
+            Transactions.budget_id,
+            func.sum(Transactions.value).label("value")
+        ).join(
+            Budgets, Transactions.budget_id == Budgets.id
+        ).filter(
+            and_(
+                Budgets.department_id == department_id,
+                Budgets.start_date == start_date,
+                Budgets.finish_date == finish_date,
+                Transactions.status == 5
+            )
+        ).group_by(
+            Transactions.budget_id
+        ).subquery()
+
+        spent = select(
+            Requests.expense_type_id,
+            func.sum(Transactions.value).filter(
+                and_(
+                    Transactions.status != 4,
+                    Requests.status != 4,
+                    Requests.credit.isnot(True),
+                    or_(
+                        Requests.approved == True,
+                        and_(
+                            Requests.approved == False,
+                            ExpenseTypes.purchasable == True,
+                        )
+                    )
+                )
+            ).label("expense"),
+            func.sum(Transactions.value).filter(
+                and_(
+                    Transactions.status == 6,
+                    Requests.status == 6,
+                    Requests.approved == True
+                )
+            ).label("delayed")
+        ).join(
+            Requests, Transactions.request_id == Requests.id
+        ).join(
+            ExpenseTypes, Requests.expense_type_id == ExpenseTypes.id
+        ).filter(
+            and_(
+                Requests.department_id == department_id,
+                window
+            )
+        ).group_by(
+            Requests.expense_type_id
+        ).subquery()
+
+        value = func.coalesce(values.c.value, 0)
+        expense = -func.coalesce(spent.c.expense, 0)
+        query = select(
+            Budgets,
+            value.label("value"),
+            expense.label("expense_value"),
+            (value - expense).label("balance_value"),
+            (-func.coalesce(spent.c.delayed, 0)).label("delayed")
+        ).options(
+            *cls.list_profile
+        ).outerjoin(
+            values, values.c.budget_id == Budgets.id
+        ).outerjoin(
+            spent, spent.c.expense_type_id == Budgets.expense_type_id
+        ).filter(
+            and_(
+                Budgets.department_id == department_id,
+                Budgets.start_date == start_date,
+                Budgets.finish_date == finish_date
+            )
+        )
+        return (await execute(session, query)).all()
+
     @classmethod
     async def get_filtered_budget_sum(cls, session: Session, department_id, expense_type_id, start_date: date, finish_date: date):
-        result = session.query(
+        result = select(
             func.sum(Transactions.value)
         ).join(
             Budgets, Transactions.budget_id == Budgets.id
@@ -778,7 +1512,8 @@ class BudgetDAO(BaseDAO):
                 # Budgets.start_date.between(start_date, finish_date),
                 # Budgets.finish_date.between(start_date, finish_date)
             )
-        ).first()
+        )
+        result = (await execute(session, result)).first()
         return result
 
 
@@ -789,7 +1524,7 @@ class BudgetDAO(BaseDAO):
             current_year = float(start_date.year)
             current_month = float(start_date.month)
 
-            result = session.query(
+            result = select(
                 func.sum(Transactions.value)
             ).join(
                 Requests, Transactions.request_id == Requests.id
@@ -836,10 +1571,11 @@ class BudgetDAO(BaseDAO):
                 #         func.date_part('month', Requests.payment_time) == current_month
                 #     )
                 # )
-            ).first()
+            )
+            result = (await execute(session, result)).first()
 
         else:
-            result = session.query(
+            result = select(
                 func.sum(Transactions.value)
             ).join(
                 Requests, Transactions.request_id == Requests.id
@@ -863,7 +1599,8 @@ class BudgetDAO(BaseDAO):
                         )
                     )
                 )
-            ).first()
+            )
+            result = (await execute(session, result)).first()
 
         return result
 
@@ -874,7 +1611,7 @@ class BudgetDAO(BaseDAO):
             current_year = float(start_date.year)
             current_month = float(start_date.month)
 
-            result = session.query(
+            result = select(
                 func.sum(Transactions.value)
             ).join(
                 Requests, Transactions.request_id == Requests.id
@@ -888,10 +1625,11 @@ class BudgetDAO(BaseDAO):
                     func.date_part('year', Requests.payment_time) == current_year,
                     func.date_part('month', Requests.payment_time) == current_month
                 )
-            ).first()
+            )
+            result = (await execute(session, result)).first()
 
         else:
-            result = session.query(
+            result = select(
                 func.sum(Transactions.value)
             ).join(
                 Requests, Transactions.request_id == Requests.id
@@ -904,13 +1642,14 @@ class BudgetDAO(BaseDAO):
                     Requests.approved == True,
                     func.date(Requests.payment_time).between(start_date, finish_date)
                 )
-            ).first()
+            )
+            result = (await execute(session, result)).first()
 
         return result
 
     @classmethod
     async def get_budget_by_attributes(cls, session: Session, department_id, expense_type_id, created_date: date):
-        result = session.query(
+        result = select(
             Budgets
         ).filter(
             and_(
@@ -919,7 +1658,8 @@ class BudgetDAO(BaseDAO):
                 created_date >= Budgets.start_date,
                 created_date <= Budgets.finish_date
             )
-        ).first()
+        )
+        result = (await execute(session, result)).scalars().first()
         return result
 
 
@@ -1026,29 +1766,205 @@ class BudgetDAO(BaseDAO):
                 )
             ).order_by(date_series_cte.c.date)
 
-        results = session.execute(result_query).fetchall()
+        results = (await execute(session, result_query)).fetchall()
         return results
 
 
+class BudgetLedgerDAO(BaseDAO):
+    model = BudgetLedger
+
+    @classmethod
+    def _live_query(cls):
+        """
+        Ledger rows summed from transactions, requests, budgets and expense types: what the
+        triggers of migration 0010 keep in budget_ledger.
+        """
+        months = func.generate_series(
+            func.date_trunc('month', cast(Budgets.start_date, DateTime)),
+            cast(Budgets.finish_date, DateTime),
+            literal_column("interval '1 month'")
+        )
+        budgets = select(
+            Budgets.department_id,
+            cast(months, Date).label("month"),
+            Budgets.expense_type_id,
+            Transactions.value.label("budget"),
+            literal(0).label("expense")
+        ).select_from(
+            Transactions
+        ).join(
+            Budgets, Transactions.budget_id == Budgets.id
+        ).filter(
+            and_(
+                Transactions.status == 5,
+                Budgets.department_id.isnot(None),
+                Budgets.expense_type_id.isnot(None)
+            )
+        )
+
+        expenses = select(
+            Requests.department_id,
+            tashkent_month(Requests.payment_time).label("month"),
+            Requests.expense_type_id,
+            literal(0).label("budget"),
+            Transactions.value.label("expense")
+        ).select_from(
+            Transactions
+        ).join(
+            Requests, Transactions.request_id == Requests.id
+        ).join(
+            ExpenseTypes, Requests.expense_type_id == ExpenseTypes.id
+        ).filter(
+            and_(
+                and_(
+                    Requests.department_id.isnot(None),
+                    Requests.payment_time.isnot(None),
+                    Requests.credit.isnot(True),
+                    Transactions.status != 4,
+                    Requests.status != 4
+                ),
+                or_(
+                    Requests.approved == True,
+                    and_(
+                        Requests.approved == False,
+                        ExpenseTypes.purchasable == True,
+                    )
+                )
+            )
+        )
+
+        rows = budgets.union_all(expenses).subquery()
+        budget = func.coalesce(func.sum(rows.c.budget), 0)
+        expense = func.coalesce(func.sum(rows.c.expense), 0)
+        return select(
+            rows.c.department_id, rows.c.month, rows.c.expense_type_id, budget.label("budget"), expense.label("expense")
+        ).group_by(
+            rows.c.department_id, rows.c.month, rows.c.expense_type_id
+        ).having(
+            or_(budget != 0, expense != 0)
+        )
+
+    @classmethod
+    async def rebuild(cls, session: Session):
+        # Полный пересчёт; не коммитит. Триггеры других транзакций ждут блокировки и дописывают после
+        m = BudgetLedger
+        await execute(session, text("LOCK TABLE budget_ledger IN EXCLUSIVE MODE"))
+        await execute(session, delete(m))
+        await execute(
+            session,
+            insert(m).from_select([m.department_id, m.month, m.expense_type_id, m.budget, m.expense], cls._live_query())
+        )
+
+    @classmethod
+    async def verify(cls, session: Session):
+        """
+        Ledger rows that differ from the live sums, with department_id, month, expense_type_id,
+        budget, live_budget, expense and live_expense; a missing row counts as zeros.
+        """
+        m = BudgetLedger
+        live = cls._live_query().subquery()
+        budget, live_budget = func.coalesce(m.budget, 0), func.coalesce(live.c.budget, 0)
+        expense, live_expense = func.coalesce(m.expense, 0), func.coalesce(live.c.expense, 0)
+        query = select(
+            func.coalesce(m.department_id, live.c.department_id).label("department_id"),
+            func.coalesce(m.month, live.c.month).label("month"),
+            func.coalesce(m.expense_type_id, live.c.expense_type_id).label("expense_type_id"),
+            budget.label("budget"),
+            live_budget.label("live_budget"),
+            expense.label("expense"),
+            live_expense.label("live_expense")
+        ).select_from(
+            outerjoin(
+                m, live,
+                and_(
+                    m.department_id == live.c.department_id,
+                    m.month == live.c.month,
+                    m.expense_type_id == live.c.expense_type_id
+                ),
+                full=True
+            )
+        ).filter(
+            or_(budget != live_budget, expense != live_expense)
+        ).order_by("department_id", "month", "expense_type_id")
+        return (await execute(session, query)).all()
+
+    @classmethod
+    def _month(cls, payment_time):
+        # Месяц считается в SQL так же, как в триггерах: по Ташкенту, а не по зоне сервера
+        return tashkent_month(cast(literal(payment_time), DateTime(timezone=True)))
+
+    @classmethod
+    async def get_balance(cls, session: Session, department_id, expense_type_id, payment_time, lock: bool = False):
+        """
+        Budget minus expense of an expense type for the Tashkent month of `payment_time` (a
+        timestamp or a date), read from one ledger row. With `lock` the row stays locked until the
+        end of the transaction, so concurrent approvals of the same expense type and month check
+        the balance one after another.
+        """
+        m = BudgetLedger
+        query = select(
+            m.budget + m.expense
+        ).filter(
+            and_(
+                m.department_id == department_id,
+                m.month == cls._month(payment_time),
+                m.expense_type_id == expense_type_id
+            )
+        )
+        if lock:
+            query = query.with_for_update()
+        balance = (await execute(session, query)).scalar()
+        return balance if balance is not None else 0
+
+    @classmethod
+    async def get_snapshot(cls, session: Session, department_id, expense_type_id, payment_time):
+        """
+        Budget and spend of a department and of one of its expense types for the Tashkent month
+        of `payment_time`, from the department's ledger rows of that month.
+        Returns a row with expense_type_budget, expense_type_expense, department_budget and
+        department_expense; expenses are negative, like the transaction values, and missing sums are 0.
+        """
+        m = BudgetLedger
+        query = select(
+            func.coalesce(func.sum(m.budget).filter(m.expense_type_id == expense_type_id), 0).label("expense_type_budget"),
+            func.coalesce(func.sum(m.expense).filter(m.expense_type_id == expense_type_id), 0).label("expense_type_expense"),
+            func.coalesce(func.sum(m.budget), 0).label("department_budget"),
+            func.coalesce(func.sum(m.expense), 0).label("department_expense")
+        ).filter(
+            and_(
+                m.department_id == department_id,
+                m.month == cls._month(payment_time)
+            )
+        )
+        return (await execute(session, query)).first()
+
+
 class TransactionDAO(BaseDAO):
     model = Transactions
 
+    @classmethod
+    async def update_request_transaction(cls, session: Session, request_id, **values):
+        # Один UPDATE вместо get_by_attributes + update + refresh
+        query = update(Transactions).where(Transactions.request_id == request_id).values(**values)
+        await execute(session, query)
+
     @classmethod
     async def get_all_budgets_sum(cls, session: Session, filters: dict = None):
-        result = session.query(
+        result = select(
             func.sum(cls.model.value)
         ).filter(
             and_(
                 func.date(cls.model.created_at).between(filters["start_date"], filters["finish_date"]),
                 cls.model.status == 5
             )
-        ).first()
+        )
+        result = (await execute(session, result)).first()
         return result
 
 
     @classmethod
     async def get_department_transactions(cls, session: Session, department_id, start_date, finish_date, page, size):
-        result = session.query(
+        result = select(
             Transactions
         ).outerjoin(
             Budgets, Transactions.budget_id == Budgets.id
@@ -1068,12 +1984,13 @@ class TransactionDAO(BaseDAO):
 
         result = result.order_by(
             Transactions.created_at.desc()
-        ).offset((page - 1) * size).limit(size).all()
+        ).offset((page - 1) * size).limit(size)
+        result = (await execute(session, result)).scalars().all()
         return result
 
     @classmethod
     async def get_department_all_transactions(cls, session: Session, department_id, start_date, finish_date):
-        total_transactions = session.query(
+        total_transactions = select(
             Transactions
         ).outerjoin(
             Budgets, Transactions.budget_id == Budgets.id
@@ -1090,21 +2007,24 @@ class TransactionDAO(BaseDAO):
                 # func.date(Transactions.created_at).between(start_date, finish_date)
                 func.date(Requests.payment_time).between(start_date, finish_date)
             )
-        total_transactions = total_transactions.count()
+        total_transactions = (
+            await execute(session, select(func.count()).select_from(total_transactions.subquery()))
+        ).scalar()
         return total_transactions
 
     @classmethod
     async def get_budget_transactions(cls, session: Session, budget_id):
-        transactions = session.query(
+        transactions = select(
             Transactions
         ).filter(
             Transactions.budget_id == budget_id
-        ).all()
+        )
+        transactions = (await execute(session, transactions)).scalars().all()
         return transactions
 
     @classmethod
     async def get_calendar_transactions(cls, session: Session, start_date, finish_date):
-        result = session.query(
+        result = select(
             func.date(Requests.payment_time),
             PaymentTypes.name,
             func.sum(-Transactions.value),
@@ -1134,7 +2054,8 @@ class TransactionDAO(BaseDAO):
         ).group_by(
             func.date(Requests.payment_time),
             PaymentTypes.name
-        ).all()
+        )
+        result = (await execute(session, result)).all()
 
         # result = session.query(
         #     func.date(Requests.payment_time),
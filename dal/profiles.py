@@ -0,0 +1,85 @@
+"""
+Loader profiles: the relationships each response schema serializes, loaded up front.
+
+All relationships in models/ are lazy, so serializing a page of N rows with nested
+schemas used to fire a SELECT per row and relationship. A profile lists the same
+tree as the schema: joinedload for many-to-one, selectinload for collections, so a
+page costs a fixed number of queries however many rows it has.
+
+DAOs pick their defaults with `list_profile` (used by `get_all`) and `detail_profile`
+(used by `get_by_attributes`); both methods also take `profile=` to override them.
+Keep a profile in sync when a relationship is added to or removed from its schema.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from models.accesses import Accesses
+from models.budgets import Budgets
+from models.clients import Clients
+from models.contracts import Contracts
+from models.departments import Departments
+from models.invoices import Invoices
+from models.logs import Logs
+from models.receipts import Receipts
+from models.requests import Requests
+from models.role_department_relations import RoleDepartments
+from models.role_expensetype_relations import RoleExpenseTypes
+from models.roles import Roles
+from models.users import Users
+
+
+# schemas.clients.Clients
+CLIENTS = (
+    selectinload(Clients.department),
+)
+
+# schemas.departments.Departments
+DEPARTMENTS = (
+    joinedload(Departments.head).options(*CLIENTS),
+)
+
+# schemas.roles.GetRole (expense_types_list, departments and permissions properties)
+ROLE = (
+    selectinload(Roles.expense_types).joinedload(RoleExpenseTypes.expense_type),
+    selectinload(Roles.roles_departments).joinedload(RoleDepartments.department).options(*DEPARTMENTS),
+    selectinload(Roles.accesses).joinedload(Accesses.permission),
+)
+
+# Role expense types with the expense type, read by /financier-checks
+ROLE_EXPENSE_TYPES = (
+    joinedload(RoleExpenseTypes.expense_type),
+)
+
+# schemas.users.GetUser
+USER = (
+    joinedload(Users.role).options(*ROLE),
+)
+
+# Role departments only; what the routers read from the current user to scope queries
+USER_SCOPE = (
+    joinedload(Users.role).selectinload(Roles.roles_departments),
+)
+
+# schemas.budgets.Budgets
+BUDGETS = (
+    joinedload(Budgets.department).options(*DEPARTMENTS),
+    joinedload(Budgets.expense_type),
+)
+
+# schemas.requests.Requests
+REQUESTS = (
+    joinedload(Requests.client).options(*CLIENTS),
+    joinedload(Requests.user).options(*USER),
+    joinedload(Requests.department).options(*DEPARTMENTS),
+    joinedload(Requests.expense_type),
+    joinedload(Requests.payment_type),
+    joinedload(Requests.payer_company),
+)
+
+# schemas.requests.Request
+REQUEST = REQUESTS + (
+    selectinload(Requests.contract).selectinload(Contracts.file),
+    selectinload(Requests.invoice).selectinload(Invoices.file),
+    selectinload(Requests.receipt).selectinload(Receipts.file),
+    selectinload(Requests.logs).joinedload(Logs.user),
+    selectinload(Requests.logs).joinedload(Logs.client).options(*CLIENTS),
+)
@@ -62,6 +62,7 @@ main_router.include_router(logs_router, tags=['Logs'])
 main_router.include_router(files_router, tags=['Files'])
 main_router.include_router(contracts_router, tags=['Contracts'])
 main_router.include_router(settings_router, tags=['Settings'])
+main_router.include_router(reports_router, tags=['Reports'])
 
 
 
@@ -0,0 +1,383 @@
+"""initial schema
+
+Tables as declared in models/ before migrations were added. A database that was
+created from the models already has them: run `alembic stamp 0001` on it once,
+then `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 13:41:16.884963
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # requests.number default
+    op.execute("CREATE SEQUENCE IF NOT EXISTS serial_number_seq START 1 INCREMENT 1")
+    op.create_table('buyers',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('countries',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('currencies',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('expense_types',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('purchasable', sa.Boolean(), nullable=True),
+    sa.Column('checkable', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('payer_companies',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('payment_types',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('permission_groups',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('roles',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('suppliers',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('cities',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('country_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['country_id'], ['countries.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('permissions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('action', sa.String(), nullable=True),
+    sa.Column('group_id', sa.UUID(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['group_id'], ['permission_groups.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('action')
+    )
+    op.create_table('role_expense_types',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('role_id', sa.UUID(), nullable=True),
+    sa.Column('expense_type_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['expense_type_id'], ['expense_types.id'], ),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('tg_id', sa.BIGINT(), nullable=True),
+    sa.Column('fullname', sa.String(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('role_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_index(op.f('ix_users_tg_id'), 'users', ['tg_id'], unique=True)
+    op.create_table('accesses',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('permission_id', sa.UUID(), nullable=False),
+    sa.Column('role_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['permission_id'], ['permissions.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('clients',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('tg_id', sa.BIGINT(), nullable=True),
+    sa.Column('fullname', sa.String(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('web_user', sa.Boolean(), nullable=True),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_clients_tg_id'), 'clients', ['tg_id'], unique=True)
+    op.create_table('limits',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=True),
+    sa.Column('finish_date', sa.Date(), nullable=True),
+    sa.Column('value', sa.DECIMAL(), nullable=True),
+    sa.Column('city_id', sa.UUID(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('departments',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('over_budget', sa.Boolean(), nullable=True),
+    sa.Column('purchasable', sa.Boolean(), nullable=True),
+    sa.Column('client_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('budgets',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('expense_type_id', sa.UUID(), nullable=True),
+    sa.Column('department_id', sa.UUID(), nullable=True),
+    sa.Column('start_date', sa.Date(), nullable=True),
+    sa.Column('finish_date', sa.Date(), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+    sa.ForeignKeyConstraint(['expense_type_id'], ['expense_types.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('requests',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('number', sa.BIGINT(), server_default=sa.text("nextval('serial_number_seq')"), nullable=False),
+    sa.Column('sum', sa.DECIMAL(), nullable=False),
+    sa.Column('acceptance_number', sa.String(), nullable=True),
+    sa.Column('invoice_sap_code', sa.String(), nullable=True),
+    sa.Column('contract_number', sa.String(), nullable=True),
+    sa.Column('approved', sa.Boolean(), nullable=True),
+    sa.Column('credit', sa.Boolean(), nullable=True),
+    sa.Column('purchase_approved', sa.Boolean(), nullable=True),
+    sa.Column('checked_by_financier', sa.Boolean(), nullable=True),
+    sa.Column('to_accounting', sa.Boolean(), nullable=True),
+    sa.Column('to_transfer', sa.Boolean(), nullable=True),
+    sa.Column('payment_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('payment_card', sa.String(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('exchange_rate', sa.DECIMAL(), nullable=True),
+    sa.Column('cash', sa.DECIMAL(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('delay_reason', sa.Text(), nullable=True),
+    sa.Column('comment', sa.Text(), nullable=True),
+    sa.Column('approve_comment', sa.Text(), nullable=True),
+    sa.Column('payer_company_id', sa.UUID(), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('client_id', sa.UUID(), nullable=True),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('department_id', sa.UUID(), nullable=True),
+    sa.Column('expense_type_id', sa.UUID(), nullable=True),
+    sa.Column('payment_type_id', sa.UUID(), nullable=True),
+    sa.Column('buyer', sa.String(), nullable=True),
+    sa.Column('supplier', sa.String(), nullable=True),
+    sa.Column('trip_days', sa.Integer(), nullable=True),
+    sa.Column('city_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['expense_type_id'], ['expense_types.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['payer_company_id'], ['payer_companies.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['payment_type_id'], ['payment_types.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('number')
+    )
+    op.create_table('role_departments',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('role_id', sa.UUID(), nullable=True),
+    sa.Column('department_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('contracts',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('request_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('request_id')
+    )
+    op.create_table('invoices',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('request_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('request_id')
+    )
+    op.create_table('logs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('sum', sa.DECIMAL(), nullable=True),
+    sa.Column('approved', sa.Boolean(), nullable=True),
+    sa.Column('purchase_approved', sa.Boolean(), nullable=True),
+    sa.Column('request_id', sa.UUID(), nullable=True),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('client_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('receipts',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('request_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('request_id')
+    )
+    op.create_table('transactions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('request_id', sa.UUID(), nullable=True),
+    sa.Column('budget_id', sa.UUID(), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('value', sa.DECIMAL(), nullable=True),
+    sa.Column('is_income', sa.Boolean(), nullable=True),
+    sa.Column('comment', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['budget_id'], ['budgets.id'], ),
+    sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('files',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('file_paths', postgresql.ARRAY(sa.String()), nullable=False),
+    sa.Column('contract_id', sa.UUID(), nullable=True),
+    sa.Column('invoice_id', sa.UUID(), nullable=True),
+    sa.Column('receipt_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['contract_id'], ['contracts.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['receipt_id'], ['receipts.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('files')
+    op.drop_table('transactions')
+    op.drop_table('receipts')
+    op.drop_table('logs')
+    op.drop_table('invoices')
+    op.drop_table('contracts')
+    op.drop_table('role_departments')
+    op.drop_table('requests')
+    op.drop_table('budgets')
+    op.drop_table('departments')
+    op.drop_table('limits')
+    op.drop_index(op.f('ix_clients_tg_id'), table_name='clients')
+    op.drop_table('clients')
+    op.drop_table('accesses')
+    op.drop_index(op.f('ix_users_tg_id'), table_name='users')
+    op.drop_table('users')
+    op.drop_table('role_expense_types')
+    op.drop_table('permissions')
+    op.drop_table('cities')
+    op.drop_table('suppliers')
+    op.drop_table('roles')
+    op.drop_table('permission_groups')
+    op.drop_table('payment_types')
+    op.drop_table('payer_companies')
+    op.drop_table('expense_types')
+    op.drop_table('currencies')
+    op.drop_table('countries')
+    op.drop_table('buyers')
+    op.execute("DROP SEQUENCE IF EXISTS serial_number_seq")
@@ -0,0 +1,60 @@
+"""request access path indexes
+
+Indexes for the joins and filters of the budget, expense and request list queries
+in dal/dao.py. They are built CONCURRENTLY so writes to the tables are not blocked.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 13:41:44.124151
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_requests_payment_time', 'requests', ['payment_time'], None),
+    ('ix_requests_created_at', 'requests', ['created_at'], None),
+    (
+        'ix_requests_department_expense_type_payment_time',
+        'requests',
+        ['department_id', 'expense_type_id', 'payment_time'],
+        'status <> 4'
+    ),
+    ('ix_requests_open_payment_time', 'requests', ['payment_time'], 'status IN (0, 1, 2, 3, 6)'),
+    ('ix_transactions_request_id', 'transactions', ['request_id'], None),
+    ('ix_transactions_budget_id_status', 'transactions', ['budget_id', 'status'], None),
+    ('ix_logs_request_id_status_created_at', 'logs', ['request_id', 'status', 'created_at'], None),
+    (
+        'ix_budgets_department_id_expense_type_id_dates',
+        'budgets',
+        ['department_id', 'expense_type_id', 'start_date', 'finish_date'],
+        None
+    ),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,164 @@
+"""request rollups
+
+Daily aggregates behind /financier-panel (dal/dao.RequestRollupDAO). Statement
+triggers on requests, logs and transactions record the touched days in
+rollup_marks; the next refresh recomputes only those days. Every existing day is
+marked here, so the first refresh fills the table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 15:41:07.562190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+TASHKENT_DAY = "(({column}) AT TIME ZONE 'Asia/Tashkent')::date"
+
+MARK_FUNCTIONS = {
+    'mark_requests_rollups': """
+        INSERT INTO rollup_marks (axis, day, txid)
+        SELECT DISTINCT marks.axis, marks.day, txid_current()
+        FROM {rows} AS r
+        CROSS JOIN LATERAL (
+            VALUES
+                ('created', %(created)s),
+                ('payment', %(payment)s),
+                ('paid', CASE WHEN r.status = 5 THEN (
+                    SELECT %(paid)s FROM logs l WHERE l.request_id = r.id AND l.status = 5
+                ) END)
+        ) AS marks (axis, day)
+        WHERE marks.day IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    """ % {
+        'created': TASHKENT_DAY.format(column='r.created_at'),
+        'payment': TASHKENT_DAY.format(column='r.payment_time'),
+        'paid': TASHKENT_DAY.format(column='min(l.created_at)'),
+    },
+    'mark_logs_rollups': """
+        INSERT INTO rollup_marks (axis, day, txid)
+        SELECT DISTINCT marks.axis, marks.day, txid_current()
+        FROM {rows} AS l
+        LEFT JOIN requests r ON r.id = l.request_id
+        CROSS JOIN LATERAL (
+            VALUES
+                ('paid', %(paid)s),
+                ('created', %(created)s)
+        ) AS marks (axis, day)
+        WHERE l.status = 5 AND marks.day IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    """ % {
+        'paid': TASHKENT_DAY.format(column='l.created_at'),
+        'created': TASHKENT_DAY.format(column='r.created_at'),
+    },
+    'mark_transactions_rollups': """
+        INSERT INTO rollup_marks (axis, day, txid)
+        SELECT DISTINCT 'transactions', %(day)s, txid_current()
+        FROM {rows} AS t
+        WHERE t.created_at IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    """ % {
+        'day': TASHKENT_DAY.format(column='t.created_at'),
+    },
+}
+
+TABLES = {
+    'mark_requests_rollups': 'requests',
+    'mark_logs_rollups': 'logs',
+    'mark_transactions_rollups': 'transactions',
+}
+
+
+def create_mark_function(name: str, body: str) -> str:
+    # Одна функция на таблицу: переходные таблицы old_rows / new_rows есть только у своих событий
+    return f"""
+    CREATE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {body.format(rows='old_rows')}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {body.format(rows='new_rows')}
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+    """
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('request_rollups',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('axis', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('department_id', sa.UUID(), nullable=True),
+    sa.Column('expense_type_id', sa.UUID(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('approved', sa.Boolean(), nullable=True),
+    sa.Column('requests', sa.Integer(), nullable=False),
+    sa.Column('sum', sa.DECIMAL(), nullable=False),
+    sa.Column('converted_sum', sa.DECIMAL(), nullable=False),
+    sa.Column('paid_logs', sa.Integer(), nullable=False),
+    sa.Column('paid_logs_in_time', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_request_rollups_axis_day', 'request_rollups', ['axis', 'day'], unique=False)
+    op.create_table('rollup_marks',
+    sa.Column('axis', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('txid', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('axis', 'day', 'txid')
+    )
+    op.create_index('ix_logs_status_created_at', 'logs', ['status', 'created_at'], unique=False)
+    op.create_index('ix_transactions_created_at', 'transactions', ['created_at'], unique=False)
+    # ### end Alembic commands ###
+
+    for name, body in MARK_FUNCTIONS.items():
+        table = TABLES[name]
+        op.execute(create_mark_function(name, body))
+        op.execute(f"""
+            CREATE TRIGGER {table}_rollups_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_rollups_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_rollups_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+        """)
+
+    # Существующие данные: помечаем все дни, первый refresh заполнит таблицу
+    op.execute(f"""
+        INSERT INTO rollup_marks (axis, day, txid)
+        SELECT DISTINCT 'created', {TASHKENT_DAY.format(column='created_at')}, 0 FROM requests WHERE created_at IS NOT NULL
+        UNION SELECT DISTINCT 'payment', {TASHKENT_DAY.format(column='payment_time')}, 0 FROM requests WHERE payment_time IS NOT NULL
+        UNION SELECT DISTINCT 'paid', {TASHKENT_DAY.format(column='created_at')}, 0 FROM logs WHERE status = 5
+        UNION SELECT DISTINCT 'transactions', {TASHKENT_DAY.format(column='created_at')}, 0 FROM transactions WHERE created_at IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    for name, table in TABLES.items():
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER {table}_rollups_{event} ON {table}")
+        op.execute(f"DROP FUNCTION {name}()")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_transactions_created_at', table_name='transactions')
+    op.drop_index('ix_logs_status_created_at', table_name='logs')
+    op.drop_table('rollup_marks')
+    op.drop_index('ix_request_rollups_axis_day', table_name='request_rollups')
+    op.drop_table('request_rollups')
+    # ### end Alembic commands ###
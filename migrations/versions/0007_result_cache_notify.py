@@ -0,0 +1,114 @@
+"""result cache notify
+
+Statement triggers on requests, transactions and budgets that send the touched
+(department_id, month) pairs on the result_cache channel; utils/cache.listen
+drops the matching dashboard entries in every worker. NOTIFY is delivered on
+commit only, so rolled back writes invalidate nothing.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 16:20:44.918303
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+MONTH = "to_char(({column}) AT TIME ZONE 'Asia/Tashkent', 'YYYY-MM')"
+
+# (department_id, month) pairs of the changed rows; {rows} is old_rows / new_rows
+TOUCHED = {
+    'requests': """
+        SELECT r.department_id, %(month)s AS month
+        FROM {rows} AS r
+        CROSS JOIN LATERAL (VALUES (r.payment_time), (r.created_at)) AS moments (moment)
+        WHERE moments.moment IS NOT NULL
+    """ % {'month': MONTH.format(column='moments.moment')},
+    # Расход транзакции относится к месяцу оплаты заявки, приход — к месяцам бюджета
+    'transactions': """
+        SELECT coalesce(r.department_id, b.department_id), months.month
+        FROM {rows} AS t
+        LEFT JOIN requests r ON r.id = t.request_id
+        LEFT JOIN budgets b ON b.id = t.budget_id
+        CROSS JOIN LATERAL (
+            SELECT %(payment_month)s
+            UNION SELECT %(created_month)s
+            UNION SELECT to_char(generate_series(
+                date_trunc('month', b.start_date), coalesce(b.finish_date, b.start_date), interval '1 month'
+            ), 'YYYY-MM')
+        ) AS months (month)
+        WHERE months.month IS NOT NULL
+    """ % {'payment_month': MONTH.format(column='r.payment_time'), 'created_month': MONTH.format(column='t.created_at')},
+    'budgets': """
+        SELECT b.department_id, to_char(months.month, 'YYYY-MM') AS month
+        FROM {rows} AS b
+        -- без дат: month NULL, то есть все месяцы
+        LEFT JOIN LATERAL generate_series(
+            date_trunc('month', b.start_date), coalesce(b.finish_date, b.start_date), interval '1 month'
+        ) AS months (month) ON true
+    """,
+}
+
+
+def create_notify_function(table: str) -> str:
+    touched = TOUCHED[table]
+    # Слишком длинный payload (NOTIFY ограничен 8000 байт) — null, очистить всё
+    return f"""
+    CREATE FUNCTION notify_result_cache_{table}() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        payload text;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT json_agg(DISTINCT jsonb_build_array(p.department_id, p.month))::text INTO payload
+            FROM ({touched.format(rows='new_rows')}) AS p (department_id, month);
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT json_agg(DISTINCT jsonb_build_array(p.department_id, p.month))::text INTO payload
+            FROM ({touched.format(rows='old_rows')}) AS p (department_id, month);
+        ELSE
+            SELECT json_agg(DISTINCT jsonb_build_array(p.department_id, p.month))::text INTO payload
+            FROM (
+                {touched.format(rows='old_rows')}
+                UNION
+                {touched.format(rows='new_rows')}
+            ) AS p (department_id, month);
+        END IF;
+        IF payload IS NOT NULL THEN
+            IF length(payload) > 7500 THEN
+                payload := 'null';
+            END IF;
+            PERFORM pg_notify('result_cache', payload);
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+    """
+
+
+def upgrade() -> None:
+    for table in TOUCHED:
+        op.execute(create_notify_function(table))
+        op.execute(f"""
+            CREATE TRIGGER {table}_result_cache_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_result_cache_{table}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_result_cache_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_result_cache_{table}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_result_cache_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_result_cache_{table}()
+        """)
+
+
+def downgrade() -> None:
+    for table in TOUCHED:
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER {table}_result_cache_{event} ON {table}")
+        op.execute(f"DROP FUNCTION notify_result_cache_{table}()")
@@ -0,0 +1,136 @@
+"""budget ledger
+
+Running balance per department, expense type and month (dal/dao.BudgetLedgerDAO).
+Statement triggers on transactions, requests, budgets and expense_types add the
+difference a statement makes to the affected ledger rows, in the same transaction:
+the contribution of the old rows is subtracted and that of the new rows added.
+The existing history is summed here once.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 19:02:41.380515
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+# Одобренные транзакции бюджета — в каждый месяц, который покрывает бюджет
+BUDGET_ROWS = """
+    SELECT b.department_id, m.month::date AS month, b.expense_type_id, {sign}t.value AS budget, 0 AS expense
+    FROM {transactions} AS t
+    JOIN {budgets} AS b ON b.id = t.budget_id
+    CROSS JOIN LATERAL generate_series(
+        date_trunc('month', b.start_date::timestamp), b.finish_date::timestamp, interval '1 month'
+    ) AS m (month)
+    WHERE t.status = 5 AND b.department_id IS NOT NULL AND b.expense_type_id IS NOT NULL
+"""
+
+# Расход заявки — в месяц оплаты по Ташкенту, с условиями get_filtered_budget_expense
+EXPENSE_ROWS = """
+    SELECT r.department_id, date_trunc('month', r.payment_time AT TIME ZONE 'Asia/Tashkent')::date AS month,
+        r.expense_type_id, 0 AS budget, {sign}t.value AS expense
+    FROM {transactions} AS t
+    JOIN {requests} AS r ON r.id = t.request_id
+    JOIN {expense_types} AS e ON e.id = r.expense_type_id
+    WHERE t.status <> 4 AND r.status <> 4 AND r.credit IS NOT TRUE
+        AND r.department_id IS NOT NULL AND r.payment_time IS NOT NULL
+        AND (r.approved IS TRUE OR (r.approved IS FALSE AND e.purchasable IS TRUE))
+"""
+
+TABLES = {
+    'transactions': (BUDGET_ROWS, EXPENSE_ROWS),
+    'requests': (EXPENSE_ROWS,),
+    'budgets': (BUDGET_ROWS,),
+    'expense_types': (EXPENSE_ROWS,),
+}
+
+# Ряды без изменений не пишутся; порядок ключей один для всех, чтобы блокировки не пересекались
+UPSERT = """
+    INSERT INTO budget_ledger AS l (department_id, month, expense_type_id, budget, expense, updated_at)
+    SELECT department_id, month, expense_type_id, coalesce(sum(budget), 0), coalesce(sum(expense), 0), now()
+    FROM ({changes}) AS changes
+    GROUP BY department_id, month, expense_type_id
+    HAVING coalesce(sum(budget), 0) <> 0 OR coalesce(sum(expense), 0) <> 0
+    ORDER BY department_id, month, expense_type_id
+    ON CONFLICT (department_id, month, expense_type_id) DO UPDATE
+    SET budget = l.budget + excluded.budget, expense = l.expense + excluded.expense, updated_at = excluded.updated_at;
+"""
+
+
+def changes(table: str, rows: str, sign: str = "") -> str:
+    sources = {name: name for name in ('transactions', 'requests', 'budgets', 'expense_types')}
+    sources[table] = rows
+    return " UNION ALL ".join(template.format(sign=sign, **sources) for template in TABLES[table])
+
+
+def create_ledger_function(table: str) -> str:
+    # Переходные таблицы old_rows / new_rows есть только у своих событий, поэтому три ветки
+    old, new = changes(table, 'old_rows', '-'), changes(table, 'new_rows')
+    both = f"{old} UNION ALL {new}"
+    return f"""
+    CREATE FUNCTION budget_ledger_{table}() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {UPSERT.format(changes=new)}
+        ELSIF TG_OP = 'DELETE' THEN
+            {UPSERT.format(changes=old)}
+        ELSE
+            {UPSERT.format(changes=both)}
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+    """
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('budget_ledger',
+    sa.Column('department_id', sa.UUID(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('expense_type_id', sa.UUID(), nullable=False),
+    sa.Column('budget', sa.DECIMAL(), nullable=False),
+    sa.Column('expense', sa.DECIMAL(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('department_id', 'month', 'expense_type_id')
+    )
+    # ### end Alembic commands ###
+
+    for table in TABLES:
+        op.execute(create_ledger_function(table))
+        # Заявки, бюджеты и статьи удаляются только без транзакций: их вклад уже снят
+        op.execute(f"""
+            CREATE TRIGGER {table}_budget_ledger_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION budget_ledger_{table}()
+        """)
+    op.execute("""
+        CREATE TRIGGER transactions_budget_ledger_insert AFTER INSERT ON transactions
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION budget_ledger_transactions()
+    """)
+    op.execute("""
+        CREATE TRIGGER transactions_budget_ledger_delete AFTER DELETE ON transactions
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION budget_ledger_transactions()
+    """)
+
+    # Существующие данные
+    op.execute(UPSERT.format(changes=changes('transactions', 'transactions')))
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER transactions_budget_ledger_insert ON transactions")
+    op.execute("DROP TRIGGER transactions_budget_ledger_delete ON transactions")
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER {table}_budget_ledger_update ON {table}")
+        op.execute(f"DROP FUNCTION budget_ledger_{table}()")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('budget_ledger')
+    # ### end Alembic commands ###
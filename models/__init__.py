@@ -9,6 +9,14 @@ from .cities import Cities
 from .departments import Departments
 from .payer_companies import PayerCompanies
 from .currencies import Currencies
+from .exchange_rates import ExchangeRates
+from .notifications import Notifications
+from .reports import Reports
+from .request_rollups import RequestRollups
+from .rollup_marks import RollupMarks
+from .budget_ledger import BudgetLedger
+from .job_runs import JobRuns
+from .bootstrap_state import BootstrapState
 
 from .buyers import Buyers
 from .suppliers import Suppliers
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+
+from core.base import Base
+
+
+
+class BootstrapState(Base):
+    # Контрольная сумма того, что создаёт utils/bootstrap.py при старте: совпала — старт ничего не пишет
+    __tablename__ = 'bootstrap_state'
+    name = Column(String, primary_key=True)
+    checksum = Column(String(64), nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
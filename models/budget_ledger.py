@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Date, DECIMAL, DateTime, UUID, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+
+from core.base import Base
+
+
+
+class BudgetLedger(Base):
+    # Остаток бюджета по отделу, статье и месяцу (Ташкент):
+    #   budget  — одобренные (статус 5) транзакции бюджетов, покрывающих месяц
+    #   expense — транзакции заявок с оплатой в этом месяце, как в get_filtered_budget_expense (отрицательные)
+    # Ведётся триггерами на transactions, requests, budgets и expense_types (миграция 0010) в той же
+    # транзакции, что и изменение; см. dal/dao.BudgetLedgerDAO и utils/budget_ledger.py
+    __tablename__ = 'budget_ledger'
+    __table_args__ = (
+        PrimaryKeyConstraint('department_id', 'month', 'expense_type_id'),
+    )
+    department_id = Column(UUID, nullable=False)
+    month = Column(Date, nullable=False)
+    expense_type_id = Column(UUID, nullable=False)
+    budget = Column(DECIMAL, nullable=False, default=0)
+    expense = Column(DECIMAL, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
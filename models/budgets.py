@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, func, ForeignKey, DECIMAL, Date, Integer
+from sqlalchemy import Column, func, ForeignKey, DECIMAL, Date, Integer, Index
 from sqlalchemy import String, UUID, Boolean, DateTime
 from sqlalchemy.orm import relationship
 
@@ -9,6 +9,9 @@ from core.base import Base
 
 class Budgets(Base):
     __tablename__ = 'budgets'
+    __table_args__ = (
+        Index('ix_budgets_department_id_expense_type_id_dates', 'department_id', 'expense_type_id', 'start_date', 'finish_date'),
+    )
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     expense_type_id = Column(UUID, ForeignKey("expense_types.id"))
     expense_type = relationship('ExpenseTypes', back_populates='budgets')
@@ -12,6 +12,7 @@ class Currencies(Base):
     __tablename__ = 'currencies'
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
+    code = Column(String(3), nullable=True)  # ISO 4217, как в курсах cbu.uz
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
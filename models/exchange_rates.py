@@ -0,0 +1,21 @@
+import uuid
+
+from sqlalchemy import Column, DECIMAL, Date, String, UniqueConstraint
+from sqlalchemy import UUID, DateTime
+from sqlalchemy.sql import func
+
+from core.base import Base
+
+
+
+class ExchangeRates(Base):
+    # Курсы ЦБ (cbu.uz) к суму, обновляются задачей в routers/life_span.py
+    __tablename__ = 'exchange_rates'
+    __table_args__ = (
+        UniqueConstraint('ccy', 'rate_date', name='uq_exchange_rates_ccy_rate_date'),
+    )
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    ccy = Column(String(3), nullable=False)
+    rate_date = Column(Date, nullable=False)
+    rate = Column(DECIMAL, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=func.now())
@@ -0,0 +1,25 @@
+import uuid
+
+from sqlalchemy import Column, Float, Integer, String, Index
+from sqlalchemy import UUID, DateTime
+from sqlalchemy.sql import func
+
+from core.base import Base
+
+
+
+class JobRuns(Base):
+    # Запуски задач планировщика; их выполняет только лидер (utils/leader.py)
+    __tablename__ = 'job_runs'
+    __table_args__ = (
+        Index('ix_job_runs_job_started_at', 'job', 'started_at'),
+    )
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    job = Column(String, nullable=False)
+    worker = Column(String, nullable=False)  # host:pid лидера
+    status = Column(Integer, nullable=False, default=0)  # 0 - выполняется, 1 - успешно, 2 - ошибка
+    result = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)  # секунды
+    started_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,7 +1,7 @@
 import uuid
 
 from sqlalchemy import Column, ForeignKey, DateTime, func, Boolean, UUID, DECIMAL
-from sqlalchemy import Integer, String
+from sqlalchemy import Integer, String, Index
 from sqlalchemy.orm import relationship
 
 from core.base import Base
@@ -9,6 +9,11 @@ from core.base import Base
 
 class Logs(Base):
     __tablename__ = 'logs'
+    __table_args__ = (
+        Index('ix_logs_request_id_status_created_at', 'request_id', 'status', 'created_at'),
+        # дни оплаты для пересчёта request_rollups
+        Index('ix_logs_status_created_at', 'status', 'created_at'),
+    )
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     status = Column(Integer, nullable=True)
     currency = Column(String)
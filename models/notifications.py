@@ -0,0 +1,31 @@
+import uuid
+
+from sqlalchemy import Column, BigInteger, Identity, Integer, String, JSON, Index, text
+from sqlalchemy import UUID, DateTime
+from sqlalchemy.sql import func
+
+from core.base import Base
+
+
+
+class Notifications(Base):
+    # Outbox сообщений в Telegram: строка пишется в той же транзакции, что и изменение заявки,
+    # отправляет её utils/notifications.TelegramWorker
+    __tablename__ = 'notifications'
+    __table_args__ = (
+        Index('ix_notifications_pending', 'next_attempt_at', postgresql_where=text('status = 0')),
+        Index('ix_notifications_chat_pending', 'chat_id', 'number', postgresql_where=text('status = 0')),
+        Index('ix_notifications_chat_sent', 'chat_id', 'sent_at', postgresql_where=text('sent_at IS NOT NULL')),
+    )
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    number = Column(BigInteger, Identity(), nullable=False)  # порядок записи, created_at внутри транзакции одинаковый
+    bot = Column(String, nullable=False, default='main')  # main | error
+    method = Column(String, nullable=False)  # sendMessage | sendDocument
+    chat_id = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Integer, nullable=False, default=0)  # 0 - ожидает, 1 - отправлено, 2 - ошибка
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=func.now())
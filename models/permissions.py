@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, DateTime, func, Boolean
+from sqlalchemy import Column, ForeignKey, DateTime, func, Boolean, UniqueConstraint
 from sqlalchemy import Integer, String, UUID
 from sqlalchemy.orm import relationship
 from core.base import Base
@@ -8,6 +8,10 @@ from core.base import Base
 
 class Permissions(Base):
     __tablename__ = 'permissions'
+    __table_args__ = (
+        # Ключ, по которому utils/bootstrap находит уже созданные права
+        UniqueConstraint('group_id', 'name', name='uq_permissions_group_id_name'),
+    )
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     action = Column(String, unique=True)
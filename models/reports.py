@@ -0,0 +1,33 @@
+import uuid
+
+from sqlalchemy import Column, ForeignKey, Integer, String, JSON, Index, text
+from sqlalchemy import UUID, DateTime
+from sqlalchemy.sql import func
+
+from core.base import Base
+
+
+
+class Reports(Base):
+    # Фоновые выгрузки: POST /reports ставит задачу, utils/reports.ReportWorker строит файл в отдельном процессе
+    __tablename__ = 'reports'
+    __table_args__ = (
+        # Одинаковые фильтры одного пользователя (он входит в filters_hash), пока задача не готова, получают одну задачу
+        Index('uq_reports_active_filters', 'kind', 'filters_hash', unique=True, postgresql_where=text('status IN (0, 1)')),
+        Index('ix_reports_expires_at', 'expires_at'),
+    )
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False, default='requests')
+    filters = Column(JSON, nullable=False)
+    filters_hash = Column(String(64), nullable=False)
+    status = Column(Integer, nullable=False, default=0)  # 0 - в очереди, 1 - строится, 2 - готов, 3 - ошибка
+    progress = Column(Integer, nullable=False, default=0)  # записано строк
+    total = Column(Integer, nullable=True)
+    file_path = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    user_id = Column(UUID, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
+    created_at = Column(DateTime(timezone=True), default=func.now())
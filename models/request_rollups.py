@@ -0,0 +1,33 @@
+import uuid
+
+from sqlalchemy import Column, Boolean, Date, DECIMAL, Integer, String, Index
+from sqlalchemy import UUID
+
+from core.base import Base
+
+
+
+class RequestRollups(Base):
+    # Предагрегаты для /financier-panel по дням (Ташкент) и осям:
+    #   created  — день created_at заявки, с числом дней оплаты (логи статуса 5) и оплат в срок
+    #   payment  — день payment_time
+    #   paid     — день первого лога со статусом 5 (только оплаченные заявки)
+    #   transactions — день created_at транзакции, по статусу
+    # Пересчитываются по дням из rollup_marks, см. dal/dao.RequestRollupDAO
+    __tablename__ = 'request_rollups'
+    __table_args__ = (
+        Index('ix_request_rollups_axis_day', 'axis', 'day'),
+    )
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    axis = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    department_id = Column(UUID, nullable=True)
+    expense_type_id = Column(UUID, nullable=True)
+    currency = Column(String, nullable=True)
+    status = Column(Integer, nullable=True)
+    approved = Column(Boolean, nullable=True)
+    requests = Column(Integer, nullable=False, default=0)
+    sum = Column(DECIMAL, nullable=False, default=0)
+    converted_sum = Column(DECIMAL, nullable=False, default=0)  # сумма в валюте заявки: sum / exchange_rate
+    paid_logs = Column(Integer, nullable=False, default=0)
+    paid_logs_in_time = Column(Integer, nullable=False, default=0)
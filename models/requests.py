@@ -1,6 +1,7 @@
 import uuid
 
 from sqlalchemy import Column, ForeignKey, DateTime, func, Boolean, UUID, DECIMAL, Text, Integer, BIGINT, String
+from sqlalchemy import Index, text
 from sqlalchemy.orm import relationship
 
 from core.base import Base
@@ -9,6 +10,16 @@ from core.session import serial_seq
 
 class Requests(Base):
     __tablename__ = 'requests'
+    __table_args__ = (
+        # budget and expense sums by department / expense type and payment date; they all skip cancelled (4)
+        Index(
+            'ix_requests_department_expense_type_payment_time',
+            'department_id', 'expense_type_id', 'payment_time',
+            postgresql_where=text('status <> 4')
+        ),
+        # unpaid and delayed requests, status updater job
+        Index('ix_requests_open_payment_time', 'payment_time', postgresql_where=text('status IN (0, 1, 2, 3, 6)')),
+    )
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     number = Column(BIGINT, serial_seq, server_default=serial_seq.next_value(), unique=True, nullable=False)
     sum = Column(DECIMAL, nullable=False)
@@ -22,7 +33,7 @@ class Requests(Base):
     checked_by_financier = Column(Boolean, nullable=True)
     to_accounting = Column(Boolean, default=False)
     to_transfer = Column(Boolean, default=False)
-    payment_time = Column(DateTime(timezone=True))
+    payment_time = Column(DateTime(timezone=True), index=True)
     payment_card = Column(String)
     currency = Column(String)
     exchange_rate = Column(DECIMAL)
@@ -56,8 +67,8 @@ class Requests(Base):
     # supplier = relationship('Suppliers', back_populates='requests') # lazy="selectin"
     city_id = Column(UUID, ForeignKey("cities.id", ondelete="SET NULL"), nullable=True)
     city = relationship('Cities', back_populates='requests')
-    logs = relationship('Logs', back_populates='request', cascade="all, delete") # lazy="selectin"
+    logs = relationship('Logs', back_populates='request', cascade="all, delete", order_by='Logs.created_at') # lazy="selectin"
     transaction = relationship('Transactions', back_populates='request')
-    created_at = Column(DateTime(timezone=True), default=func.now())
+    created_at = Column(DateTime(timezone=True), default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
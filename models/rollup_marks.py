@@ -0,0 +1,16 @@
+from sqlalchemy import Column, BigInteger, Date, String, PrimaryKeyConstraint
+
+from core.base import Base
+
+
+
+class RollupMarks(Base):
+    # Дни request_rollups, которые нужно пересчитать. Пишутся триггерами на requests, logs и
+    # transactions (миграция 0006); txid — чтобы пересчёт не удалил отметку незавершённой транзакции
+    __tablename__ = 'rollup_marks'
+    __table_args__ = (
+        PrimaryKeyConstraint('axis', 'day', 'txid'),
+    )
+    axis = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    txid = Column(BigInteger, nullable=False)
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, func, ForeignKey, DECIMAL, Date, Integer
+from sqlalchemy import Column, func, ForeignKey, DECIMAL, Date, Integer, Index
 from sqlalchemy import String, UUID, Boolean, DateTime
 from sqlalchemy.orm import relationship
 
@@ -9,8 +9,12 @@ from core.base import Base
 
 class Transactions(Base):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        Index('ix_transactions_budget_id_status', 'budget_id', 'status'),
+        Index('ix_transactions_created_at', 'created_at'),
+    )
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
-    request_id = Column(UUID, ForeignKey("requests.id"))
+    request_id = Column(UUID, ForeignKey("requests.id"), index=True)
     request = relationship('Requests', back_populates='transaction')
     budget_id = Column(UUID, ForeignKey("budgets.id"))
     budget = relationship('Budgets', back_populates='transactions')
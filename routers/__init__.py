@@ -25,4 +25,5 @@ from .purchase import purchase_router
 from .countries import countries_router
 from .cities import cities_router
 from .financier_checks import checker_router
-from .request_invoices import invoice_router
\ No newline at end of file
+from .request_invoices import invoice_router
+from .reports import reports_router
\ No newline at end of file
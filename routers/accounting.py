@@ -3,14 +3,16 @@ from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
 from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import coalesce
 
-from core.session import get_db
-from dal.dao import RequestDAO, UserDAO, ClientDAO
+from core.session import get_db, execute
+from dal.dao import RequestDAO, ClientDAO
+from schemas.pagination import KeysetPage
 from schemas.requests import Requests
+from utils.scope import RoleScope, role_scope
 from utils.utils import PermissionChecker
 
 
@@ -19,7 +21,7 @@ accounting_router = APIRouter()
 
 
 
-@accounting_router.get("/accounting", response_model=Page[Requests])
+@accounting_router.get("/accounting", response_model=KeysetPage[Requests])
 async def get_accounting(
         number: Optional[int] = None,
         client: Optional[str] = None,
@@ -34,8 +36,10 @@ async def get_accounting(
         created_at: Optional[date] = None,
         payment_date: Optional[date] = None,
         status: Optional[str] = "1,2,3,5,6",
+        cursor: Optional[int] = None,
         db: Session = Depends(get_db),
-        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["accounting"]}))
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["accounting"]})),
+        scope: RoleScope = Depends(role_scope)
 ):
     filters = {}
     if number is not None:
@@ -67,20 +71,21 @@ async def get_accounting(
         filters["payment_time"] = None
 
     if client is not None:
-        query = await ClientDAO.get_all(session=db, filters={"fullname": client})
-        clients = db.execute(query).scalars().all()
+        query = await ClientDAO.get_all(session=db, filters={"fullname": client}, profile=())
+        clients = (await execute(db, query)).scalars().all()
         filters["client_id"] = [client.id for client in clients]
 
     if filters.get("department_id", None) is None:
-        user = await UserDAO.get_by_attributes(session=db, filters={"id": current_user["id"]}, first=True)
-        role_department_relations = user.role.roles_departments
-        role_departments = [relation.department_id for relation in role_department_relations]
-        filters["department_id"] = role_departments
+        filters["department_id"] = scope.departments
 
     query = await RequestDAO.get_all(
         session=db,
         filters=filters if filters else None
     )
-    result = db.execute(query.order_by(RequestDAO.model.number.desc())).scalars().all()
-    return paginate(result)
+    return await RequestDAO.paginate(
+        session=db,
+        query=query.order_by(RequestDAO.model.number.desc()),
+        cursor=cursor,
+        cursor_column=RequestDAO.model.number
+    )
 
@@ -6,9 +6,10 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from core.session import get_db
-from dal.dao import BudgetDAO
+from core.session import get_db, refresh, commit
+from dal.dao import BudgetDAO, BudgetLedgerDAO
 from schemas.budgets import Budgets, CreateBudget, Budget
+from utils.cache import result_cache, month_span
 from utils.utils import PermissionChecker
 
 budgets_router = APIRouter()
@@ -36,8 +37,8 @@ async def create_budget(
         raise HTTPException(status_code=400, detail="Данный бюджет уже создан !")
 
     obj = await BudgetDAO.add(session=db, **body.model_dump())
-    db.commit()
-    db.refresh(obj)
+    await commit(db)
+    await refresh(db, obj)
     return obj
 
 
@@ -50,37 +51,27 @@ async def get_budget_list(
         db: Session = Depends(get_db),
         current_user: dict = Depends(PermissionChecker(required_permissions={"Бюджеты": ["read"]}))
 ):
-    filters = {
-        "department_id": department_id,
-        "start_date": start_date,
-        "finish_date": finish_date
-    }
-    objs = await BudgetDAO.get_by_attributes(session=db, filters=filters)
-    for obj in objs:
-        budget = (await BudgetDAO.get_budget_sum(session=db, budget_id=obj.id))[0]
-        budget = budget if budget is not None else 0
-        obj.value = budget
-        expense = (await BudgetDAO.get_filtered_budget_expense(
-            session=db,
-            department_id=department_id,
-            expense_type_id=obj.expense_type_id,
-            start_date=start_date,
-            finish_date=finish_date
-        ))[0]
-        expense = -expense if expense is not None else 0
-        obj.expense_value = expense
-        balance = budget - expense
-        obj.balance_value = balance
-        delayed = (await BudgetDAO.get_budget_delayed_sum(
-            session=db,
-            department_id=department_id,
-            expense_type_id=obj.expense_type_id,
-            start_date=start_date,
-            finish_date=finish_date
-        ))[0]
-        obj.delayed = -delayed if delayed is not None else 0
-
-    return objs
+    return await result_cache.get_or_compute(
+        "/budgets",
+        {"department_id": department_id, "start_date": start_date, "finish_date": finish_date},
+        current_user.get("role_id"),
+        lambda: compute_budgets(db, department_id, start_date, finish_date),
+        departments={department_id},
+        months=month_span(start_date, finish_date)
+    )
+
+
+async def compute_budgets(db, department_id: UUID, start_date: date, finish_date: date):
+    rows = await BudgetDAO.get_department_budgets(
+        session=db, department_id=department_id, start_date=start_date, finish_date=finish_date
+    )
+    objs = []
+    for obj, value, expense_value, balance_value, delayed in rows:
+        obj.value, obj.expense_value, obj.balance_value, obj.delayed = value, expense_value, balance_value, delayed
+        objs.append(obj)
+
+    # В кэше — схемы ответа, а не объекты сессии
+    return [Budgets.model_validate(obj) for obj in objs]
 
 
 
@@ -107,20 +98,30 @@ async def get_budget_balance(
     if not obj:
         raise HTTPException(status_code=400, detail="По указанным промежуткам дат баланс бюджета не найден !")
 
+    start_date = current_date if start_date is None else start_date
+    finish_date = current_date if finish_date is None else finish_date
+    # Один день или целый месяц — одна строка budget_ledger; прочие промежутки считаются по транзакциям
+    whole_month = start_date.day == 1 and finish_date.day == calendar.monthrange(finish_date.year, finish_date.month)[1]
+    if (start_date.year, start_date.month) == (finish_date.year, finish_date.month) and (start_date == finish_date or whole_month):
+        obj.value = await BudgetLedgerDAO.get_balance(
+            session=db, department_id=department_id, expense_type_id=expense_type_id, payment_time=start_date
+        )
+        return obj
+
     budget = (await BudgetDAO.get_filtered_budget_sum(
         session=db,
         department_id=department_id,
         expense_type_id=expense_type_id,
-        start_date=current_date if start_date is None else start_date,
-        finish_date=current_date if finish_date is None else finish_date
+        start_date=start_date,
+        finish_date=finish_date
     ))[0]
     budget = budget if budget is not None else 0
     expense = (await BudgetDAO.get_filtered_budget_expense(
         session=db,
         department_id=department_id,
         expense_type_id=expense_type_id,
-        start_date=current_date if start_date is None else start_date,
-        finish_date=current_date if finish_date is None else finish_date
+        start_date=start_date,
+        finish_date=finish_date
     ))[0]
     expense = -expense if expense is not None else 0
     obj.value = budget - expense
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import BuyerDAO
 from schemas.buyers import Buyer, Buyers, CreateBuyer, UpdateBuyer
 from utils.utils import PermissionChecker
@@ -26,8 +26,8 @@ async def create_buyer(
     body_dict = body.model_dump(exclude_unset=True)
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
     created_obj = await BuyerDAO.add(session=db, **body_dict)
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -66,8 +66,8 @@ async def update_buyer(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_obj = await BuyerDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_obj)
+    await commit(db)
+    await refresh(db, updated_obj)
     return updated_obj
 
 
@@ -79,6 +79,6 @@ async def delete_buyer(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Закупщики": ["delete"]}))
 ):
     deleted_objs = await BuyerDAO.delete(session=db, filters={"id": id})
-    db.commit()
+    await commit(db)
     return deleted_objs
 
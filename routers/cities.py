@@ -5,7 +5,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import CityDAO, LimitDAO
 from schemas.cities import CreateCity, City, Cities, UpdateCity
 from utils.utils import PermissionChecker
@@ -36,7 +36,7 @@ async def create_city(
             }
         )
 
-    db.commit()
+    await commit(db)
     return {"success": True}
 
 
@@ -81,7 +81,7 @@ async def update_city(
     limit_obj = await LimitDAO.get_by_attributes(session=db, filters={"city_id": updated_city.id}, first=True)
     if limit_obj is not None and body.limit is not None:
         await LimitDAO.update(session=db, data={"id": limit_obj.id, "value": body.limit})
-    db.commit()
-    db.refresh(updated_city)
+    await commit(db)
+    await refresh(db, updated_city)
     return updated_city
 
@@ -3,11 +3,11 @@ from typing import Optional, List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, flush, refresh, commit
 from dal.dao import ClientDAO, DepartmentDAO, UserDAO
 from schemas.clients import Clients, Client, UpdateClient, CreateClient
 from utils.utils import PermissionChecker
@@ -24,8 +24,8 @@ async def create_client(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Клиенты": ["create"]}))
 ):
     obj = await ClientDAO.add(session=db, **body.model_dump())
-    db.commit()
-    db.refresh(obj)
+    await commit(db)
+    await refresh(db, obj)
     return obj
 
 
@@ -49,8 +49,7 @@ async def get_client_list(
         filters["is_active"] = is_active
 
     query = await ClientDAO.get_all(session=db, filters=filters if filters else None)
-    result = db.execute(query).scalars().all()
-    return paginate(result)
+    return await ClientDAO.paginate(session=db, query=query.order_by(ClientDAO.model.created_at, ClientDAO.model.id))
 
 
 
@@ -98,13 +97,13 @@ async def update_client(
     body_dict = body.model_dump(exclude_unset=True)
     updated_client = await ClientDAO.update(session=db, data=body_dict)
 
-    db.flush()
+    await flush(db)
 
     if updated_client.user_id is not None:
         await UserDAO.update(session=db, data={"id": body.user_id, "phone": updated_client.phone})
 
-    db.commit()
-    db.refresh(updated_client)
+    await commit(db)
+    await refresh(db, updated_client)
     return updated_client
 
 
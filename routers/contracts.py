@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import ContractDAO
 from schemas.contracts import Contract, CreateContract
 from utils.utils import PermissionChecker
@@ -21,8 +21,8 @@ async def create_contract(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Контракты": ["create"]}))
 ):
     created_obj = await ContractDAO.add(session=db, **body.model_dump())
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -5,7 +5,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import CountryDAO
 from schemas.countries import CreateCountry, Country, Countries, UpdateCountry
 from utils.utils import PermissionChecker
@@ -26,7 +26,7 @@ async def create_country(
     body_dict = body.model_dump(exclude_unset=True)
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
     await CountryDAO.add(session=db, **body_dict)
-    db.commit()
+    await commit(db)
     return {"success": True}
 
 
@@ -63,7 +63,7 @@ async def update_country(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_obj = await CountryDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_obj)
+    await commit(db)
+    await refresh(db, updated_obj)
     return updated_obj
 
@@ -5,9 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi_pagination import Page, paginate
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, execute, refresh, commit
 from dal.dao import CurrencyDAO
 from schemas.currencies import Currency, CreateCurrency, Currencies, UpdateCurrency
+from utils import exchange_rates
 from utils.utils import PermissionChecker
 
 
@@ -25,7 +26,8 @@ async def create_currency(
     body_dict = body.model_dump(exclude_unset=True)
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
     created_currency = await CurrencyDAO.add(session=db, **body_dict)
-    db.commit()
+    await commit(db)
+    exchange_rates.clear_cache()
     return created_currency
 
 
@@ -38,7 +40,7 @@ async def get_currency_list(
     filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user"]}
 
     query = await CurrencyDAO.get_all(session=db, filters=filters if filters else None)
-    currencies = db.execute(query).scalars().all()
+    currencies = (await execute(db, query)).scalars().all()
     return currencies
 
 
@@ -63,8 +65,9 @@ async def update_currency(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_currency = await CurrencyDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_currency)
+    await commit(db)
+    exchange_rates.clear_cache()
+    await refresh(db, updated_currency)
     return updated_currency
 
 
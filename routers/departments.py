@@ -4,12 +4,14 @@ from typing import Optional, List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import DepartmentDAO, UserDAO, TransactionDAO, RoleDepartmentDAO
 from schemas.departments import Department, CreateDepartment, Departments, UpdateDepartment
+from utils.cache import result_cache, month_span, notify_roles, invalidate_roles
+from utils.scope import RoleScope, role_scope
 from utils.utils import PermissionChecker
 
 departments_router = APIRouter()
@@ -43,7 +45,12 @@ async def create_department(
                 "department_id": created_department.id
             }
         )
-    db.commit()
+    # Новый отдел попадает в области этих ролей
+    for role_id in role_ids:
+        await notify_roles(db, role_id)
+    await commit(db)
+    for role_id in role_ids:
+        invalidate_roles(role_id)
     # db.refresh(created_department)
     return created_department
 
@@ -55,29 +62,30 @@ async def get_department_list(
         finish_date: Optional[date] = None,
         purchasable: Optional[bool] = None,
         db: Session = Depends(get_db),
-        current_user: dict = Depends(PermissionChecker(required_permissions={"Отделы": ["read", "accounting", "transfer", "list"]}))
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Отделы": ["read", "accounting", "transfer", "list"]})),
+        scope: RoleScope = Depends(role_scope)
 ):
     filters = {}
     if name is not None:
         filters["name"] = name
     if purchasable is not None:
         filters["purchasable"] = purchasable
+    # Роль без отделов видит все
+    restricted = scope.role_name != "Администратор" and scope.departments
 
-    departments = await DepartmentDAO.get_by_attributes(session=db, filters=filters if filters else None)
-    user = await UserDAO.get_by_attributes(session=db, filters={"id": current_user["id"]}, first=True)
-    if user.role.name != "Администратор":
-        role_department_relations = user.role.roles_departments
-        role_departments = [relation.department_id for relation in role_department_relations]
-        departments = [department for department in departments if department.id in role_departments] if role_departments else [department for department in departments]
-    for department in departments:
-        budget = (
-            await DepartmentDAO.get_department_total_budget(
-                session=db, department_id=department.id, start_date=start_date, finish_date=finish_date, payment_date=None
-            )
-        )[0]
-        department.total_budget = budget
+    query = await DepartmentDAO.get_all_with_total_budget(
+        filters=filters, department_ids=scope.departments if restricted else None,
+        start_date=start_date, finish_date=finish_date
+    )
 
-    return paginate(departments)
+    def with_total_budget(rows):
+        departments = []
+        for department, total_budget in rows:
+            department.total_budget = total_budget
+            departments.append(department)
+        return departments
+
+    return await DepartmentDAO.paginate(session=db, query=query, transformer=with_total_budget)
 
 
 @departments_router.get("/departments/{id}", response_model=Department)
@@ -88,6 +96,17 @@ async def get_department(
         db: Session = Depends(get_db),
         current_user: dict = Depends(PermissionChecker(required_permissions={"Отделы": ["read"]}))
 ):
+    return await result_cache.get_or_compute(
+        "/departments/{id}",
+        {"id": id, "start_date": start_date, "finish_date": finish_date},
+        current_user.get("role_id"),
+        lambda: compute_department(db, id, start_date, finish_date),
+        departments={id},
+        months=month_span(start_date, finish_date)
+    )
+
+
+async def compute_department(db, id: UUID, start_date: date, finish_date: date):
     department = await DepartmentDAO.get_by_attributes(session=db, filters={"id": id}, first=True)
     if department is None:
         raise HTTPException(status_code=400, detail="Отдел не найден!")
@@ -120,7 +139,8 @@ async def get_department(
     # Convert defaultdict to a list of dictionaries
     department.monthly_budget = [{year: dict(months)} for year, months in result_dict.items()]
 
-    return department
+    # В кэше — схема ответа, а не объект сессии
+    return Department.model_validate(department)
 
 
 @departments_router.put("/departments", response_model=Department)
@@ -131,8 +151,8 @@ async def update_department(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_department = await DepartmentDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_department)
+    await commit(db)
+    await refresh(db, updated_department)
     return updated_department
 
 
@@ -6,10 +6,11 @@ from fastapi_pagination import Page, paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import ExpenseTypeDAO
 from schemas.departments import Department, CreateDepartment, Departments, UpdateDepartment
 from schemas.expense_types import CreateExpenseType, ExpenseType, ExpenseTypes, UpdateExpenseType
+from utils.cache import notify_roles, invalidate_roles
 from utils.utils import PermissionChecker
 
 
@@ -27,8 +28,8 @@ async def create_expense_type(
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
 
     created_obj = await ExpenseTypeDAO.add(session=db, **body_dict)
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -69,9 +70,15 @@ async def update_expense_type(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Типы расходов": ["update"]}))
 ):
     body_dict = body.model_dump(exclude_unset=True)
+    # checkable входит в области ролей (checkable_expense_types)
+    checkable_changed = "checkable" in body_dict
     updated_obj = await ExpenseTypeDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_obj)
+    if checkable_changed:
+        await notify_roles(db)
+    await commit(db)
+    if checkable_changed:
+        invalidate_roles()
+    await refresh(db, updated_obj)
     return updated_obj
 
 
@@ -82,6 +89,9 @@ async def delete_expense_type(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Типы расходов": ["delete"]}))
 ):
     deleted_objs = await ExpenseTypeDAO.delete(session=db, filters={"id": id})
-    db.commit()
+    # Удалённая статья выходит из областей ролей
+    await notify_roles(db)
+    await commit(db)
+    invalidate_roles()
     return deleted_objs
 
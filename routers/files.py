@@ -9,10 +9,6 @@ from fastapi import Depends, File
 from utils.utils import PermissionChecker
 
 from fastapi import FastAPI, Request, HTTPException, status
-from streaming_form_data import StreamingFormDataParser
-from streaming_form_data.targets import FileTarget, ValueTarget
-from streaming_form_data.validators import MaxSizeValidator
-import streaming_form_data
 from starlette.requests import ClientDisconnect
 from urllib.parse import unquote
 import os
@@ -93,6 +89,12 @@ class MaxBodySizeValidator:
 
 @files_router.post('/files/upload/bot/2')
 async def upload(request: Request):
+    # streaming_form_data.targets тянет smart_open и requests: грузим при первой загрузке, не при старте
+    import streaming_form_data
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import FileTarget, ValueTarget
+    from streaming_form_data.validators import MaxSizeValidator
+
     body_validator = MaxBodySizeValidator(MAX_REQUEST_BODY_SIZE)
     filename = request.headers.get('filename')
     base_dir = "files"
@@ -7,8 +7,9 @@ from fastapi_pagination import Page, paginate
 from sqlalchemy.orm import Session
 
 from core.session import get_db
-from dal.dao import RequestDAO, ClientDAO, DepartmentDAO, ExpenseTypeDAO, RoleExpenseTypeDAO
+from dal.dao import RequestDAO, ClientDAO, DepartmentDAO, ExpenseTypeDAO
 from schemas.requests import Requests
+from utils.scope import RoleScope, role_scope
 from utils.utils import PermissionChecker
 
 checker_router = APIRouter()
@@ -32,19 +33,17 @@ async def get_unchecked_requests(
         # status: Optional[str] = "0,1,2,3,4,5,6",
         status: Optional[str] = "0",
         db: Session = Depends(get_db),
-        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["checkable requests"]}))
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["checkable requests"]})),
+        scope: RoleScope = Depends(role_scope)
 ):
-    filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user"]}
+    filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user", "scope"]}
 
     # if expense_type_id is None:
     #     expense_types = await ExpenseTypeDAO.get_by_attributes(session=db, filters={"checkable": True})
     #     filters["expense_type_id"] = [expense_type.id for expense_type in expense_types]
 
-    role_expense_types = await RoleExpenseTypeDAO.get_by_attributes(session=db, filters={"role_id": current_user.get("role_id")})
-
-    if role_expense_types:
-        expense_type_ids = [rel.expense_type_id for rel in role_expense_types if rel.expense_type.checkable is True]
-        filters["expense_type_id"] = expense_type_ids
+    if scope.expense_types:
+        filters["expense_type_id"] = scope.checkable_expense_types
         # filters.pop("checked_by_financier", None)
 
     if client is not None:
@@ -58,6 +57,5 @@ async def get_unchecked_requests(
     if query is None:
         return paginate([])
 
-    result = db.execute(query.order_by(RequestDAO.model.number.desc())).scalars().all()
-    return paginate(result)
+    return await RequestDAO.paginate(session=db, query=query.order_by(RequestDAO.model.number.desc()))
 
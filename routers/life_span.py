@@ -1,34 +1,31 @@
 import asyncio
 import threading
+import time
 from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, date
 
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import Depends
-from sqlalchemy import text, and_, func, select
+from sqlalchemy import text, select
 from sqlalchemy.orm import Session
 
 from core.config import settings
 from core.session import session_maker, create_sequence, get_db
-from dal.dao import PermissionGroupDAO, PermissionDAO, RoleDAO, AccessDAO, UserDAO, RequestDAO, TransactionDAO
-from utils.permissions import permission_groups
-from utils.utils import Hasher, send_telegram_message
+from dal.dao import RequestDAO, RequestRollupDAO
+from utils.bootstrap import bootstrap
+from utils.exchange_rates import refresh_exchange_rates
+from utils.notifications import TelegramWorker
+from utils.reports import ReportWorker, cleanup_reports
+from utils.cache import listen
+from utils.leader import LeaderLease, record_run
 
 timezonetash = pytz.timezone('Asia/Tashkent')
 
-# ✅ Get the main event loop at startup
-main_loop = asyncio.new_event_loop()
-asyncio.set_event_loop(main_loop)
-
-
-scheduler = BackgroundScheduler()
-
-if not scheduler.running:
-    print("🚀 Starting scheduler...")
-    scheduler.start()  # ✅ Start only once
+# ✅ The scheduler, its event loop thread and the leader lease are created by run_background()
+# in the lifespan, not at import: importing the app (tests, scripts, --reload) starts nothing
+main_loop = None
+scheduler = None
+leader = None
 
 
 # scheduler_lock = threading.Lock()
@@ -42,9 +39,9 @@ def get_scheduler():
 
 
 
-#create new permission
+#---------------------- PERMISSIONS, ROLE AND USER FOR DEFAULT ADMIN USER --------------------------
 @asynccontextmanager
-async def create_permissions_lifespan():
+async def bootstrap_lifespan():
     @contextmanager
     def get_session():
         with session_maker() as session:
@@ -52,34 +49,21 @@ async def create_permissions_lifespan():
             session.close()
 
     with get_session() as session:
-        for key, value in permission_groups.items():
-            permission_group = await PermissionGroupDAO.get_by_attributes(session=session, filters={"name": key}, first=True)
-            if permission_group:
-                permission_group_id = permission_group.id
-            else:
-                permission_group = await PermissionGroupDAO.add(session=session, **{"name": key})
-                permission_group_id = permission_group.id
-
-            # print("created permission_group: ", permission_group)
-            # if permission_group is not None:
-            #     permission_group_id = permission_group.id
-
-            for name, action in value.items():
-                permission = await PermissionDAO.get_by_attributes(session=session, filters={"group_id": permission_group_id, "name": name}, first=True)
-                # print("permission: ", permission)
-                if permission is None:
-                    created_permission = await PermissionDAO.add(session=session, **{"name": name, "action": action, "group_id": permission_group_id})
-                    # print("created permission: ", created_permission)
-
+        # Одна транзакция; при неизменных правах — только чтение контрольной суммы
+        started = time.perf_counter()
+        try:
+            changed = await bootstrap(session=session)
             session.commit()
+            print(f"Bootstrap {'applied' if changed else 'unchanged'} in {time.perf_counter() - started:.3f}s")
+        except Exception as e:
+            session.rollback()
+            print("Bootstrap error: ", e)
 
     yield  #--------------  HERE YOU CAN WRITE LOG ON CLOSING AFTER YIELD ------------
 
 
 
-#---------------------- CREATE ROLE AND USERS FOR DEFAULT ADMIN USER --------------------------
-@asynccontextmanager
-async def create_role_lifespan():
+async def request_status_update():
     @contextmanager
     def get_session():
         with session_maker() as session:
@@ -87,42 +71,37 @@ async def create_role_lifespan():
             session.close()
 
     with get_session() as session:
-        role = await RoleDAO.get_by_attributes(session=session, filters={"name": settings.admin_role, "description": 'Superuser'}, first=True)
-        if not role:
-            role = await RoleDAO.add(session=session, **{"name": settings.admin_role, "description": 'Superuser'})
-
-        if role is not None:
-            role_id = role.id
-            role_permissions = []
-            if role.accesses is not None:
-                for access in role.accesses:
-                    role_permissions.append(access.permission.action)
-
-            for key, value in permission_groups.items():
-                for name, action in value.items():
-                    if action not in role_permissions:
-                        permission = await PermissionDAO.get_by_attributes(session=session, filters={"action": action}, first=True)
-                        # print("Permission: ", permission.action)
-                        if permission is not None:
-                            await AccessDAO.add(session=session, **{"permission_id": permission.id, "role_id": role_id})
-                            session.commit()
-
-
-            user = await UserDAO.add(
-                session=session,
-                **{
-                    "username": settings.admin_role,
-                    "password": Hasher.get_password_hash(settings.admin_password),
-                    "role_id": role_id
-                }
-            )
+        print("\n--------- Started request status updater job working every 30 minutes ------------\n")
+        today = datetime.now(timezonetash).date()
+        try:
+            # Два UPDATE на весь набор заявок; транзакции и уведомления клиентам в тех же запросах
+            due = await RequestDAO.mark_payment_due(session=session, day=today)
+            overdue = await RequestDAO.mark_overdue(session=session, day=today)
             session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return f"Requests due today: {due}, overdue: {overdue}"
 
-    yield  #--------------  HERE YOU CAN WRITE LOG ON CLOSING AFTER YIELD ------------
 
+async def exchange_rates_update():
+    @contextmanager
+    def get_session():
+        with session_maker() as session:
+            yield session  # Ensure session is properly yielded
+            session.close()
+
+    with get_session() as session:
+        try:
+            count = await refresh_exchange_rates(session=session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return f"Exchange rates updated: {count}"
 
 
-async def request_status_update():
+async def reports_cleanup():
     @contextmanager
     def get_session():
         with session_maker() as session:
@@ -130,74 +109,75 @@ async def request_status_update():
             session.close()
 
     with get_session() as session:
-        print("\n--------- Started request status updater job working every 30 minutes ------------\n")
-        today = date.today()
-        today_query = await RequestDAO.get_all(
-            session=session,
-            filters={
-                "status": [1, 6],
-                "payment_time": today,
-                "approved": True
-            }
-        )
-        today_requests = session.execute(today_query).scalars().all()
-        for request in today_requests:
-            # time.sleep(1)
-            updated_request = await RequestDAO.update(session=session, data={"id": request.id, "status": 2})
-            transaction = await TransactionDAO.get_by_attributes(session=session, filters={"request_id": updated_request.id},
-                                                                 first=True)
-            if transaction:
-                data = {
-                    "id": transaction.id,
-                    "status": updated_request.status
-                }
-                await TransactionDAO.update(session=session, data=data)
-
-            try:
-                send_telegram_message(
-                    chat_id=request.client.tg_id,
-                    message_text=f"Сегодня срок оплаты вашей заявки #{request.number}s"
-                )
-            except Exception as e:
-                print("Sending Error: ", e)
-
-        expired_requests = session.query(RequestDAO.model).filter(
-            and_(
-                RequestDAO.model.status.in_([1, 2, 3, 6]),
-                RequestDAO.model.approved == True,
-                func.date(RequestDAO.model.payment_time) < today
-            )
-        ).all()
-        for request in expired_requests:
-            # time.sleep(1)
-            updated_request = await RequestDAO.update(session=session, data={"id": request.id, "status": 3})
-            transaction = await TransactionDAO.get_by_attributes(session=session,
-                                                                 filters={"request_id": updated_request.id},
-                                                                 first=True)
-            if transaction:
-                data = {
-                    "id": transaction.id,
-                    "status": updated_request.status
-                }
-                await TransactionDAO.update(session=session, data=data)
-
-        session.commit()
-
-
-
-# ✅ Use `run_coroutine_threadsafe` to run async function from a thread
-def run_async_job():
-    future = asyncio.run_coroutine_threadsafe(request_status_update(), main_loop)
-    future.result()  # Ensures exceptions are properly raised
+        try:
+            count = await cleanup_reports(session=session)
+        except Exception:
+            session.rollback()
+            raise
+        return f"Expired reports removed: {count}"
+
+
+async def rollups_refresh():
+    @contextmanager
+    def get_session():
+        with session_maker() as session:
+            yield session  # Ensure session is properly yielded
+            session.close()
+
+    with get_session() as session:
+        try:
+            await RequestRollupDAO.refresh(session=session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
+def leader_job(job_id: str, job):
+    # ✅ Планировщик есть в каждом воркере, задачу выполняет только лидер; запуск пишется в job_runs
+    def run():
+        if not leader.is_leader():
+            return
+        future = asyncio.run_coroutine_threadsafe(record_run(session_maker, job_id, job), main_loop)
+        future.result()  # Ensures exceptions are properly raised
+    return run
+
+
+def elect_leader():
+    # Проверка аренды у лидера и попытка её взять у остальных: так лидер сменяется, если прежний упал
+    leader.is_leader()
 
 
 async def status_updater():
-    job_scheduler: BackgroundScheduler = get_scheduler()
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    job_scheduler = get_scheduler()
+    job_scheduler.add_job(
+        elect_leader,
+        trigger=IntervalTrigger(seconds=int(settings.LEADER_RETRY_SECONDS)),
+        id='elect_leader',
+        next_run_time=datetime.now()
+    )
     # trigger = CronTrigger(
     #     hour=11, minute=30, second=00, timezone=timezonetash
     # )
     trigger = IntervalTrigger(minutes=30)
-    job_scheduler.add_job(run_async_job, trigger=trigger, id='update_request_status')
+    job_scheduler.add_job(leader_job('update_request_status', request_status_update), trigger=trigger, id='update_request_status')
+    # ЦБ публикует курсы раз в день; первый запуск сразу при старте
+    job_scheduler.add_job(
+        leader_job('update_exchange_rates', exchange_rates_update),
+        trigger=IntervalTrigger(hours=1),
+        id='update_exchange_rates',
+        next_run_time=datetime.now()
+    )
+    job_scheduler.add_job(leader_job('cleanup_reports', reports_cleanup), trigger=IntervalTrigger(hours=1), id='cleanup_reports')
+    # /financier-panel только читает request_rollups: задача досчитывает изменённые дни
+    job_scheduler.add_job(
+        leader_job('refresh_rollups', rollups_refresh),
+        trigger=IntervalTrigger(minutes=1),
+        id='refresh_rollups',
+        next_run_time=datetime.now()
+    )
 
 
 
@@ -207,8 +187,23 @@ def start_event_loop():
     main_loop.run_forever()
 
 
-event_loop_thread = threading.Thread(target=start_event_loop, daemon=True)
-event_loop_thread.start()
+@asynccontextmanager
+async def run_background():
+    global main_loop, scheduler, leader
+    # APScheduler грузится только здесь: при импорте приложения он не нужен
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    main_loop = asyncio.new_event_loop()
+    event_loop_thread = threading.Thread(target=start_event_loop, daemon=True)
+    event_loop_thread.start()
+    print("🚀 Starting scheduler...")
+    scheduler = BackgroundScheduler()
+    scheduler.start()
+    leader = LeaderLease()
+    yield
+    scheduler.shutdown(wait=False)
+    main_loop.call_soon_threadsafe(main_loop.stop)
+    event_loop_thread.join(timeout=10)
 
 
 
@@ -216,11 +211,62 @@ event_loop_thread.start()
 async def run_updater():
     await status_updater()
     yield
+    # Остальные воркеры подхватят аренду, не дожидаясь обрыва соединения
+    leader.release()
+
+
+# ✅ The outbox worker shares the scheduler loop, so its sync DB calls never block the API loop
+@asynccontextmanager
+async def run_notifications_worker():
+    worker = TelegramWorker(session_maker=session_maker)
+    future = asyncio.run_coroutine_threadsafe(worker.run(), main_loop)
+    yield
+    worker.stop()
+    try:
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout=worker.poll_interval + 15)
+    except Exception as e:
+        print("Notifications worker stop error: ", e)
+
+
+# ✅ Reports are built in worker processes; the dispatcher only claims jobs on the scheduler loop
+@asynccontextmanager
+async def run_reports_worker():
+    worker = ReportWorker(session_maker=session_maker)
+    future = asyncio.run_coroutine_threadsafe(worker.run(), main_loop)
+    yield
+    worker.stop()
+    try:
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout=60)
+    except Exception as e:
+        print("Reports worker stop error: ", e)
+
+
+# ✅ LISTEN for result cache invalidations from every worker's writes, on a loop and thread of its own:
+# sync DB calls of the jobs on main_loop would otherwise hold back invalidations while the cache stays connected
+@asynccontextmanager
+async def run_cache_listener(dsn: str = None):
+    listener_loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+
+    def run_listener():
+        asyncio.set_event_loop(listener_loop)
+        try:
+            listener_loop.run_until_complete(listen(dsn=dsn, stop=stop))
+        finally:
+            listener_loop.close()
+
+    listener_thread = threading.Thread(target=run_listener, daemon=True)
+    listener_thread.start()
+    yield
+    listener_loop.call_soon_threadsafe(stop.set)
+    await asyncio.to_thread(listener_thread.join, 10)
+    if listener_thread.is_alive():
+        print("Result cache listener stop error: still running")
 
 
 @asynccontextmanager
 async def combined_lifespan(app):
-    async with create_permissions_lifespan(), create_role_lifespan(), create_sequence(), run_updater():
+    async with run_background(), bootstrap_lifespan(), create_sequence(), run_updater(), run_notifications_worker(), run_reports_worker(), run_cache_listener():
         print("Started tasks ...")
         #-----------   BEFORE YIELD WHEN STARTING UP ALL THE FUNCTIONS WORK ---------
         yield
@@ -5,7 +5,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import LimitDAO
 from schemas.limits import CreateLimit, Limits, Limit, UpdateLimit
 from utils.utils import PermissionChecker
@@ -24,7 +24,7 @@ async def create_limit(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Лимиты": ["create"]}))
 ):
     await LimitDAO.add(session=db, **body.model_dump())
-    db.commit()
+    await commit(db)
     return {"success": True}
 
 
@@ -62,7 +62,7 @@ async def update_limit(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_obj = await LimitDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_obj)
+    await commit(db)
+    await refresh(db, updated_obj)
     return updated_obj
 
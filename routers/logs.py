@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import LogDAO
 from schemas.suppliers import Suppliers, Supplier, CreateSupplier, UpdateSupplier
 from schemas.logs import Log, CreateLog
@@ -23,8 +23,8 @@ async def create_log(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Логи": ["create"]}))
 ):
     created_obj = await LogDAO.add(session=db, **body.model_dump())
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi_pagination import Page, paginate
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, execute, refresh, commit
 from dal.dao import PayerCompanyDAO
 from schemas.payer_companies import PayerCompany, CreatePayerCompany, PayerCompanies, UpdatePayerCompany
 from utils.utils import PermissionChecker
@@ -25,7 +25,7 @@ async def create_company(
     body_dict = body.model_dump(exclude_unset=True)
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
     created_company = await PayerCompanyDAO.add(session=db, **body_dict)
-    db.commit()
+    await commit(db)
     return created_company
 
 
@@ -38,7 +38,7 @@ async def get_company_list(
     filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user"]}
 
     query = await PayerCompanyDAO.get_all(session=db, filters=filters if filters else None)
-    companies = db.execute(query).scalars().all()
+    companies = (await execute(db, query)).scalars().all()
 
     return paginate(companies)
 
@@ -64,8 +64,8 @@ async def update_company(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_company = await PayerCompanyDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_company)
+    await commit(db)
+    await refresh(db, updated_company)
     return updated_company
 
 
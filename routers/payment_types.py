@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import PaymentTypeDAO
 from schemas.payment_types import PaymentType, CreatePaymentType, PaymentTypes, UpdatePaymentType
 from utils.utils import PermissionChecker
@@ -25,8 +25,8 @@ async def create_payment_type(
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
 
     created_obj = await PaymentTypeDAO.add(session=db, **body_dict)
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -62,8 +62,8 @@ async def update_payment_type(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_obj = await PaymentTypeDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_obj)
+    await commit(db)
+    await refresh(db, updated_obj)
     return updated_obj
 
 
@@ -74,6 +74,6 @@ async def delete_payment_type(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Типы оплаты": ["delete"]}))
 ):
     deleted_objs = await PaymentTypeDAO.delete(session=db, filters={"id": id})
-    db.commit()
+    await commit(db)
     return deleted_objs
 
@@ -8,14 +8,16 @@ from sqlalchemy.orm import Session
 
 from core.session import get_db
 from dal.dao import RequestDAO, ClientDAO, DepartmentDAO, ExpenseTypeDAO
+from schemas.pagination import KeysetPage
 from schemas.requests import Requests
+from utils.permissions import has_permission
 from utils.utils import PermissionChecker
 
 purchase_router = APIRouter()
 
 
 
-@purchase_router.get("/purchase", response_model=Page[Requests])
+@purchase_router.get("/purchase", response_model=KeysetPage[Requests])
 async def get_purchase_requests(
         number: Optional[int] = None,
         client: Optional[str] = None,
@@ -34,11 +36,12 @@ async def get_purchase_requests(
         payment_start_date: Optional[date] = None,
         payment_finish_date: Optional[date] = None,
         status: Optional[str] = "0,1,2,3,4,5,6",
+        cursor: Optional[int] = None,
         db: Session = Depends(get_db),
         current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["purchase requests"]}))
 ):
-    filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user"]}
-    if "approve purchase" not in current_user["permissions"]["Заявки"]:
+    filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user", "cursor"]}
+    if not has_permission(current_user, "Заявки", "approve purchase"):
         filters["status"] = "0,1,2,3,4,5,6,7"
         filters["user_id"] = UUID(current_user["id"])
 
@@ -64,6 +67,10 @@ async def get_purchase_requests(
     if query is None:
         return paginate([])
 
-    result = db.execute(query.order_by(RequestDAO.model.number.desc())).scalars().all()
-    return paginate(result)
+    return await RequestDAO.paginate(
+        session=db,
+        query=query.order_by(RequestDAO.model.number.desc()),
+        cursor=cursor,
+        cursor_column=RequestDAO.model.number
+    )
 
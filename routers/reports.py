@@ -0,0 +1,66 @@
+import os
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from core.session import get_db, commit
+from dal.dao import ReportDAO
+from schemas.reports import Report
+from schemas.requests import GenerateExcel
+from utils.reports import filters_hash, DONE
+from utils.utils import PermissionChecker
+
+
+
+reports_router = APIRouter()
+
+
+
+@reports_router.post("/reports", response_model=Report)
+async def create_report(
+        body: GenerateExcel,
+        db: Session = Depends(get_db),
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["read"]}))
+):
+    filters = {k: v for k, v in body.model_dump(mode="json", exclude_unset=True).items() if v is not None}
+    report = await ReportDAO.enqueue(
+        session=db,
+        kind="requests",
+        filters=filters,
+        filters_hash=filters_hash("requests", filters, user_id=current_user.get("id")),
+        user_id=current_user.get("id")
+    )
+    await commit(db)
+    return report
+
+
+@reports_router.get("/reports/{id}", response_model=Report)
+async def get_report(
+        id: UUID,
+        db: Session = Depends(get_db),
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["read"]}))
+):
+    # Отчёт виден только тому, кто его поставил
+    report = await ReportDAO.get_by_attributes(session=db, filters={"id": id, "user_id": current_user.get("id")}, first=True)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Отчёт не найден")
+    return report
+
+
+@reports_router.get("/reports/{id}/file")
+async def download_report(
+        id: UUID,
+        db: Session = Depends(get_db),
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["read"]}))
+):
+    # Отчёт виден только тому, кто его поставил
+    report = await ReportDAO.get_by_attributes(session=db, filters={"id": id, "user_id": current_user.get("id")}, first=True)
+    if report is None or report.status != DONE or not os.path.exists(report.file_path):
+        raise HTTPException(status_code=404, detail="Файл отчёта не готов или удалён")
+    return FileResponse(
+        report.file_path,
+        filename=f"Finance orders от {report.created_at.strftime('%d.%m.%Y')}.xlsx",
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
@@ -4,7 +4,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends
 from fastapi_pagination import Page, paginate
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from core.session import get_db
 from dal.dao import RequestDAO, ClientDAO, DepartmentDAO, ExpenseTypeDAO
@@ -52,6 +52,8 @@ async def get_requests_with_invoices(
     )
     if query is None:
         return paginate([])
+    # set_advance_payment reads request.receipt for every row
+    query = query.options(selectinload(RequestDAO.model.receipt))
 
     if advance_payment is not None:
         if advance_payment is True:
@@ -62,13 +64,17 @@ async def get_requests_with_invoices(
     if contract_number is None:
         query = query.filter(RequestDAO.model.contract_number.isnot(None))
 
-    requests = db.execute(query.order_by(RequestDAO.model.number.desc())).scalars().all()
+    def set_advance_payment(requests):
+        for request in requests:
+            if request.receipt:
+                request.advance_payment = False
+            else:
+                request.advance_payment = True
+        return requests
 
-    for request in requests:
-        if request.receipt:
-            request.advance_payment = False
-        else:
-            request.advance_payment = True
-
-    return paginate(requests)
+    return await RequestDAO.paginate(
+        session=db,
+        query=query.order_by(RequestDAO.model.number.desc()),
+        transformer=set_advance_payment
+    )
 
@@ -2,30 +2,38 @@ from datetime import datetime, date, timedelta
 from typing import Optional, List
 from uuid import UUID
 
-import requests
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi_pagination import Page, paginate
-from sqlalchemy import func
+from fastapi_pagination import Page
+from sqlalchemy import func, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.config import settings
-from core.session import get_db
+from core.config import settings, timezonetash
+from core.session import get_db, execute, refresh, commit, flush, stream
+from dal.base import day_bounds
 from dal.dao import (
     RequestDAO,
-    InvoiceDAO,
     ContractDAO,
     FileDAO,
     LogDAO,
     TransactionDAO,
-    UserDAO,
     ClientDAO,
-    BudgetDAO,
+    BudgetLedgerDAO,
     DepartmentDAO,
     ExpenseTypeDAO, ReceiptDAO
 )
+from models.contracts import Contracts
+from models.files import Files
+from models.invoices import Invoices
+from models.logs import Logs
+from schemas.pagination import KeysetPage
 from schemas.requests import Requests, Request, UpdateRequest, CreateRequest, GenerateExcel
-from utils.utils import PermissionChecker, send_telegram_message, send_telegram_document, error_sender, excel_generator
+from utils.exchange_rates import get_exchange_rate
+from utils.notifications import notify, notify_document
+from utils.permissions import has_permission
+from utils.reports import excel_filters
+from utils.scope import RoleScope, role_scope
+from utils.utils import PermissionChecker, excel_generator
 
 
 
@@ -106,13 +114,13 @@ async def create_request(
         }
     )
 
-    db.commit()
-    db.refresh(created_request)
+    await commit(db)
+    await refresh(db, created_request)
     return created_request
 
 
 
-@requests_router.get("/requests", response_model=Page[Requests])
+@requests_router.get("/requests", response_model=KeysetPage[Requests])
 async def get_request_list(
         number: Optional[int] = None,
         client: Optional[str] = None,
@@ -134,25 +142,24 @@ async def get_request_list(
         payment_start_date: Optional[date] = None,
         payment_finish_date: Optional[date] = None,
         status: Optional[str] = None,
+        cursor: Optional[int] = None,
         db: Session = Depends(get_db),
-        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["read"]}))
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["read"]})),
+        scope: RoleScope = Depends(role_scope)
 ):
-    filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user"]}
+    filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user", "scope", "cursor"]}
 
     if client is not None:
-        query = await ClientDAO.get_all(session=db, filters={"fullname": client})
-        clients = db.execute(query).scalars().all()
+        query = await ClientDAO.get_all(session=db, filters={"fullname": client}, profile=())
+        clients = (await execute(db, query)).scalars().all()
         filters.pop("client", None)
         filters["client_id"] = [client.id for client in clients]
 
     if filters.get("department_id", None) is None:
-        user = await UserDAO.get_by_attributes(session=db, filters={"id": current_user["id"]}, first=True)
-        role_department_relations = user.role.roles_departments
-        role_departments = [relation.department_id for relation in role_department_relations]
-        filters["department_id"] = role_departments
+        filters["department_id"] = scope.departments
 
-    if current_user.get("clients", None):
-        filters["client_id"] = current_user.get("clients")
+    if scope.clients:
+        filters["client_id"] = scope.clients
 
     # role_expense_types = await RoleExpenseTypeDAO.get_by_attributes(session=db, filters={"role_id": current_user.get("role_id")})
     # if role_expense_types:
@@ -167,10 +174,17 @@ async def get_request_list(
 
     if start_date is not None and finish_date is not None:
         # query = query.filter(func.date(RequestDAO.model.created_at).between(start_date, finish_date))
-        query = query.filter(func.date(RequestDAO.model.payment_time).between(start_date, finish_date))
+        query = query.filter(
+            RequestDAO.model.payment_time >= day_bounds(start_date)[0],
+            RequestDAO.model.payment_time < day_bounds(finish_date)[1]
+        )
 
-    result = db.execute(query.order_by(RequestDAO.model.number.desc())).scalars().all()
-    return paginate(result)
+    return await RequestDAO.paginate(
+        session=db,
+        query=query.order_by(RequestDAO.model.number.desc()),
+        cursor=cursor,
+        cursor_column=RequestDAO.model.number
+    )
 
 
 
@@ -194,48 +208,19 @@ async def get_request(
         obj.advance_payment = True
 
     if obj.payment_time is not None:
-        payment_date = obj.payment_time.date()
-        department_id = obj.department_id
-        expense_type_id = obj.expense_type_id
         request_sum = obj.sum
-        budget = (await BudgetDAO.get_filtered_budget_sum(
+        snapshot = await BudgetLedgerDAO.get_snapshot(
             session=db,
-            department_id=department_id,
-            expense_type_id=expense_type_id,
-            start_date=payment_date,
-            finish_date=payment_date
-        ))[0]
-        budget = budget if budget is not None else 0
-        expense = (await BudgetDAO.get_filtered_budget_expense(
-            session=db,
-            department_id=department_id,
-            expense_type_id=expense_type_id,
-            start_date=payment_date,
-            finish_date=payment_date
-        ))[0]
-        expense = -expense if expense is not None else 0
+            department_id=obj.department_id,
+            expense_type_id=obj.expense_type_id,
+            payment_time=obj.payment_time
+        )
+        budget = snapshot.expense_type_budget
+        expense = -snapshot.expense_type_expense
         obj.expense_type_budget = budget - expense - request_sum
 
-        department_budget = (
-            await DepartmentDAO.get_department_total_budget(
-                session=db,
-                department_id=department_id,
-                start_date=None,
-                finish_date=None,
-                payment_date=payment_date
-            )
-        )[0]
-        department_budget = department_budget if department_budget is not None else 0
-        department_expense = (
-            await DepartmentDAO.get_department_expense(
-                session=db,
-                department_id=department_id,
-                start_date=None,
-                finish_date=None,
-                payment_date=payment_date
-            )
-        )[0]
-        department_expense = -department_expense if department_expense is not None else 0
+        department_budget = snapshot.department_budget
+        department_expense = -snapshot.department_expense
         obj.department_budget = department_budget - department_expense - request_sum
 
     return obj
@@ -265,9 +250,16 @@ async def update_request(
     body_dict.pop("invoice", None)
     body_dict.pop("contract", None)
     body_dict.pop("client_id", None)
+    body_dict.pop("id", None)
     request = await RequestDAO.get_by_attributes(session=db, filters={"id": body.id}, first=True)
     request_payment_time = request.payment_time.date() if request.payment_time else None
 
+    author = {"client_id": body.client_id} if body.client_id is not None else {"user_id": current_user["id"]}
+
+    def add_log(**values):
+        # created_at из Python: у логов одной транзакции now() одинаковый, а порядок важен
+        request.logs.append(Logs(created_at=datetime.now(tz=timezonetash), **values))
+
     if request.status == 5:
         raise HTTPException(status_code=404, detail="Данная завка уже закрыта !")
 
@@ -277,13 +269,13 @@ async def update_request(
 
 
     if body.status == 4:
-        if "reject" not in current_user["permissions"]["Заявки"]:
+        if not has_permission(current_user, "Заявки", "reject"):
             body_dict.pop("status", None)
             body_dict.pop("comment", None)
             raise HTTPException(status_code=404, detail="У вас нет прав отменить статус заявки !")
 
     if body.approved is True:
-        if "approve" not in current_user["permissions"]["Заявки"]:
+        if not has_permission(current_user, "Заявки", "approve"):
             body_dict.pop("approved", None)
             body_dict.pop("approve_comment", None)
             raise HTTPException(status_code=404, detail="У вас нет прав одобрить заявку !")
@@ -293,34 +285,28 @@ async def update_request(
         #         body_dict.pop("approved", None)
         #         raise HTTPException(status_code=404, detail="Данная заявка ещё не обработана бухгалтерами !")
 
+        # Месяц бюджета — по самой метке времени оплаты, не по её дате в зоне сервера
+        budget_payment_time = request.payment_time
         if body.status == 6 and body.payment_time is not None:
             request_payment_time = body.payment_time
+            budget_payment_time = body.payment_time
 
-        if request_payment_time is not None:
+        if budget_payment_time is not None:
             if not request.credit:
-                budget = (await BudgetDAO.get_filtered_budget_sum(
+                # Строка остатка заблокирована до commit: одобрения по той же статье и месяцу идут по очереди
+                balance = await BudgetLedgerDAO.get_balance(
                     session=db,
                     department_id=request.department_id,
                     expense_type_id=request.expense_type_id,
-                    start_date=request_payment_time,
-                    finish_date=request_payment_time
-                ))[0]
-                budget = budget if budget is not None else 0
-                expense = (await BudgetDAO.get_filtered_budget_expense(
-                    session=db,
-                    department_id=request.department_id,
-                    expense_type_id=request.expense_type_id,
-                    start_date=request_payment_time,
-                    finish_date=request_payment_time
-                ))[0]
-                expense = -expense if expense is not None else 0
-                balance = budget - expense
+                    payment_time=budget_payment_time,
+                    lock=True
+                )
                 if request.sum > balance:
                     raise HTTPException(status_code=400, detail="Недостаточно средств в бюджете !")
 
 
     if body.purchase_approved is True:
-        if "approve purchase" not in current_user["permissions"]["Заявки"]:
+        if not has_permission(current_user, "Заявки", "approve purchase"):
             body_dict.pop("purchase_approved", None)
             raise HTTPException(status_code=404, detail="У вас нет прав одобрить заявку для закупа !")
 
@@ -331,18 +317,18 @@ async def update_request(
             raise HTTPException(status_code=404, detail="Данную заявку должен сперва проверить ответственный финансист !")
 
     if body.checked_by_financier is True:
-        if "check" not in current_user["permissions"]["Заявки"]:
+        if not has_permission(current_user, "Заявки", "check"):
             body_dict.pop("checked_by_financier", None)
             raise HTTPException(status_code=404, detail="У вас нет прав проверить заявку как финансист !")
 
     if body.credit is True:
-        if "credit" not in current_user["permissions"]["Заявки"]:
+        if not has_permission(current_user, "Заявки", "credit"):
             body_dict.pop("credit", None)
             raise HTTPException(status_code=404, detail="У вас нет прав включить заявку в долг !")
 
     if body.payment_type_id is not None:
         if request.payment_type_id != body.payment_type_id:
-            if "change_payment_type" not in current_user["permissions"]["Заявки"]:
+            if not has_permission(current_user, "Заявки", "change_payment_type"):
                 body_dict.pop("payment_type_id", None)
                 raise HTTPException(status_code=404, detail="У вас нет прав изменить тип оплаты заявки !")
 
@@ -378,38 +364,12 @@ async def update_request(
         request_currency = request.currency
         new_currency = body.currency
         if request_currency != "Сум" or new_currency != "Сум":
-            currency_response = requests.get("https://cbu.uz/uz/arkhiv-kursov-valyut/json/")
-            if currency_response.status_code == 200:
-                ccy = ""
-                if body.sum is not None and body.currency is None:
-                    if request_currency == "Доллар":
-                        ccy = "USD"
-                    elif request_currency == "Евро":
-                        ccy = "EUR"
-                    elif request_currency == "Тенге":
-                        ccy = "KZT"
-                    elif request_currency == "Фунт":
-                        ccy = "GBP"
-                    elif request_currency == "Рубль":
-                        ccy = "RUB"
-
-                else:
-                    if new_currency == "Доллар":
-                        ccy = "USD"
-                    elif new_currency == "Евро":
-                        ccy = "EUR"
-                    elif new_currency == "Тенге":
-                        ccy = "KZT"
-                    elif new_currency == "Фунт":
-                        ccy = "GBP"
-                    elif new_currency == "Рубль":
-                        ccy = "RUB"
-
-                cbu_currencies = currency_response.json()
-                currency_dict = next((item for item in cbu_currencies if item["Ccy"] == ccy), None)
-                exchange_rate = float(currency_dict["Rate"])
-
+            if body.sum is not None and body.currency is None:
+                currency = request_currency
             else:
+                currency = new_currency
+            exchange_rate = await get_exchange_rate(session=db, currency=currency)
+            if exchange_rate is None:
                 raise HTTPException(
                     status_code=404,
                     detail="Что-то пошло не так, выберите заново валюту!"
@@ -421,133 +381,58 @@ async def update_request(
         else:
             body_dict["sum"] = body.sum
 
-        insert_data = {
-            "sum": body.sum,
-            "currency": body.currency,
-            "request_id": body.id,
-            "user_id": current_user["id"]
-        }
-
-        # create logs
-        await LogDAO.add(
-            session=db,
-            **insert_data
-        )
-        db.commit()
+        add_log(sum=body.sum, currency=body.currency, user_id=current_user["id"])
 
     if body.contract_number is not None and body.invoice_sap_code is not None:
         body_dict_copy = body_dict.copy()
         body_dict.pop("contract_number", None)
-        updating_requests = await RequestDAO.get_by_attributes(session=db, filters={"contract_number": body.contract_number})
-        for request in updating_requests:
-            if request.id != body.id:
-                body_dict_copy["id"] = request.id
-                await RequestDAO.update(session=db, data=body_dict_copy)
-
-    updated_request = await RequestDAO.update(session=db, data=body_dict)
-
-    transaction = await TransactionDAO.get_by_attributes(session=db, filters={"request_id": updated_request.id}, first=True)
-    if transaction:
-        data = {
-            "id": transaction.id,
-            "status": updated_request.status
-        }
-        if body_dict.get("sum"):
-            data["value"] = body_dict.get("sum")
-
-        await TransactionDAO.update(session=db, data=data)
-
-    db.commit()
-    db.refresh(updated_request)
-
-    if body.file_paths is not None and body.contract is not None:
-        contract = await ContractDAO.add(session=db, **{"request_id": updated_request.id})
-        await FileDAO.add(
+        updating_requests = await RequestDAO.get_by_attributes(
             session=db,
-            **{
-                "file_paths": body.file_paths,
-                "contract_id": contract.id if contract is not None else None
-            }
+            filters={"contract_number": body.contract_number},
+            profile=()
         )
+        for updating_request in updating_requests:
+            if updating_request.id != body.id:
+                RequestDAO.assign(updating_request, body_dict_copy)
+
+    # Изменения копятся в сессии и уходят одним flush при commit в конце
+    updated_request = RequestDAO.assign(request, body_dict)
+    # assign не трогает загруженные связи: с новым department_id, expense_type_id и т.п. текст
+    # уведомлений брал бы старые объекты, поэтому такие связи перечитываем после flush
+    stale_relations = [
+        relation.key for relation in inspect(RequestDAO.model).relationships
+        if any(column.key in body_dict for column in relation.local_columns)
+    ]
+    if stale_relations:
+        await flush(db)
+        await refresh(db, updated_request, stale_relations)
+
+    transaction_data = {"status": updated_request.status}
+    if body_dict.get("sum"):
+        transaction_data["value"] = body_dict.get("sum")
+    await TransactionDAO.update_request_transaction(session=db, request_id=updated_request.id, **transaction_data)
 
-        db.commit()
-        db.refresh(updated_request)
+    if body.file_paths is not None and body.contract is not None:
+        contract = updated_request.contract or Contracts(request=updated_request)
+        contract.file.append(Files(file_paths=body.file_paths))
 
     if body.file_paths is not None and body.invoice is not None:
-        invoice = None
-        if body.invoice is not None:
-            invoice = await InvoiceDAO.add(session=db, **{"request_id": updated_request.id})
-
-        await FileDAO.add(
-            session=db,
-            **{
-                "file_paths": body.file_paths,
-                "invoice_id": invoice.id if invoice is not None else None
-            }
-        )
-
-        db.commit()
-        db.refresh(updated_request)
+        invoice = updated_request.invoice or Invoices(request=updated_request)
+        invoice.file.append(Files(file_paths=body.file_paths))
 
     if body.purchase_approved is True:
-        insert_data = {
-            "request_id": updated_request.id,
-            "purchase_approved": updated_request.purchase_approved,
-        }
-        if body.client_id is not None:
-            insert_data["client_id"] = body.client_id
-        else:
-            insert_data["user_id"] = current_user["id"]
-
-        await LogDAO.add(
-            session=db,
-            **insert_data
-        )
-        db.commit()
-        db.refresh(updated_request)
+        add_log(purchase_approved=updated_request.purchase_approved, **author)
 
     if body.approved is True:
-        insert_data = {
-            "request_id": updated_request.id,
-            "approved": updated_request.approved,
-        }
-        if body.client_id is not None:
-            insert_data["client_id"] = body.client_id
-        else:
-            insert_data["user_id"] = current_user["id"]
-
-        await LogDAO.add(
-            session=db,
-            **insert_data
-        )
-        db.commit()
-        db.refresh(updated_request)
+        add_log(approved=updated_request.approved, **author)
 
         chat_id = updated_request.client.tg_id if updated_request.client else None
         number = updated_request.number
         message_text = f"Ваша заявка #{number}s одобрена !"
-        try:
-            send_telegram_message(chat_id=chat_id, message_text=message_text)
-        except Exception as e:
-            print("Sending Error: ", e)
+        await notify(session=db, chat_id=chat_id, text=message_text)
 
     if body.status is not None:
-        insert_data = {
-            "status": body.status,
-            "request_id": updated_request.id
-        }
-        if body.client_id is not None:
-            insert_data["client_id"] = body.client_id
-        else:
-            insert_data["user_id"] = current_user["id"]
-
-        # create logs
-        await LogDAO.add(
-            session=db,
-            **insert_data
-        )
-        db.commit()
-        db.refresh(updated_request)
+        add_log(status=body.status, **author)
 
     message_text = ""
     chat_id = updated_request.client.tg_id if updated_request.client is not None else None
@@ -586,46 +471,39 @@ async def update_request(
     if status == 1: # Принят
         message_text = (f"Ваша заявка #{number}s принята со стороны  финансового отдела.\n"
                         f"Срок оплаты {updated_request.payment_time.strftime('%d.%m.%Y')}")
-        try:
-            send_telegram_message(chat_id=chat_id, message_text=message_text, keyboard=inline_keyboard)
-        except Exception as e:
-            error_sender(error_message=f"FINANCE BACKEND: \n{e}")
+        await notify(session=db, chat_id=chat_id, text=message_text, keyboard=inline_keyboard)
 
         if request.payment_type_id == UUID("822e49f7-f54e-481e-997d-e4cb81b061e1"): # cash
             chat_id = settings.CHAT_GROUP  # chat id of group
-            try:
-                send_telegram_message(chat_id=chat_id, message_text=request_text, keyboard=inline_keyboard)
-            except Exception as e:
-                error_sender(error_message=f"FINANCE BACKEND: \n{e}")
+            await notify(session=db, chat_id=chat_id, text=request_text, keyboard=inline_keyboard)
 
     elif status == 4: # Отменен
         message_text = (f"Ваша заявка #{number}s отменена по причине:\n"
                         f"{updated_request.comment}")
-        send_telegram_message(chat_id=chat_id, message_text=message_text, keyboard=inline_keyboard)
+        await notify(session=db, chat_id=chat_id, text=message_text, keyboard=inline_keyboard)
 
     elif status == 5: # Обработан
-        try:
-            send_telegram_message(chat_id=chat_id, message_text=f"Оплачено✅\n\n{request_text}", keyboard=inline_keyboard)
-            if updated_request.invoice is not None:
-                files = updated_request.invoice.file
-                for file in files:
-                    file_paths = file.file_paths
-                    for file_path in file_paths:
-                        send_telegram_document(chat_id=chat_id, file_path=file_path)
-        except Exception as e:
-            print("Sending Error: ", e)
+        await notify(session=db, chat_id=chat_id, text=f"Оплачено✅\n\n{request_text}", keyboard=inline_keyboard)
+        if updated_request.invoice is not None:
+            files = updated_request.invoice.file
+            for file in files:
+                file_paths = file.file_paths
+                for file_path in file_paths:
+                    await notify_document(session=db, chat_id=chat_id, file_path=file_path)
 
     if body.payment_time is not None and request_payment_time is not None:
         message_text = (f"Срок оплаты по вашей заявке {updated_request.number} изменен с "
                         f"{request_payment_time.strftime('%d.%m.%Y')} на "
                         f"{updated_request.payment_time.strftime('%d.%m.%Y')} по причине:\n"
                         f"“{updated_request.comment}”")
-        try:
-            send_telegram_message(chat_id=chat_id, message_text=message_text)
-        except Exception as e:
-            print("Sending Error: ", e)
+        await notify(session=db, chat_id=chat_id, text=message_text)
 
-    return updated_request
+    # Один commit: заявка, транзакция, файлы, логи и уведомления (их отправит TelegramWorker)
+    await commit(db)
+
+    # Ответ собираем заново профилем RequestDAO.detail_profile
+    db.expire_all()
+    return await RequestDAO.get_by_attributes(session=db, filters={"id": body.id}, first=True)
 
 
 
@@ -635,16 +513,9 @@ async def get_excel_file(
         db: Session = Depends(get_db),
         current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["read"]}))
 ):
-    body.finish_date += timedelta(days=1)
-    body_dict = body.model_dump(exclude_unset=True)
-    filters = {k: v for k, v in body_dict.items() if v is not None}
-    if "client" in body_dict:
-        query = await ClientDAO.get_all(session=db, filters={"fullname": body.client})
-        clients = db.execute(query).scalars().all()
-        filters.pop("client", None)
-        filters["client_id"] = [client.id for client in clients]
-
+    # Большие выгрузки — через POST /reports (фоновая задача)
+    filters = await excel_filters(session=db, body=body)
     query = await RequestDAO.get_excel(session=db, filters=filters)
-    file_name = excel_generator(data=query)
+    file_name = await excel_generator(rows=stream(db, query))
     return {'file_name': file_name}
 
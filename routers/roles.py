@@ -6,9 +6,10 @@ from fastapi_pagination import Page, paginate
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import RoleDAO, AccessDAO, RoleDepartmentDAO, DepartmentDAO, RoleExpenseTypeDAO
 from schemas.roles import GetRole, CreateRole, GetRoles, UpdateRole
+from utils.cache import invalidate_roles, notify_roles
 from utils.utils import PermissionChecker
 
 roles_router = APIRouter()
@@ -38,8 +39,8 @@ async def create_role(
             data = {"permission_id": permission, "role_id": created_role.id}
             await AccessDAO.add(session=db, **data)
 
-        db.commit()
-        db.refresh(created_role)
+        await commit(db)
+        await refresh(db, created_role)
 
         # role_accesses = created_role.accesses
         # created_role.permissions = [access.permission for access in role_accesses]
@@ -49,8 +50,8 @@ async def create_role(
             data = {"department_id": department, "role_id": created_role.id}
             await RoleDepartmentDAO.add(session=db, **data)
 
-        db.commit()
-        db.refresh(created_role)
+        await commit(db)
+        await refresh(db, created_role)
 
         # role_department_relations = await RoleDepartmentDAO.get_by_attributes(session=db,
         #                                                                       filters={"role_id": created_role.id})
@@ -62,8 +63,8 @@ async def create_role(
             data = {"expense_type_id": expense_type, "role_id": created_role.id}
             await RoleExpenseTypeDAO.add(session=db, **data)
 
-        db.commit()
-        db.refresh(created_role)
+        await commit(db)
+        await refresh(db, created_role)
 
         # role_expense_type_relations = await RoleExpenseTypeDAO.get_by_attributes(session=db, filters={"role_id": created_role.id})
         # created_role.expense_types = [relation.expense_type for relation in role_expense_type_relations]
@@ -130,8 +131,8 @@ async def update_role(
                 data = {"permission_id": permission, "role_id": updated_role.id}
                 await AccessDAO.add(session=db, **data)
 
-        db.commit()
-        db.refresh(updated_role)
+        await commit(db)
+        await refresh(db, updated_role)
 
     # ────────────────── DEPARTMENTS ─────────────────────
     if departments is not None:
@@ -147,8 +148,8 @@ async def update_role(
                 data = {"department_id": department, "role_id": updated_role.id}
                 await RoleDepartmentDAO.add(session=db, **data)
 
-        db.commit()
-        db.refresh(updated_role)
+        await commit(db)
+        await refresh(db, updated_role)
 
     # ──────────────── EXPENSE TYPES ─────────────────────
     if accepted_expense_types_ids is not None:
@@ -164,8 +165,13 @@ async def update_role(
                 data = {"expense_type_id": expense_type_id, "role_id": updated_role.id}
                 await RoleExpenseTypeDAO.add(session=db, **data)
 
-        db.commit()
-        db.refresh(updated_role)
+        await commit(db)
+        await refresh(db, updated_role)
+
+    # Права и отделы роли кэшируются по роли: сбрасываются во всех воркерах после всех коммитов
+    await notify_roles(db, updated_role.id)
+    await commit(db)
+    invalidate_roles(updated_role.id)
 
     # ───────── FIX FOR RESPONSE MODEL ─────────
 
@@ -2,12 +2,13 @@ from datetime import datetime, date
 from typing import Optional
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import coalesce
 
-from core.session import get_db
-from dal.dao import RequestDAO
+from core.session import get_db, execute
+from dal.dao import RequestDAO, RequestRollupDAO
+from utils.cache import result_cache, month_span
 from utils.utils import PermissionChecker
 
 
@@ -23,31 +24,46 @@ async def get_statistics(
         db: Session = Depends(get_db),
         current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["statistics"]}))
 ):
-    requests_statuses = db.query(
+    # Сегодняшние оплаты тоже в ответе — текущий месяц в зависимостях
+    months = month_span(start_date, finish_date) | {date.today().strftime("%Y-%m")}
+    return await result_cache.get_or_compute(
+        "/statistics",
+        {"start_date": start_date, "finish_date": finish_date},
+        current_user.get("role_id"),
+        lambda: compute_statistics(db, start_date, finish_date),
+        months=months
+    )
+
+
+async def compute_statistics(db, start_date: date, finish_date: date):
+    requests_statuses = select(
         RequestDAO.model.status, func.count(RequestDAO.model.id)
     ).filter(
         RequestDAO.model.created_at.between(start_date, finish_date)
     ).group_by(
         RequestDAO.model.status
-    ).all()
+    )
+    requests_statuses = (await execute(db, requests_statuses)).all()
 
-    today_paying_requests = db.query(
+    today_paying_requests = select(
         func.count(RequestDAO.model.id)
     ).filter(
         and_(
             RequestDAO.model.status == 2,
             func.date(RequestDAO.model.payment_time) == datetime.now().date()
         )
-    ).all()
+    )
+    today_paying_requests = (await execute(db, today_paying_requests)).all()
 
-    expense_statistics = db.query(
+    expense_statistics = select(
         coalesce(func.sum(RequestDAO.model.sum), 0)
     ).filter(
         and_(
             RequestDAO.model.status == 5,
             RequestDAO.model.created_at.between(start_date, finish_date)
         )
-    ).all()
+    )
+    expense_statistics = (await execute(db, expense_statistics)).all()
 
     data = {
         "request_statuses": {status: count for status, count in requests_statuses},
@@ -65,6 +81,18 @@ async def get_metrics(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["financier_panel"]}))
 ):
     filters = {k: v for k, v in locals().items() if v is not None and k not in ["db", "current_user"]}
-    metrics = await RequestDAO.get_financier_metrics(session=db, filters=filters or None)
-    return metrics
+
+    async def compute():
+        # Только чтение: request_rollups досчитывает задача refresh_rollups, её NOTIFY сбрасывает кэш
+        return await RequestRollupDAO.get_financier_metrics(session=db, filters=filters or None)
+
+    # Расходы по месяцам — за всё время, поэтому зависит от всех месяцев
+    return await result_cache.get_or_compute("/financier-panel", filters, current_user.get("role_id"), compute)
+
+
+@statistics_router.get("/cache-stats")
+async def get_cache_stats(
+        current_user: dict = Depends(PermissionChecker(required_permissions={"Заявки": ["statistics"]}))
+):
+    return result_cache.stats()
 
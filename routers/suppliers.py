@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import SupplierDAO
 from schemas.suppliers import Suppliers, Supplier, CreateSupplier, UpdateSupplier
 from utils.utils import PermissionChecker
@@ -26,8 +26,8 @@ async def create_supplier(
     body_dict = body.model_dump(exclude_unset=True)
     body_dict["name"] = body_dict.get("name").strip() if body_dict.get("name") else ""
     created_obj = await SupplierDAO.add(session=db, **body_dict)
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -65,8 +65,8 @@ async def update_supplier(
 ):
     body_dict = body.model_dump(exclude_unset=True)
     updated_obj = await SupplierDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_obj)
+    await commit(db)
+    await refresh(db, updated_obj)
     return updated_obj
 
 
@@ -78,6 +78,6 @@ async def delete_supplier(
         current_user: dict = Depends(PermissionChecker(required_permissions={"Поставщики": ["delete"]}))
 ):
     deleted_objs = await SupplierDAO.delete(session=db, filters={"id": id})
-    db.commit()
+    await commit(db)
     return deleted_objs
 
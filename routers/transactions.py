@@ -5,12 +5,12 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query
 from fastapi_pagination import Page, paginate
-from requests import session
 from sqlalchemy.orm import Session
 
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import TransactionDAO, DepartmentDAO, LogDAO
 from schemas.transactions import Transaction, CreateTransaction, Transactions, DepartmentTransactions
+from utils.cache import result_cache, month_span
 from utils.utils import PermissionChecker
 
 
@@ -34,8 +34,8 @@ async def create_transaction(
         body_dict["is_income"] = False
 
     created_obj = await TransactionDAO.add(session=db, **body_dict)
-    db.commit()
-    db.refresh(created_obj)
+    await commit(db)
+    await refresh(db, created_obj)
     return created_obj
 
 
@@ -115,6 +115,16 @@ async def get_calendar_transaction_list(
         db: Session = Depends(get_db),
         current_user: dict = Depends(PermissionChecker(required_permissions={"Транзакции": ["read"]}))
 ):
+    return await result_cache.get_or_compute(
+        "/calendar-transactions",
+        {"start_date": start_date, "finish_date": finish_date},
+        current_user.get("role_id"),
+        lambda: compute_calendar_transactions(db, start_date, finish_date),
+        months=month_span(start_date, finish_date)
+    )
+
+
+async def compute_calendar_transactions(db, start_date: Optional[date], finish_date: Optional[date]):
     result = await TransactionDAO.get_calendar_transactions(
         session=db,
         start_date=start_date,
@@ -3,46 +3,68 @@ from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from core.config import settings
-from core.session import get_db
+from core.session import get_db, refresh, commit
 from dal.dao import UserDAO
 from schemas.users import CreateUser, GetUser, GetUsers, UpdateUser, LoginByPhone, BasicLogin
+from utils.cache import role_cache, MISSING
+from utils.permissions import permission_claims, permission_map
 from utils.utils import Hasher, create_access_token, PermissionChecker, get_me
 
 users_router = APIRouter()
 
 
 
+async def authenticate(session, filters: dict, password: str, clients: bool = False):
+    """
+    The login row of the user matching `filters` and its role's permission claims, or (None, None)
+    for an unknown user or a wrong password.
+    """
+    generation = role_cache.generation
+    row = await UserDAO.get_for_login(session=session, filters=filters, cached_roles=role_cache.roles(), clients=clients)
+    # bcrypt занимает ~0.2 с CPU: в пуле потоков он не держит event loop
+    if not row or not await run_in_threadpool(Hasher.verify_password, password, row.Users.password):
+        return None, None
+
+    role_id = str(row.Users.role_id) if row.Users.role_id else None
+    claims = role_cache.get(role_id) if row.permissions is None else MISSING
+    if claims is MISSING:
+        pairs = row.permissions
+        if pairs is None:
+            # Роль пропала из кэша после запроса
+            row = await UserDAO.get_for_login(session=session, filters=filters, clients=clients)
+            pairs = row.permissions
+        permissions = {}
+        for group, name in pairs:
+            permissions.setdefault(group, []).append(name)
+        claims = permission_claims(permissions)
+        if role_id is not None:
+            role_cache.set(role_id, claims, generation=generation)
+    return row, claims
+
+
 @users_router.post('/basic-login')
 async def login_client(
         form_data: BasicLogin,
         session: Session= Depends(get_db)
 ):
-    user = await UserDAO.get_by_attributes(session=session, filters={"username": form_data.username}, first=True)
-    if not user or not Hasher.verify_password(form_data.password, user.password):
+    row, claims = await authenticate(session=session, filters={"username": form_data.username}, password=form_data.password)
+    if not row:
         raise HTTPException(status_code=404, detail="Invalid phone or password")
-
-    permissions = {}
-    if user.role.accesses:
-        for access in user.role.accesses:
-            # permissions.append(access.permission.name)
-            try:
-                permissions[access.permission.group.name].append(access.permission.name)
-            except KeyError:
-                permissions[access.permission.group.name] = [access.permission.name]
+    user = row.Users
 
     user_info = {
         "id": str(user.id),
         "role_id": str(user.role_id),
         "fullname": user.fullname,
         "username": user.username,
-        "password": user.password,
-        "permissions": permissions
+        **claims
     }
     expire = datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     data = {
@@ -64,26 +86,17 @@ async def login_client(
         form_data: LoginByPhone,
         session: Session= Depends(get_db)
 ):
-    user = await UserDAO.get_by_attributes(session=session, filters={"phone": form_data.phone}, first=True)
-    if not user or not Hasher.verify_password(form_data.password, user.password):
+    row, claims = await authenticate(session=session, filters={"phone": form_data.phone}, password=form_data.password, clients=True)
+    if not row:
         raise HTTPException(status_code=404, detail="Invalid phone or password")
-
-    permissions = {}
-    if user.role.accesses:
-        for access in user.role.accesses:
-            # permissions.append(access.permission.name)
-            try:
-                permissions[access.permission.group.name].append(access.permission.name)
-            except KeyError:
-                permissions[access.permission.group.name] = [access.permission.name]
+    user = row.Users
 
     user_info = {
         "id": str(user.id),
         "fullname": user.fullname,
         "username": user.username,
-        "password": user.password,
-        "permissions": permissions,
-        "clients": [str(client.id) for client in user.clients] if user.clients else []
+        **claims,
+        "clients": list(row.clients)
     }
     expire = datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     data = {
@@ -104,29 +117,23 @@ async def login(
         form_data: OAuth2PasswordRequestForm = Depends(),
         session: Session= Depends(get_db)
 ):
-    user = await UserDAO.get_by_attributes(session=session, filters={"username": form_data.username}, first=True)
-    if not user or not Hasher.verify_password(form_data.password, user.password):
+    row, claims = await authenticate(session=session, filters={"username": form_data.username}, password=form_data.password)
+    if not row:
         raise HTTPException(status_code=404, detail="Invalid username or password")
-
-    permissions = {}
-    if user.role.accesses:
-        for access in user.role.accesses:
-            # permissions.append(access.permission.name)
-            try:
-                permissions[access.permission.group.name].append(access.permission.name)
-            except KeyError:
-                permissions[access.permission.group.name] = [access.permission.name]
+    user = row.Users
 
     user_info = {
         "id": str(user.id),
         "role_id": str(user.role_id),
         "fullname": user.fullname,
         "username": user.username,
-        "password": user.password,
-        "permissions": permissions
+        **claims
     }
     expire = datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     if user.username == settings.BOT_USER:
+        # Токен бота бессрочный: карта прав не зависит от номеров битов
+        user_info.pop("permissions_version")
+        user_info["permissions"] = permission_map(int(claims["permissions"], 16))
         data = {
             "sub": user.username,
             "user": user_info
@@ -172,8 +179,8 @@ async def create_user(
     body_dict["password"] = Hasher.get_password_hash(body.password)
 
     created_user = await UserDAO.add(session=db, **body_dict)
-    db.commit()
-    db.refresh(created_user)
+    await commit(db)
+    await refresh(db, created_user)
     # created_user.role.permissions = [access.permission for access in created_user.role.accesses]
     return created_user
 
@@ -188,8 +195,8 @@ async def get_user_list(
     if is_active is not None:
         filters["is_active"] = is_active
 
-    users = await UserDAO.get_by_attributes(session=db, filters=filters if filters else None)
-    return paginate(users)
+    query = await UserDAO.get_all(session=db, filters=filters if filters else None)
+    return await UserDAO.paginate(session=db, query=query.order_by(UserDAO.model.created_at, UserDAO.model.id))
 
 
 @users_router.get("/users/{id}", response_model=GetUser)
@@ -212,6 +219,6 @@ async def update_user(
     body_dict = body.model_dump(exclude_unset=True)
     body_dict["password"] = Hasher.get_password_hash(body.password)
     updated_user = await UserDAO.update(session=db, data=body_dict)
-    db.commit()
-    db.refresh(updated_user)
+    await commit(db)
+    await refresh(db, updated_user)
     return updated_user
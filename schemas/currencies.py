@@ -8,6 +8,7 @@ from schemas.base_model import TunedModel
 class Currencies(TunedModel):
     id: Optional[UUID] = None
     name: Optional[str] = None
+    code: Optional[str] = None
     is_active: Optional[bool] = None
     created_at: Optional[datetime]
 
@@ -20,10 +21,12 @@ class Currency(Currencies):
 
 class CreateCurrency(TunedModel):
     name: str
+    code: Optional[str] = None
     is_active: Optional[bool] = None
 
 
 class UpdateCurrency(TunedModel):
     id: UUID
     name: Optional[str] = None
+    code: Optional[str] = None
     is_active: Optional[bool] = None
@@ -0,0 +1,11 @@
+from typing import Generic, Optional, TypeVar
+
+from fastapi_pagination import Page
+
+
+T = TypeVar("T")
+
+
+class KeysetPage(Page[T], Generic[T]):
+    # keyset value of the last item; pass it back as `cursor` to get the next page without OFFSET
+    next_cursor: Optional[int] = None
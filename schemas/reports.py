@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from schemas.base_model import TunedModel
+
+
+
+class Report(TunedModel):
+    id: UUID
+    kind: str
+    status: int  # 0 - в очереди, 1 - строится, 2 - готов, 3 - ошибка
+    progress: int
+    total: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
@@ -43,9 +43,8 @@ def event_loop():
 
 @pytest.fixture(scope="session", autouse=True)
 async def run_migrations():
-    os.system('alembic init migrations')
-    os.system('alembic revision --autogenerate -m "test running migrations"')
-    os.system('alembic upgrade heads')
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    os.system(f'cd "{root}" && alembic -x db_url="{TEST_SQLALCHEMY_URL}" upgrade heads')
 
 
 @pytest.fixture(scope="session")
@@ -59,7 +58,7 @@ async def async_session_test():
 async def table_exists(session: AsyncSession, table_name: str) -> bool:
     """Check if a table exists in the database."""
     result = await session.execute(
-        f"SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = '{table_name}');"
+        text(f"SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = '{table_name}');")
     )
     return result.scalar()
 
@@ -70,14 +69,15 @@ async def clean_tables(async_session_test):
         async with session.begin():
             for table in CLEAN_TABLES:
                 if await table_exists(session, table):
-                    await session.execute(f"""TRUNCATE TABLE {table} RESTART IDENTITY CASCADE;""")
+                    await session.execute(text(f"""TRUNCATE TABLE {table} RESTART IDENTITY CASCADE;"""))
 
 
 async def _get_test_db():
+    session = test_async_session()
     try:
-        yield test_async_session()
+        yield session
     finally:
-        pass
+        await session.close()
 
 
 @pytest.fixture(scope="function")
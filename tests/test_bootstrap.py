@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event, func, select, text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.config import settings
+from models.accesses import Accesses
+from models.permission_groups import PermissionGroups
+from models.permissions import Permissions
+from models.roles import Roles
+from models.users import Users
+from utils.bootstrap import bootstrap
+from utils.permissions import permission_groups
+
+
+# Lock, checksum, groups (INSERT, SELECT), permissions, role (INSERT, SELECT),
+# accesses, admin user (EXISTS, INSERT), the checksum upsert and NOTIFY roles,
+# whatever the number of permissions.
+COLD_STATEMENTS = 12
+
+
+@pytest.fixture
+async def session(async_session_test):
+    async with async_session_test() as session:
+        await session.execute(text("TRUNCATE TABLE bootstrap_state, permission_groups, permissions, accesses, roles, users RESTART IDENTITY CASCADE"))
+        await session.commit()
+        yield session
+
+
+async def counts(session):
+    return [
+        (await session.execute(select(func.count()).select_from(model))).scalar()
+        for model in (PermissionGroups, Permissions, Roles, Accesses, Users)
+    ]
+
+
+async def run(session, groups):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        changed = await bootstrap(session=session, groups=groups)
+        await session.commit()
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+    return changed, len(statements)
+
+
+async def test_bootstrap_is_bulk_and_skips_unchanged_boots(session):
+    total = sum(len(value) for value in permission_groups.values())
+
+    changed, statements = await run(session, permission_groups)
+    assert changed is True
+    assert statements == COLD_STATEMENTS
+    assert await counts(session) == [len(permission_groups), total, 1, total, 1]
+    admin = (await session.execute(select(Users).filter(Users.username == settings.admin_role))).scalar_one()
+    role = (await session.execute(select(Roles).filter(Roles.name == settings.admin_role))).scalar_one()
+    assert admin.role_id == role.id and role.description == "Superuser"
+
+    # Тот же набор прав: только блокировка и чтение контрольной суммы
+    assert await run(session, permission_groups) == (False, 2)
+    assert await counts(session) == [len(permission_groups), total, 1, total, 1]
+
+    # Новое право: доступ администратору добавляется, существующие не дублируются
+    groups = {**permission_groups, "Отчёты": {"read": "показать отчёты"}}
+    changed, statements = await run(session, groups)
+    assert changed is True
+    assert statements == COLD_STATEMENTS - 1  # администратор уже есть: без INSERT
+    assert await counts(session) == [len(permission_groups) + 1, total + 1, 1, total + 1, 1]
+
+    # Новая подпись существующего права: то же право, как и раньше — по группе и имени
+    groups = {**groups, "Отчёты": {"read": "показать все отчёты"}}
+    assert (await run(session, groups))[0] is True
+    assert await counts(session) == [len(permission_groups) + 1, total + 1, 1, total + 1, 1]
+    action = (await session.execute(select(Permissions.action).join(PermissionGroups).filter(PermissionGroups.name == "Отчёты"))).scalar()
+    assert action == "показать отчёты"
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import delete, select, text, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from dal.dao import BudgetLedgerDAO, TransactionDAO
+from models.budget_ledger import BudgetLedger
+from models.budgets import Budgets
+from models.clients import Clients
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.payment_types import PaymentTypes
+from models.requests import Requests
+from models.roles import Roles
+from models.transactions import Transactions
+from models.users import Users
+from utils.permissions import permission_claims
+from utils.utils import create_access_token
+
+
+MARCH = date(2025, 3, 1)
+
+
+def tashkent(day: date):
+    return timezonetash.localize(datetime.combine(day, datetime.min.time()))
+
+
+async def seed(session, budget: int, sums: list):
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+    user = Users(username="admin", password="-", role=Roles(name="Администратор"))
+    department, expense_type = Departments(name="Department"), ExpenseTypes(name="Expense", purchasable=False)
+    payment_type = PaymentTypes(name="Cash")
+    session.add(Transactions(
+        budget=Budgets(department=department, expense_type=expense_type, start_date=MARCH, finish_date=date(2025, 3, 31)),
+        status=5, value=budget, is_income=True
+    ))
+    requests = []
+    for i, value in enumerate(sums):
+        request = Requests(
+            sum=value, status=0, approved=False, credit=False, checked_by_financier=True, currency="Сум",
+            payment_time=tashkent(date(2025, 3, 3 + i)), client=Clients(tg_id=100 + i, fullname="Client"),
+            user=user, department=department, expense_type=expense_type, payment_type=payment_type
+        )
+        request.transaction = [Transactions(status=0, value=-value, is_income=False)]
+        requests.append(request)
+    session.add_all(requests)
+    await session.commit()
+    return user, department, expense_type, requests
+
+
+async def test_ledger_follows_every_change_and_rebuilds(async_session_test):
+    async with async_session_test() as session:
+        user, department, expense_type, requests = await seed(session, budget=5000, sums=[1000, 700, 300])
+        first, second, third = requests
+        changes = [
+            update(Requests).where(Requests.id.in_([first.id, second.id])).values(approved=True),
+            update(Requests).where(Requests.id == second.id).values(payment_time=tashkent(date(2025, 4, 2))),
+            update(Requests).where(Requests.id == first.id).values(credit=True),
+            update(ExpenseTypes).where(ExpenseTypes.id == expense_type.id).values(purchasable=True),
+            update(Budgets).values(finish_date=date(2025, 4, 30)),
+            update(Transactions).where(Transactions.budget_id.isnot(None)).values(value=6000),
+            delete(Transactions).where(Transactions.request_id == third.id),
+        ]
+        for change in changes:
+            await session.execute(change)
+            await session.commit()
+            assert await BudgetLedgerDAO.verify(session) == [], change
+        await TransactionDAO.update_request_transaction(session=session, request_id=second.id, status=4)
+        await session.commit()
+        assert await BudgetLedgerDAO.verify(session) == []
+
+        # Бюджет растянут на апрель, вторая заявка отменена, первая в долг, третья удалена
+        assert await BudgetLedgerDAO.get_balance(session, department.id, expense_type.id, MARCH) == 6000
+        assert await BudgetLedgerDAO.get_balance(session, department.id, expense_type.id, date(2025, 4, 15)) == 6000
+
+        await session.execute(delete(BudgetLedger))
+        await session.commit()
+        assert len(await BudgetLedgerDAO.verify(session)) == 2
+        await BudgetLedgerDAO.rebuild(session)
+        await session.commit()
+        assert await BudgetLedgerDAO.verify(session) == []
+
+
+async def test_concurrent_approvals_check_the_balance_one_after_another(client, async_session_test):
+    async with async_session_test() as session:
+        user, department, expense_type, requests = await seed(session, budget=1500, sums=[1000, 1000])
+
+    token = create_access_token({
+        "sub": "admin",
+        "user": {"id": str(user.id), "role_id": str(user.role_id), **permission_claims({"Заявки": ["update", "approve"]})}
+    })
+    responses = await asyncio.gather(*[
+        client.put("/requests", json={"id": str(request.id), "approved": True}, headers={"Authorization": f"Bearer {token}"})
+        for request in requests
+    ])
+
+    # Вторая проверка ждёт commit первой и видит остаток 500
+    assert sorted(response.status_code for response in responses) == [200, 400]
+    async with async_session_test() as session:
+        assert await BudgetLedgerDAO.verify(session) == []
+        assert await BudgetLedgerDAO.get_balance(session, department.id, expense_type.id, MARCH) == 500
+        approved = (await session.execute(select(Requests.approved).order_by(Requests.approved))).scalars().all()
+        assert approved == [False, True]
+
+
+async def test_payment_just_after_tashkent_midnight_uses_its_tashkent_month(client, async_session_test):
+    async with async_session_test() as session:
+        user, department, expense_type, requests = await seed(session, budget=100, sums=[800])
+        # 00:30 1 апреля по Ташкенту — ещё 31 марта по UTC
+        payment_time = timezonetash.localize(datetime(2025, 4, 1, 0, 30))
+        await session.execute(update(Requests).values(payment_time=payment_time))
+        session.add(Transactions(
+            budget=Budgets(department_id=department.id, expense_type_id=expense_type.id, start_date=date(2025, 4, 1), finish_date=date(2025, 4, 30)),
+            status=5, value=1000, is_income=True
+        ))
+        await session.commit()
+        assert await BudgetLedgerDAO.get_balance(session, department.id, expense_type.id, payment_time) == 1000
+
+    token = create_access_token({
+        "sub": "admin",
+        "user": {"id": str(user.id), "role_id": str(user.role_id), **permission_claims({"Заявки": ["read one", "update", "approve"]})}
+    })
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.get(f"/requests/{requests[0].id}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["expense_type_budget"] == 200
+
+    response = await client.put("/requests", json={"id": str(requests[0].id), "approved": True}, headers=headers)
+    assert response.status_code == 200, response.text
@@ -0,0 +1,78 @@
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from dal.dao import BudgetDAO
+from models.budgets import Budgets
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.requests import Requests
+from models.transactions import Transactions
+
+
+async def seed(session, expense_types: int):
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+    department, other = Departments(name="Sales"), Departments(name="Office")
+    rows = []
+    for i in range(expense_types):
+        expense_type = ExpenseTypes(name=f"Expense {i}", purchasable=i % 2 == 0)
+        for start, finish in [(date(2025, 3, 1), date(2025, 3, 31)), (date(2025, 3, 1), date(2025, 3, 1))]:
+            budget = Budgets(department=department, expense_type=expense_type, start_date=start, finish_date=finish)
+            rows += [Transactions(budget=budget, status=status, value=1000 * (i + 1)) for status in (5, 5, 1)]
+        # Статусы, одобрение и кредит перебираются; заявка другого отдела не считается
+        for j, (status, approved, credit) in enumerate([(1, True, False), (6, True, False), (2, False, False), (5, True, True), (4, True, False), (6, False, False)]):
+            request = Requests(
+                sum=10, status=status, approved=approved, credit=credit, expense_type=expense_type,
+                department=department if i != j else other,
+                payment_time=timezonetash.localize(datetime(2025, 3, 1 + j * 5, 12))
+            )
+            rows.append(Transactions(request=request, status=status, value=-(10 * (j + 1) + i)))
+    session.add_all(rows)
+    await session.commit()
+    return department.id
+
+
+async def legacy_budgets(session, department_id, start_date, finish_date):
+    # Previous compute_budgets: three queries per budget
+    result = {}
+    for obj in await BudgetDAO.get_by_attributes(session=session, filters={"department_id": department_id, "start_date": start_date, "finish_date": finish_date}):
+        budget = (await BudgetDAO.get_budget_sum(session=session, budget_id=obj.id))[0] or 0
+        expense = (await BudgetDAO.get_filtered_budget_expense(session=session, department_id=department_id, expense_type_id=obj.expense_type_id, start_date=start_date, finish_date=finish_date))[0]
+        expense = -expense if expense is not None else 0
+        delayed = (await BudgetDAO.get_budget_delayed_sum(session=session, department_id=department_id, expense_type_id=obj.expense_type_id, start_date=start_date, finish_date=finish_date))[0]
+        result[obj.id] = (budget, expense, budget - expense, -delayed if delayed is not None else 0)
+    return result
+
+
+@pytest.mark.parametrize("window", [(date(2025, 3, 1), date(2025, 3, 31)), (date(2025, 3, 1), date(2025, 3, 1))])
+async def test_budget_figures_are_one_grouped_statement(async_session_test, window):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for expense_types in (2, 6):
+        async with async_session_test() as session:
+            department_id = await seed(session, expense_types)
+            expected = await legacy_budgets(session, department_id, *window)
+
+            statements.clear()
+            event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+            try:
+                rows = await BudgetDAO.get_department_budgets(session, department_id, *window)
+            finally:
+                event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+        assert {obj.id: tuple(figures) for obj, *figures in rows} == expected
+        assert any(figures[1] for figures in expected.values()) and any(figures[3] for figures in expected.values())
+        # Бюджеты, суммы, отделы и статьи одним запросом; у отделов нет руководителей
+        assert len(statements) == 1
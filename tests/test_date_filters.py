@@ -0,0 +1,77 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dal.dao import RequestDAO
+from models.requests import Requests
+
+
+DAY = date(2025, 3, 3)
+
+
+async def explain(session, query) -> str:
+    sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    plan = (await session.execute(text(f"EXPLAIN {sql}"))).scalars().all()
+    return "\n".join(plan)
+
+
+async def ids(session, query) -> set:
+    return set((await session.execute(query)).scalars().all())
+
+
+@pytest.fixture
+async def session(async_session_test):
+    # func.date() below is evaluated in the session time zone; the new filters use Tashkent midnight
+    async with async_session_test() as session:
+        await session.execute(text("SET TIME ZONE 'Asia/Tashkent'"))
+        await session.execute(text("TRUNCATE TABLE requests CASCADE"))
+        await session.execute(
+            text(
+                """
+                INSERT INTO requests (id, sum, status, payment_time, created_at)
+                SELECT gen_random_uuid(), i, 1,
+                       timestamptz '2025-01-01 00:00+05' + i * interval '17 minutes',
+                       timestamptz '2025-01-01 00:00+05' + i * interval '13 minutes'
+                FROM generate_series(1, 20000) AS i
+                """
+            )
+        )
+        await session.execute(text("ANALYZE requests"))
+        yield session
+        await session.rollback()
+
+
+@pytest.mark.parametrize(
+    "filters, payment_date, old_condition",
+    [
+        ({"payment_date": DAY}, False, func.date(Requests.payment_time) == DAY),
+        ({"created_at": DAY}, False, func.date(Requests.created_at) == DAY),
+        (
+            {"start_date": date(2025, 2, 1), "finish_date": date(2025, 2, 3)},
+            True,
+            func.date(Requests.payment_time).between(date(2025, 2, 1), date(2025, 2, 3)),
+        ),
+    ],
+)
+async def test_date_filters_use_index_and_return_same_rows(session, filters, payment_date, old_condition):
+    old_query = select(Requests.id).filter(old_condition)
+    new_query = (
+        await RequestDAO.get_all(session=session, filters=filters, payment_date=payment_date, profile=())
+    ).with_only_columns(Requests.id)
+
+    old_plan = await explain(session, old_query)
+    new_plan = await explain(session, new_query)
+
+    assert "Seq Scan on requests" in old_plan
+    assert "Seq Scan" not in new_plan
+    assert "ix_requests_" in new_plan
+
+    old_ids = await ids(session, old_query)
+    assert old_ids
+    assert await ids(session, new_query) == old_ids
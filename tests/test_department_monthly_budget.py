@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from dal.dao import DepartmentDAO
+from models.budgets import Budgets
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.requests import Requests
+from models.transactions import Transactions
+
+
+# Previous get_department_monthly_budget: correlated counts for every row of the UNION
+LEGACY_SQL = """
+    SELECT
+        EXTRACT(YEAR FROM budget_months.month_series) AS year,
+        EXTRACT(MONTH FROM budget_months.month_series) AS month,
+        value_type AS type,
+        SUM(value) AS sum,
+        (
+            SELECT COUNT(r.id) AS value
+            FROM transactions t
+            INNER JOIN requests r ON t.request_id = r.id
+            WHERE t.request_id IS NOT NULL
+            AND r.department_id = :department_id
+            AND t.status = 0
+            AND r.status = 0
+            AND EXTRACT(YEAR FROM t.created_at::DATE) = EXTRACT(YEAR FROM budget_months.month_series)
+            AND EXTRACT(MONTH FROM t.created_at::DATE) = EXTRACT(MONTH FROM budget_months.month_series)
+        ) AS pending_requests,
+        (
+            SELECT COUNT(r.id) AS value
+            FROM transactions t
+            INNER JOIN requests r ON t.request_id = r.id
+            WHERE t.request_id IS NOT NULL
+            AND r.department_id = :department_id
+            AND t.status = 6
+            AND r.status = 6
+            AND EXTRACT(YEAR FROM r.payment_time::DATE) = EXTRACT(YEAR FROM budget_months.month_series)
+            AND EXTRACT(MONTH FROM r.payment_time::DATE) = EXTRACT(MONTH FROM budget_months.month_series)
+        ) AS delayed_requests,
+        (
+            SELECT COUNT(r.id) AS value
+            FROM transactions t
+            INNER JOIN requests r ON t.request_id = r.id
+            WHERE t.request_id IS NOT NULL
+            AND r.department_id = :department_id
+            AND r.approved IS False
+            AND r.status IN (0,1,2,3)
+        ) AS not_approved_requests
+    FROM (
+            SELECT
+                generate_series(b.start_date, b.finish_date, INTERVAL '1 month') AS month_series,
+                'budget' AS value_type,
+                t.value AS value
+            FROM transactions t
+            INNER JOIN budgets b ON t.budget_id = b.id
+            WHERE t.budget_id IS NOT NULL
+            AND b.department_id = :department_id
+            AND t.status = 5
+            AND b.start_date BETWEEN :start_date AND :finish_date
+            AND b.finish_date BETWEEN :start_date AND :finish_date
+            UNION ALL
+            SELECT r.payment_time AS month_series, 'expense' AS value_type, t.value AS value
+            FROM transactions t
+            INNER JOIN requests r ON t.request_id = r.id
+            INNER JOIN expense_types e ON r.expense_type_id = e.id
+            WHERE t.request_id IS NOT NULL
+                AND r.department_id = :department_id
+                AND t.status <> 4
+                AND r.credit IS NOT True
+                AND r.payment_time::DATE BETWEEN :start_date AND :finish_date
+                AND (r.approved IS TRUE OR (r.approved IS FALSE AND e.purchasable IS TRUE))
+            UNION ALL
+            SELECT t.created_at AS month_series, 'pending' AS value_type, t.value AS value
+            FROM transactions t
+            INNER JOIN requests r ON t.request_id = r.id
+            WHERE t.request_id IS NOT NULL
+            AND r.department_id = :department_id
+            AND t.status = 0
+            AND r.status = 0
+            AND t.created_at::DATE BETWEEN :start_date AND :finish_date
+            UNION ALL
+            SELECT r.payment_time AS month_series, 'delayed' AS value_type, t.value AS value
+            FROM transactions t
+            INNER JOIN requests r ON t.request_id = r.id
+            WHERE t.request_id IS NOT NULL
+            AND r.department_id = :department_id
+            AND t.status = 6
+            AND r.status = 6
+            AND r.payment_time::DATE BETWEEN :start_date AND :finish_date
+    ) AS budget_months
+    GROUP BY year, month, value_type, pending_requests, delayed_requests, not_approved_requests
+    ORDER BY year, month, value_type;
+"""
+
+REQUESTS = 600
+
+
+def tashkent(year, month, day):
+    return timezonetash.localize(datetime(year, month, day, 12))
+
+
+async def seed(session):
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+    department, other = Departments(name="Sales"), Departments(name="Office")
+    goods, services = ExpenseTypes(name="Goods", purchasable=True), ExpenseTypes(name="Services")
+    rows = []
+    for department_ in (department, other):
+        for start, finish in [
+            (date(2025, 1, 1), date(2025, 1, 31)),
+            (date(2025, 2, 1), date(2025, 4, 30)),
+            (date(2025, 3, 1), date(2025, 3, 31)),
+            (date(2025, 6, 1), date(2025, 6, 30)),
+        ]:
+            budget = Budgets(department=department_, expense_type=goods, start_date=start, finish_date=finish)
+            rows += [Transactions(budget=budget, status=status, value=value, is_income=True) for status, value in [(5, 1000), (5, 250), (1, 99)]]
+    # Месяц создания и оплаты, статусы и одобрение перебираются по кругу
+    for i in range(REQUESTS):
+        status = [0, 1, 2, 3, 5, 6, 4][i % 7]
+        created_at = tashkent(2025, 1 + i % 5, 1 + i % 28)
+        request = Requests(
+            sum=100 + i,
+            status=status,
+            approved=i % 3 != 0,
+            credit=i % 11 == 0,
+            department=department if i % 4 else other,
+            expense_type=goods if i % 2 else services,
+            payment_time=tashkent(2025, 1 + (i + 1) % 5, 1 + (i * 7) % 28),
+            created_at=created_at
+        )
+        rows.append(Transactions(request=request, status=status, value=-(100 + i), is_income=False, created_at=created_at))
+    session.add_all(rows)
+    await session.commit()
+    return department.id
+
+
+async def test_monthly_budget_matches_the_correlated_query(async_session_test):
+    async with async_session_test() as session:
+        department_id = await seed(session)
+        # Окно с середины месяца: счётчики всё равно за весь месяц
+        params = {"department_id": department_id, "start_date": date(2025, 1, 10), "finish_date": date(2025, 4, 30)}
+
+        started = time.perf_counter()
+        legacy = (await session.execute(text(LEGACY_SQL), params)).fetchall()
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rows = await DepartmentDAO.get_department_monthly_budget(session=session, **params)
+        seconds = time.perf_counter() - started
+
+    assert {row.type for row in rows} == {"budget", "expense", "pending", "delayed"}
+    assert [tuple(row) for row in rows] == [tuple(row) for row in legacy]
+    print(f"\nmonthly budget: correlated {legacy_seconds * 1000:.1f} ms, CTE {seconds * 1000:.1f} ms, x{legacy_seconds / seconds:.1f}")
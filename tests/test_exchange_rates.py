@@ -0,0 +1,87 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.config import settings
+from dal.dao import ExchangeRateDAO
+from models.currencies import Currencies
+from utils import exchange_rates
+
+
+DAY = date(2025, 3, 3)
+
+
+class StubFetcher:
+    def __init__(self, rates):
+        self.rates = rates
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.rates
+
+
+@pytest.fixture
+async def session(async_session_test):
+    async with async_session_test() as session:
+        await session.execute(text("TRUNCATE TABLE exchange_rates, currencies CASCADE"))
+        session.add_all([Currencies(name="Сум", code="UZS"), Currencies(name="Доллар", code="USD"), Currencies(name="Лира")])
+        await session.commit()
+        exchange_rates.clear_cache()
+        yield session
+        exchange_rates.set_fetcher(exchange_rates.fetch_cbu_rates)
+        exchange_rates.clear_cache()
+
+
+async def test_rate_is_read_from_table_then_from_cache(session):
+    fetcher = StubFetcher([("USD", date(2025, 3, 1), 12900.5), ("EUR", date(2025, 3, 1), 13400.0)])
+    exchange_rates.set_fetcher(fetcher)
+    await exchange_rates.refresh_exchange_rates(session)
+    await session.commit()
+    exchange_rates.clear_cache()
+
+    # Курс на выходной день — последний известный
+    assert await exchange_rates.get_exchange_rate(session, "Доллар", DAY) == 12900.5
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        assert await exchange_rates.get_exchange_rate(session, "Доллар", DAY) == 12900.5
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+
+    assert statements == []
+    assert fetcher.calls == 1
+
+
+async def test_empty_table_fetches_once_and_unknown_currencies_return_none(session):
+    fetcher = StubFetcher([("USD", DAY, 12950.0)])
+    exchange_rates.set_fetcher(fetcher)
+
+    assert await exchange_rates.get_exchange_rate(session, "Доллар", DAY) == 12950.0
+    assert await exchange_rates.get_exchange_rate(session, "Сум", DAY) == 1.0
+    assert await exchange_rates.get_exchange_rate(session, "Лира", DAY) is None
+    assert await exchange_rates.get_exchange_rate(session, "Юань", DAY) is None
+    assert fetcher.calls == 1
+
+
+async def test_earlier_rate_is_replaced_once_the_day_rate_is_stored(session, monkeypatch):
+    await ExchangeRateDAO.add_rates(session=session, rates=[("USD", date(2025, 3, 1), 12900.5)])
+    await session.commit()
+    monkeypatch.setattr(settings, "EXCHANGE_RATE_FALLBACK_TTL", 0)
+
+    # Курс дня ещё не опубликован: пока подставляется вчерашний
+    assert await exchange_rates.get_exchange_rate(session, "Доллар", DAY) == 12900.5
+
+    # Другой воркер сохранил курс дня: кэш его подхватывает и больше не перечитывает
+    await ExchangeRateDAO.add_rates(session=session, rates=[("USD", DAY, 12960.0)])
+    await session.commit()
+    assert await exchange_rates.get_exchange_rate(session, "Доллар", DAY) == 12960.0
+    assert exchange_rates._rates[("USD", DAY)] == (12960.0, None)
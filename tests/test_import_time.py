@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# `import main` в чистом процессе: ~1.5 s и ~900 модулей на момент замера
+IMPORT_SECONDS_BUDGET = float(os.getenv("IMPORT_SECONDS_BUDGET", 3.0))
+IMPORT_MODULES_BUDGET = int(os.getenv("IMPORT_MODULES_BUDGET", 1000))
+
+# Грузятся только в коде, которому они нужны: выгрузка в Excel, планировщик, загрузка файлов
+LAZY_MODULES = ["openpyxl", "numpy", "pandas", "apscheduler", "requests", "httpx", "asyncpg", "smart_open"]
+
+PROBE = """
+import json, sys, threading, time
+started = time.perf_counter()
+import main
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "modules": len(sys.modules),
+    "threads": threading.active_count(),
+    "loaded": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (LAZY_MODULES,)
+
+
+def test_import_main_stays_within_budget():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    # Без потока планировщика: он запускается в lifespan
+    assert result["threads"] == 1
+    assert result["modules"] <= IMPORT_MODULES_BUDGET, result
+    assert result["seconds"] <= IMPORT_SECONDS_BUDGET, result
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.config import TEST_SQLALCHEMY_URL
+from models.job_runs import JobRuns
+from utils.leader import LeaderLease, record_run, SUCCEEDED, FAILED
+
+
+# Своя блокировка, чтобы не пересекаться с планировщиком приложения
+TEST_LOCK = 7201699
+
+
+@pytest.fixture
+def leases():
+    leases = [LeaderLease(db_url=TEST_SQLALCHEMY_URL, key=TEST_LOCK) for _ in range(2)]
+    yield leases
+    for lease in leases:
+        lease.release()
+
+
+def test_one_leader_and_failover(leases):
+    first, second = leases
+    assert first.is_leader()
+    assert not second.is_leader()
+    assert first.is_leader()
+
+    # Лидер ушёл штатно
+    first.release()
+    assert second.is_leader()
+    assert not first.is_leader()
+
+    # Соединение лидера оборвано: блокировка снята сервером, лидер это замечает
+    pid = second.connection.execute(text("SELECT pg_backend_pid()")).scalar()
+    with first.engine.connect() as connection:
+        connection.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+    assert first.is_leader()
+    assert not second.is_leader()
+
+
+async def test_runs_are_recorded_with_duration(leases):
+    session_maker = sessionmaker(leases[0].engine.execution_options(isolation_level="READ COMMITTED"), expire_on_commit=False)
+    with session_maker() as session:
+        session.execute(text("TRUNCATE TABLE job_runs"))
+        session.commit()
+
+    async def succeeds():
+        return "Requests due today: 3, overdue: 1"
+
+    async def fails():
+        raise RuntimeError("database is down")
+
+    await record_run(session_maker, "update_request_status", succeeds)
+    await record_run(session_maker, "update_request_status", fails)
+
+    with session_maker() as session:
+        runs = session.execute(select(JobRuns).order_by(JobRuns.started_at, JobRuns.finished_at)).scalars().all()
+    assert [(run.job, run.status, run.result) for run in runs] == [
+        ("update_request_status", SUCCEEDED, "Requests due today: 3, overdue: 1"),
+        ("update_request_status", FAILED, None),
+    ]
+    assert "database is down" in runs[1].error
+    assert all(run.duration is not None and run.duration >= 0 and run.finished_at is not None for run in runs)
@@ -0,0 +1,150 @@
+import json
+import os
+import sys
+
+import httpx
+import pytest
+from sqlalchemy import select, text, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models.notifications import Notifications
+from utils.notifications import TelegramWorker, notify, PENDING, SENT, FAILED
+
+
+class FakeTelegram:
+    """
+    Bot API stand-in: records every call and answers 429 to the chats in `flood`
+    the first time they are written to.
+    """
+    def __init__(self, flood=(), blocked=()):
+        self.flood = set(flood)
+        self.blocked = set(blocked)
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        chat_id = body["chat_id"]
+        self.calls.append((request.url.path.rsplit("/", 1)[-1], chat_id, body["text"]))
+        if chat_id in self.flood:
+            self.flood.discard(chat_id)
+            return httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 0}})
+        if chat_id in self.blocked:
+            return httpx.Response(403, json={"ok": False, "description": "Forbidden: bot was blocked by the user"})
+        return httpx.Response(200, json={"ok": True, "result": {}})
+
+
+@pytest.fixture
+async def session(async_session_test):
+    async with async_session_test() as session:
+        await session.execute(text("TRUNCATE TABLE notifications"))
+        await session.commit()
+        yield session
+
+
+async def statuses(session):
+    session.expire_all()
+    rows = (await session.execute(select(Notifications).order_by(Notifications.number))).scalars().all()
+    return [(row.chat_id, row.status, row.attempts) for row in rows]
+
+
+async def test_worker_delivers_outbox_with_retries_and_chat_order(session, async_session_test):
+    for chat_id, message in [(1, "first"), (2, "blocked"), (1, "second"), (3, "flooded"), (None, "nobody")]:
+        await notify(session=session, chat_id=chat_id, text=message)
+    await session.commit()
+
+    telegram = FakeTelegram(flood={"3"}, blocked={"2"})
+    worker = TelegramWorker(
+        session_maker=async_session_test,
+        transport=httpx.MockTransport(telegram),
+        base_url="http://telegram.test",
+        chat_interval=0
+    )
+
+    # По одному сообщению на чат за раз
+    assert await worker.run_once() == 3
+    assert await statuses(session) == [("1", SENT, 1), ("2", FAILED, 1), ("1", PENDING, 0), ("3", PENDING, 1)]
+
+    assert await worker.run_once() == 2
+    assert await statuses(session) == [("1", SENT, 1), ("2", FAILED, 1), ("1", SENT, 1), ("3", SENT, 2)]
+    assert [text for method, chat_id, text in telegram.calls if chat_id == "1"] == ["first", "second"]
+    assert await worker.run_once() == 0
+    await worker.client.aclose()
+
+
+async def test_deferred_message_holds_back_the_rest_of_its_chat(session, async_session_test):
+    for message in ["created", "approved"]:
+        await notify(session=session, chat_id=3, text=message)
+    await session.commit()
+
+    telegram = FakeTelegram(flood={"3"})
+    worker = TelegramWorker(
+        session_maker=async_session_test,
+        transport=httpx.MockTransport(telegram),
+        base_url="http://telegram.test",
+        chat_interval=0
+    )
+
+    assert await worker.run_once() == 1
+    assert await statuses(session) == [("3", PENDING, 1), ("3", PENDING, 0)]
+
+    assert await worker.run_once() == 1
+    assert await worker.run_once() == 1
+    assert await statuses(session) == [("3", SENT, 2), ("3", SENT, 1)]
+    assert [text for method, chat_id, text in telegram.calls] == ["created", "created", "approved"]
+    await worker.client.aclose()
+
+
+async def test_message_claimed_by_another_worker_holds_back_the_rest_of_its_chat(session, async_session_test):
+    for message in ["created", "approved"]:
+        await notify(session=session, chat_id=4, text=message)
+    await session.commit()
+
+    telegram = FakeTelegram()
+    worker = TelegramWorker(
+        session_maker=async_session_test,
+        transport=httpx.MockTransport(telegram),
+        base_url="http://telegram.test",
+        chat_interval=0
+    )
+
+    # Воркер другого процесса взял первое сообщение и ещё отправляет его
+    async with async_session_test() as other:
+        first = (await other.execute(
+            select(Notifications).order_by(Notifications.number).limit(1).with_for_update()
+        )).scalar_one()
+        assert first.payload["text"] == "created"
+        assert await worker.run_once() == 0
+
+    assert await worker.run_once() == 1
+    assert await worker.run_once() == 1
+    assert [text for method, chat_id, text in telegram.calls] == ["created", "approved"]
+    await worker.client.aclose()
+
+
+async def test_chat_interval_holds_across_workers(session, async_session_test):
+    for message in ["created", "approved"]:
+        await notify(session=session, chat_id=5, text=message)
+    await session.commit()
+
+    telegram = FakeTelegram()
+    # Два процесса API — два воркера с общим outbox
+    workers = [
+        TelegramWorker(
+            session_maker=async_session_test,
+            transport=httpx.MockTransport(telegram),
+            base_url="http://telegram.test",
+            chat_interval=60
+        )
+        for _ in range(2)
+    ]
+
+    assert await workers[0].run_once() == 1
+    assert await workers[1].run_once() == 0
+
+    await session.execute(update(Notifications).values(sent_at=text("sent_at - interval '1 minute'")))
+    await session.commit()
+    assert await workers[1].run_once() == 1
+    assert [text for method, chat_id, text in telegram.calls] == ["created", "approved"]
+    for worker in workers:
+        await worker.client.aclose()
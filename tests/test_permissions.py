@@ -0,0 +1,132 @@
+import os
+import sys
+
+import asyncio
+
+import pytest
+from jose import jwt
+from sqlalchemy import delete, event, select, text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.config import settings, TEST_SQLALCHEMY_URL
+from models.accesses import Accesses
+from models.permission_groups import PermissionGroups
+from models.permissions import Permissions
+from models.roles import Roles
+from models.users import Users
+from utils.bootstrap import bootstrap
+from utils.cache import listen, notify_roles, role_cache
+from utils.permissions import permission_bits, permission_claims, permission_mask, permission_groups, retired_permissions
+from utils.utils import Hasher, create_access_token
+
+
+def headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def token(user: dict) -> str:
+    return create_access_token({"sub": "user", "user": {"id": "00000000-0000-0000-0000-000000000000", **user}})
+
+
+async def test_checker_grants_any_listed_permission_of_the_group(client):
+    allowed = token(permission_claims({"Валюты": ["read_detail"], "Роли": ["read"]}))
+    # GET /currencies требует {"Валюты": ["read_list"]}, GET /roles — {"Роли": ["read"]}
+    assert (await client.get("/currencies", headers=headers(allowed))).status_code == 403
+    assert (await client.get("/roles", headers=headers(allowed))).status_code == 200
+
+    # Токены до масок несут карту прав и продолжают работать
+    legacy = token({"permissions": {"Роли": ["read"]}})
+    assert (await client.get("/roles", headers=headers(legacy))).status_code == 200
+
+    # Маска по реестру другой версии не проверяется: биты могли сдвинуться
+    outdated = token({**permission_claims({"Роли": ["read"]}), "permissions_version": "0"})
+    response = await client.get("/roles", headers=headers(outdated))
+    assert response.status_code == 401 and response.json()["detail"] == "Token is outdated"
+
+
+def test_every_permission_has_its_own_pinned_bit():
+    # Новое право без бита ничего бы не давало; общий бит дал бы лишнее
+    pairs = [(group, name) for group, names in permission_groups.items() for name in names] + retired_permissions
+    assert [pair for pair in pairs if pair not in permission_bits] == []
+    assert len(set(permission_bits.values())) == len(permission_bits)
+
+
+
+@pytest.fixture
+async def admin(async_session_test):
+    async with async_session_test() as session:
+        await session.execute(text("TRUNCATE TABLE bootstrap_state, permission_groups, permissions, accesses, roles, users RESTART IDENTITY CASCADE"))
+        await bootstrap(session=session)
+        await session.commit()
+        yield session
+
+
+@pytest.fixture
+async def listener():
+    # Без LISTEN-соединения кэш ролей ничего не хранит
+    stop = asyncio.Event()
+    task = asyncio.create_task(listen(dsn=TEST_SQLALCHEMY_URL, retry_interval=0.1, stop=stop))
+    await until(lambda: role_cache.connected)
+    yield
+    stop.set()
+    await task
+
+
+async def until(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("condition not reached")
+
+
+async def login(client) -> dict:
+    response = await client.post("/login", data={"username": settings.admin_role, "password": settings.admin_password})
+    assert response.status_code == 200
+    return jwt.decode(response.json()["access_token"], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])["user"]
+
+
+async def test_login_caches_role_permissions_until_notified(client, admin, listener):
+    everything = {group: list(names) for group, names in permission_groups.items()}
+
+    user = await login(client)
+    assert "password" not in user
+    assert int(user["permissions"], 16) == permission_mask(everything)
+    assert role_cache.roles() == [user["role_id"]]
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert int((await login(client))["permissions"], 16) == permission_mask(everything)
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+    # Пользователь одним запросом, права роли из кэша
+    assert len(statements) == 1
+
+    # То же, что PUT /roles в другом воркере: доступы меняются, NOTIFY уходит с коммитом
+    kept = select(Permissions.id).join(PermissionGroups).filter(PermissionGroups.name == "Роли", Permissions.name.in_(["read", "update"]))
+    await admin.execute(delete(Accesses).filter(Accesses.permission_id.not_in(kept)))
+    await notify_roles(admin, user["role_id"])
+    await admin.commit()
+    await until(lambda: role_cache.roles() == [])
+    assert int((await login(client))["permissions"], 16) == permission_mask({"Роли": ["read", "update"]})
+
+
+async def test_bot_token_carries_the_permission_map(client, admin):
+    role_id = (await admin.execute(select(Roles.id).filter(Roles.name == settings.admin_role))).scalar()
+    admin.add(Users(username=settings.BOT_USER, password=Hasher.get_password_hash("bot"), role_id=role_id, is_active=True))
+    await admin.commit()
+
+    response = await client.post("/login", data={"username": settings.BOT_USER, "password": "bot"})
+    assert response.status_code == 200
+    payload = jwt.decode(response.json()["access_token"], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    # Бессрочный токен не должен зависеть от номеров битов
+    assert "exp" not in payload and "permissions_version" not in payload["user"]
+    assert payload["user"]["permissions"] == {group: list(names) for group, names in permission_groups.items()}
+    assert (await client.get("/roles", headers=headers(response.json()["access_token"]))).status_code == 200
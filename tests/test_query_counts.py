@@ -0,0 +1,225 @@
+import os
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from models.accesses import Accesses
+from models.budgets import Budgets
+from models.clients import Clients
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.logs import Logs
+from models.payer_companies import PayerCompanies
+from models.payment_types import PaymentTypes
+from models.permission_groups import PermissionGroups
+from models.permissions import Permissions
+from models.requests import Requests
+from models.role_department_relations import RoleDepartments
+from models.role_expensetype_relations import RoleExpenseTypes
+from models.roles import Roles
+from models.transactions import Transactions
+from models.users import Users
+from utils.cache import invalidate_roles, scope_cache
+from utils.permissions import permission_claims
+from utils.scope import resolve_scope
+from utils.utils import create_access_token
+
+
+ACCOUNTING_PAYMENT_TYPE = uuid.UUID("88a747c1-5616-437c-ac71-a02b30287ee8")
+TRANSFER_PAYMENT_TYPE = uuid.UUID("eda54dd2-2eef-430e-ae4e-0c4d68a44298")
+
+
+# Queries per list endpoint for any number of rows: the scope lookups of the router,
+# the count, the page and one SELECT per collection in the RequestDAO loader profile.
+EXPECTED_QUERIES = {
+    "/requests?size=50": 9,
+    "/accounting?size=50": 9,
+    "/transfers?size=50": 9,
+    "/purchase?size=50": 11,
+    "/financier-checks?status=1&size=50": 9,
+    "/requests-invoices?size=50": 9,
+}
+
+
+async def seed(async_session_test, request_count: int):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+
+        group = PermissionGroups(name="Заявки")
+        permissions = [Permissions(name=action, action=action, group=group) for action in ["read", "accounting"]]
+        role = Roles(name="Администратор")
+        role.accesses = [Accesses(permission=permission) for permission in permissions]
+        user = Users(username="admin", password="-", role=role)
+        head = Clients(tg_id=1, fullname="Head")
+        departments = [Departments(name=f"Department {i}", head=head, purchasable=True) for i in range(3)]
+        expense_types = [ExpenseTypes(name=f"Expense {i}", purchasable=True, checkable=True) for i in range(3)]
+        payment_types = [
+            PaymentTypes(id=ACCOUNTING_PAYMENT_TYPE, name="Cash"),
+            PaymentTypes(id=TRANSFER_PAYMENT_TYPE, name="Transfer"),
+        ]
+        role.roles_departments = [RoleDepartments(department=department) for department in departments]
+        role.expense_types = [RoleExpenseTypes(expense_type=expense_type) for expense_type in expense_types]
+        payer = PayerCompanies(name="Payer")
+        session.add_all([role, user, payer, *payment_types])
+
+        now = datetime.now()
+        for i in range(request_count):
+            client = Clients(tg_id=100 + i, fullname=f"Client {i}")
+            request = Requests(
+                sum=1000 + i,
+                status=1,
+                approved=True,
+                purchase_approved=False,
+                checked_by_financier=False,
+                to_accounting=True,
+                to_transfer=True,
+                contract_number=f"C-{i}",
+                payment_time=now + timedelta(days=i),
+                client=client,
+                user=user,
+                department=departments[i % 3],
+                expense_type=expense_types[i % 3],
+                payment_type=payment_types[i % 2],
+                payer_company=payer,
+            )
+            request.logs = [Logs(status=0, user=user, client=client), Logs(status=1, user=user, client=client)]
+            session.add(request)
+
+        await session.commit()
+        return user
+
+
+def auth_headers(user: Users) -> dict:
+    token = create_access_token(
+        {
+            "sub": "admin",
+            "user": {
+                "id": str(user.id),
+                "role_id": str(user.role_id),
+                "permissions": {
+                    "Заявки": [
+                        "read",
+                        "accounting",
+                        "transfer",
+                        "purchase requests",
+                        "approve purchase",
+                        "checkable requests",
+                        "requests_with_receipts",
+                    ]
+                },
+            },
+        }
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def count_queries(client, url: str, headers: dict) -> int:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = await client.get(url, headers=headers)
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["items"]
+    return len(statements)
+
+
+@pytest.mark.parametrize("url", EXPECTED_QUERIES)
+async def test_list_endpoint_query_count_does_not_grow_with_page(client, async_session_test, url):
+    counts = []
+    for request_count in (2, 40):
+        headers = auth_headers(await seed(async_session_test, request_count))
+        counts.append(await count_queries(client, url, headers))
+
+    assert counts == [EXPECTED_QUERIES[url]] * 2
+
+
+async def test_role_scope_is_cached_per_role_until_invalidated(client, async_session_test):
+    user = await seed(async_session_test, 2)
+    headers = auth_headers(user)
+    # Без слушателя кэш ничего не хранит; здесь уведомления заменяет invalidate_roles
+    scope_cache.connected = True
+    try:
+        counts = [await count_queries(client, "/requests?size=50", headers) for _ in range(2)]
+        invalidate_roles(user.role_id)
+        counts.append(await count_queries(client, "/requests?size=50", headers))
+    finally:
+        scope_cache.connected = False
+        invalidate_roles()
+
+    scope = EXPECTED_QUERIES["/requests?size=50"]
+    assert counts == [scope, scope - 1, scope]
+
+
+async def test_checkable_change_reaches_cached_role_scopes(client, async_session_test):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        role, expense_type = Roles(name="Финансист"), ExpenseTypes(name="Expense", checkable=False)
+        session.add(RoleExpenseTypes(role=role, expense_type=expense_type))
+        await session.commit()
+    user = {"role_id": str(role.id)}
+    headers = {"Authorization": "Bearer " + create_access_token(
+        {"sub": "admin", "user": {"id": str(uuid.uuid4()), **permission_claims({"Типы расходов": ["update"]})}}
+    )}
+
+    scope_cache.connected = True
+    try:
+        async with async_session_test() as session:
+            assert (await resolve_scope(session, user)).checkable_expense_types == []
+
+        response = await client.put("/expense-types", json={"id": str(expense_type.id), "checkable": True}, headers=headers)
+        assert response.status_code == 200, response.text
+        async with async_session_test() as session:
+            assert (await resolve_scope(session, user)).checkable_expense_types == [expense_type.id]
+    finally:
+        scope_cache.connected = False
+        invalidate_roles()
+
+
+async def seed_departments(async_session_test, department_count: int):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        for i in range(department_count):
+            department = Departments(name=f"Department {i}", head=Clients(tg_id=1000 + i, fullname=f"Head {i}"))
+            # Бюджет за январь считается, за февраль и неутверждённый — нет
+            january = Budgets(department=department, start_date=date(2025, 1, 1), finish_date=date(2025, 1, 31))
+            february = Budgets(department=department, start_date=date(2025, 2, 1), finish_date=date(2025, 2, 28))
+            session.add_all([
+                Transactions(budget=january, status=5, value=100 * (i + 1)),
+                Transactions(budget=january, status=1, value=7),
+                Transactions(budget=february, status=5, value=9),
+            ])
+        await session.commit()
+
+
+async def test_department_list_totals_are_one_grouped_query(client, async_session_test):
+    headers = {"Authorization": "Bearer " + create_access_token(
+        {"sub": "admin", "user": {"id": str(uuid.uuid4()), "permissions": {"Отделы": ["list"]}}}
+    )}
+    url = "/departments?start_date=2025-01-01&finish_date=2025-01-31&size=50"
+    counts = []
+    for department_count in (3, 30):
+        await seed_departments(async_session_test, department_count)
+        counts.append(await count_queries(client, url, headers))
+        response = await client.get(url, headers=headers)
+        totals = sorted(department["total_budget"] for department in response.json()["items"])
+        assert totals == [100.0 * (i + 1) for i in range(department_count)]
+
+    # Роль, количество, страница с руководителями и их отделы
+    assert counts == [4, 4]
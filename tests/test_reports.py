@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from dal.dao import ReportDAO
+from models.clients import Clients
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.payment_types import PaymentTypes
+from models.reports import Reports
+from models.requests import Requests
+from models.roles import Roles
+from models.users import Users
+from utils.reports import build_report, cleanup_reports, DONE
+from utils.utils import create_access_token
+
+
+@pytest.fixture
+async def headers(async_session_test):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+
+        user = Users(username="admin", password="-", role=Roles(name="Администратор"))
+        department, expense_type = Departments(name="Department"), ExpenseTypes(name="Expense")
+        client, payment_type = Clients(tg_id=100, fullname="Client"), PaymentTypes(name="Cash")
+        session.add_all([
+            Requests(
+                sum=1000 * day,
+                status=0,
+                currency="Сум",
+                created_at=timezonetash.localize(datetime(2025, 3, day, 12)),
+                user=user,
+                client=client,
+                department=department,
+                expense_type=expense_type,
+                payment_type=payment_type
+            )
+            for day in (1, 2, 3)
+        ])
+        await session.commit()
+        token = create_access_token(
+            {"sub": "admin", "user": {"id": str(user.id), "permissions": {"Заявки": ["read"]}}}
+        )
+        yield {"Authorization": f"Bearer {token}"}
+
+
+async def test_identical_filters_share_a_job_until_it_is_built(client, async_session_test, headers):
+    body = {"start_date": "2025-03-01", "finish_date": "2025-03-31"}
+    responses = await asyncio.gather(*(client.post("/reports", json=body, headers=headers) for _ in range(3)))
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["id"] for response in responses}) == 1
+    report_id = responses[0].json()["id"]
+
+    other = await client.post("/reports", json={**body, "status": "0"}, headers=headers)
+    assert other.json()["id"] != report_id
+
+    async with async_session_test() as session:
+        claimed = await ReportDAO.claim(session=session, limit=1, stale_after=timedelta(minutes=10))
+        await session.commit()
+    assert [str(report) for report in claimed] == [report_id]
+
+    await build_report(async_session_test, report_id)
+
+    report = (await client.get(f"/reports/{report_id}", headers=headers)).json()
+    assert (report["status"], report["progress"], report["total"]) == (DONE, 3, 3)
+    download = await client.get(f"/reports/{report_id}/file", headers=headers)
+    assert download.status_code == 200 and download.content[:2] == b"PK"
+
+    # Готовый отчёт больше не активен: те же фильтры ставят новую задачу
+    again = await client.post("/reports", json=body, headers=headers)
+    assert again.json()["id"] != report_id
+
+    async with async_session_test() as session:
+        await session.execute(
+            update(Reports).where(Reports.status == DONE).values(expires_at=datetime.now(tz=timezonetash) - timedelta(hours=1))
+        )
+        await session.commit()
+        assert await cleanup_reports(session) == 1
+    assert (await client.get(f"/reports/{report_id}", headers=headers)).status_code == 404
+    assert not os.path.exists(f"files/reports/{report_id}.xlsx")
+
+
+async def test_reports_are_visible_only_to_their_user(client, async_session_test, headers):
+    async with async_session_test() as session:
+        other = Users(username="other", password="-")
+        session.add(other)
+        await session.commit()
+    other_headers = {"Authorization": "Bearer " + create_access_token(
+        {"sub": "other", "user": {"id": str(other.id), "permissions": {"Заявки": ["read"]}}}
+    )}
+
+    body = {"start_date": "2025-03-01", "finish_date": "2025-03-31"}
+    report_id = (await client.post("/reports", json=body, headers=headers)).json()["id"]
+    # Те же фильтры другого пользователя — своя задача
+    assert (await client.post("/reports", json=body, headers=other_headers)).json()["id"] != report_id
+
+    await build_report(async_session_test, report_id)
+    assert (await client.get(f"/reports/{report_id}", headers=other_headers)).status_code == 404
+    assert (await client.get(f"/reports/{report_id}/file", headers=other_headers)).status_code == 404
+    assert (await client.get(f"/reports/{report_id}/file", headers=headers)).status_code == 200
@@ -0,0 +1,76 @@
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import delete, text, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from dal.dao import RequestRollupDAO
+from models.budgets import Budgets
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.logs import Logs
+from models.requests import Requests
+from models.transactions import Transactions
+from utils.rollups import check_rollups
+
+
+FILTERS = {"start_date": date(2025, 3, 1), "finish_date": date(2025, 3, 31)}
+
+
+def moment(day, hour=12):
+    return timezonetash.localize(datetime(2025, 3, day, hour))
+
+
+@pytest.fixture
+async def session(async_session_test):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        await session.commit()
+        yield session
+
+
+async def test_rollup_follows_changes_and_matches_live_queries(session):
+    departments = [Departments(name="Sales"), Departments(name="Empty"), Departments(name="Office")]
+    expense_type = ExpenseTypes(name="Expense")
+    requests = []
+    for i in range(12):
+        request = Requests(
+            sum=1000 * (i + 1),
+            status=[0, 1, 3, 5, 5, 4][i % 6],
+            approved=[True, False, None][i % 3] if i % 6 != 3 else True,
+            currency="Доллар" if i % 4 == 0 else "Сум",
+            exchange_rate=12900 if i % 4 == 0 else None,
+            # 23:30 по Ташкенту — другой день в UTC
+            created_at=moment(1 + i, 23 if i % 5 == 0 else 12),
+            payment_time=moment(3 + i),
+            department=departments[0] if i % 2 else departments[2],
+            expense_type=expense_type
+        )
+        if request.status == 5:
+            request.logs = [Logs(status=5, created_at=moment(2 + i)), Logs(status=5, created_at=moment(5 + i))]
+        requests.append(request)
+    budget = Budgets(department=departments[0], expense_type=expense_type, start_date=date(2025, 3, 1), finish_date=date(2025, 3, 31))
+    session.add_all(departments + requests + [budget, Transactions(budget=budget, status=5, value=50000, is_income=True, created_at=moment(2))])
+    await session.commit()
+    ids = [request.id for request in requests]
+    empty_department_id = departments[1].id
+
+    assert await check_rollups(session=session, filters=FILTERS) == []
+
+    # Изменения после первого пересчёта: триггеры помечают затронутые дни
+    await session.execute(update(Requests).where(Requests.id == ids[0]).values(status=5, approved=True))
+    session.add(Logs(request_id=ids[0], status=5, created_at=moment(20)))
+    await session.execute(delete(Requests).where(Requests.id == ids[3]))
+    await session.execute(update(Requests).where(Requests.id == ids[1]).values(sum=777, department_id=empty_department_id))
+    await session.commit()
+
+    assert await check_rollups(session=session, filters=FILTERS) == []
+    metrics = await RequestRollupDAO.get_financier_metrics(session=session, filters=FILTERS)
+    assert metrics["department_metrics"]["Empty"]["total_sum"] == 777
+    assert await RequestRollupDAO.refresh(session=session) == 0
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import func, select, text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import TEST_SQLALCHEMY_URL, timezonetash
+from dal.dao import RequestRollupDAO
+from models.budgets import Budgets
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.requests import Requests
+from models.rollup_marks import RollupMarks
+from models.roles import Roles
+from models.transactions import Transactions
+from models.users import Users
+from routers import life_span
+from utils.cache import MISSING, ResultCache, listen, month_span, result_cache
+from utils.utils import create_access_token
+
+
+def test_lru_ttl_and_hit_rate():
+    cache = ResultCache(maxsize=2, ttl=60)
+    cache.connected = True
+    for name in ("a", "b", "c"):
+        cache.set(cache.key(name, {}, None), name)
+    assert cache.get(cache.key("a", {}, None)) is not None and cache.stats()["evictions"] == 1
+    assert cache.get(cache.key("b", {}, None)) == "b"
+
+    cache.ttl = -1
+    cache.set(cache.key("d", {"x": 1}, "role"), "d")
+    assert cache.get(cache.key("d", {"x": 1}, "role")) is MISSING
+    assert cache.stats()["hit_rate"] == pytest.approx(1 / 3)
+    assert month_span(date(2024, 11, 5), date(2025, 2, 1)) == {"2024-11", "2024-12", "2025-01", "2025-02"}
+
+
+async def wait_for(condition, timeout=3.0):
+    started = time.monotonic()
+    while not condition():
+        assert time.monotonic() - started < timeout, "timed out"
+        await asyncio.sleep(0.02)
+
+
+@pytest.fixture
+async def listener():
+    result_cache.invalidate()
+    stop = asyncio.Event()
+    task = asyncio.ensure_future(listen(result_cache, dsn=TEST_SQLALCHEMY_URL, stop=stop))
+    await wait_for(lambda: result_cache.connected)
+    yield result_cache
+    stop.set()
+    await task
+    assert not result_cache.connected
+
+
+async def test_writes_invalidate_matching_entries_across_connections(client, async_session_test, listener):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        user = Users(username="admin", password="-", role=Roles(name="Администратор"))
+        sales, office, expense_type = Departments(name="Sales"), Departments(name="Office"), ExpenseTypes(name="Expense")
+        budget = Budgets(department=sales, expense_type=expense_type, start_date=date(2025, 3, 1), finish_date=date(2025, 3, 31))
+        session.add_all([user, office, budget])
+        await session.commit()
+        token = create_access_token(
+            {"sub": "admin", "user": {"id": str(user.id), "role_id": str(user.role_id), "permissions": {"Бюджеты": ["read"]}}}
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+        budget_id, office_id = budget.id, office.id
+        params = {"department_id": str(sales.id), "start_date": "2025-03-01", "finish_date": "2025-03-31"}
+
+        first = await client.get("/budgets", params=params, headers=headers)
+        second = await client.get("/budgets", params=params, headers=headers)
+        assert first.json() == second.json() and first.json()[0]["value"] == 0
+        assert (listener.hits, listener.misses) == (1, 1)
+
+        listener.set(listener.key("office", {}, None), "office", departments={office.id}, months={"2025-03"})
+        listener.set(listener.key("may", {}, None), "may", departments={sales.id}, months={"2025-05"})
+
+        # Откаченная запись ничего не сбрасывает
+        session.add(Transactions(budget_id=budget_id, status=5, value=1000, is_income=True))
+        await session.rollback()
+        await asyncio.sleep(0.2)
+        assert listener.stats()["size"] == 3
+
+        session.add(Transactions(budget_id=budget_id, status=5, value=1000, is_income=True))
+        await session.commit()
+        await wait_for(lambda: listener.stats()["size"] == 2)
+
+        third = await client.get("/budgets", params=params, headers=headers)
+        assert third.json()[0]["value"] == 1000
+
+        # Заявка другого отдела — только его записи
+        session.add(Requests(sum=10, status=0, department_id=office_id, payment_time=timezonetash.localize(datetime(2025, 3, 10))))
+        await session.commit()
+        await wait_for(lambda: listener.key("office", {}, None) not in listener.entries)
+        assert listener.get(listener.key("may", {}, None)) == "may"
+        assert listener.stats()["size"] == 2
+
+
+async def test_financier_panel_only_reads_and_the_refresh_job_drops_it(client, async_session_test, listener):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        user = Users(username="admin", password="-", role=Roles(name="Администратор"))
+        session.add_all([user, Requests(
+            sum=500, status=0, department=Departments(name="Sales"),
+            created_at=timezonetash.localize(datetime(2025, 3, 10)), payment_time=timezonetash.localize(datetime(2025, 3, 12))
+        )])
+        await session.commit()
+        token = create_access_token(
+            {"sub": "admin", "user": {"id": str(user.id), "role_id": str(user.role_id), "permissions": {"Заявки": ["financier_panel"]}}}
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+        params = {"start_date": "2025-03-01", "finish_date": "2025-03-31"}
+        await wait_for(lambda: listener.stats()["size"] == 0)
+
+        # Отметки не тронуты: пересчёт — дело задачи refresh_rollups
+        before = await client.get("/financier-panel", params=params, headers=headers)
+        assert before.status_code == 200
+        assert (await session.execute(select(func.count()).select_from(RollupMarks))).scalar() > 0
+        assert listener.stats()["size"] == 1
+
+        assert await RequestRollupDAO.refresh(session=session) > 0
+        await session.commit()
+        await wait_for(lambda: listener.stats()["size"] == 0)
+
+        after = await client.get("/financier-panel", params=params, headers=headers)
+        assert after.json() != before.json()
+
+
+async def test_listener_keeps_invalidating_while_the_scheduler_loop_is_blocked(async_session_test):
+    # Синхронная сессия задачи на main_loop держит его целиком
+    blocked = asyncio.new_event_loop()
+    threading.Thread(target=blocked.run_forever, daemon=True).start()
+    blocked.call_soon_threadsafe(time.sleep, 3)
+    life_span.main_loop = blocked
+    try:
+        async with life_span.run_cache_listener(dsn=TEST_SQLALCHEMY_URL):
+            await wait_for(lambda: result_cache.connected, timeout=2)
+            key = result_cache.key("blocked", {}, None)
+            result_cache.set(key, "stale")
+            async with async_session_test() as session:
+                await session.execute(text("SELECT pg_notify('result_cache', '')"))
+                await session.commit()
+            await wait_for(lambda: key not in result_cache.entries, timeout=1)
+        assert not result_cache.connected
+    finally:
+        life_span.main_loop = None
+        blocked.call_soon_threadsafe(blocked.stop)
@@ -0,0 +1,90 @@
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from dal.dao import RequestDAO
+from models.clients import Clients
+from models.notifications import Notifications
+from models.requests import Requests
+from models.transactions import Transactions
+
+
+TODAY = date(2025, 3, 10)
+
+
+def moment(day, hour=12):
+    return timezonetash.localize(datetime(2025, 3, day, hour))
+
+
+@pytest.fixture
+async def session(async_session_test):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+        await session.commit()
+        yield session
+
+
+async def test_status_transitions_are_two_statements(session):
+    # (status, approved, payment_time, client) -> status after the job
+    cases = [
+        (1, True, moment(10), True, 2),
+        (6, True, moment(10, 0), False, 2),  # без клиента: статус меняется, уведомления нет
+        (1, True, moment(11, 0), True, 1),  # полночь следующего дня по Ташкенту
+        (1, False, moment(10), True, 1),
+        (5, True, moment(10), True, 5),
+        (2, True, moment(9, 23), True, 3),
+        (6, True, moment(1), True, 3),
+        (3, True, moment(1), True, 3),
+        (0, True, moment(1), True, 0),
+    ]
+    requests = []
+    for i, (status, approved, payment_time, has_client, _) in enumerate(cases):
+        request = Requests(
+            sum=1000,
+            status=status,
+            approved=approved,
+            currency="Сум",
+            payment_time=payment_time,
+            client=Clients(tg_id=100 + i, fullname=f"Client {i}") if has_client else None
+        )
+        request.transaction = [Transactions(status=status, value=-1000, is_income=False)]
+        requests.append(request)
+    session.add_all(requests)
+    await session.commit()
+    ids = [request.id for request in requests]
+    numbers = [request.number for request in requests]
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        due = await RequestDAO.mark_payment_due(session=session, day=TODAY)
+        overdue = await RequestDAO.mark_overdue(session=session, day=TODAY)
+        await session.commit()
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+    assert (due, overdue) == (2, 2)
+    assert len([statement for statement in statements if statement.lstrip().startswith("WITH")]) == 2
+
+    statuses = dict((await session.execute(select(Requests.id, Requests.status))).all())
+    synced = dict((await session.execute(select(Transactions.request_id, Transactions.status))).all())
+    expected = [case[-1] for case in cases]
+    assert [statuses[request_id] for request_id in ids] == expected
+    assert [synced[request_id] for request_id in ids] == expected
+
+    notifications = (await session.execute(select(Notifications).order_by(Notifications.number))).scalars().all()
+    assert [(row.chat_id, row.method, row.status, row.attempts) for row in notifications] == [("100", "sendMessage", 0, 0)]
+    assert notifications[0].payload == {"text": f"Сегодня срок оплаты вашей заявки #{numbers[0]}"}
@@ -0,0 +1,146 @@
+import os
+import sys
+import uuid
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, select, text, update
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.base import Base
+from core.config import timezonetash
+from models.budgets import Budgets
+from models.clients import Clients
+from models.departments import Departments
+from models.expense_types import ExpenseTypes
+from models.logs import Logs
+from models.notifications import Notifications
+from models.payment_types import PaymentTypes
+from models.requests import Requests
+from models.roles import Roles
+from models.transactions import Transactions
+from models.users import Users
+from utils.utils import create_access_token
+
+
+PAYMENT_DAY = date(2025, 3, 3)
+CASH_PAYMENT_TYPE = uuid.UUID("822e49f7-f54e-481e-997d-e4cb81b061e1")
+
+# Approval with a status change: the request with its detail profile (9), the locked
+# budget_ledger row, the transaction UPDATE, the flush at commit (request UPDATE, one INSERT for
+# both notifications, one for both logs) and the response reloaded with the profile (9).
+EXPECTED_STATEMENTS = 23
+EXPECTED_COMMITS = 1
+
+
+@pytest.fixture
+async def seeded(async_session_test):
+    async with async_session_test() as session:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        await session.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+
+        user = Users(username="admin", password="-", role=Roles(name="Администратор"))
+        department = Departments(name="Department")
+        expense_type = ExpenseTypes(name="Expense", purchasable=False)
+        budget = Budgets(
+            department=department,
+            expense_type=expense_type,
+            start_date=date(2025, 3, 1),
+            finish_date=date(2025, 3, 31)
+        )
+        request = Requests(
+            sum=1000,
+            status=0,
+            approved=False,
+            credit=False,
+            checked_by_financier=True,
+            currency="Сум",
+            payment_time=timezonetash.localize(datetime.combine(PAYMENT_DAY, datetime.min.time())),
+            client=Clients(tg_id=100, fullname="Client"),
+            user=user,
+            department=department,
+            expense_type=expense_type,
+            payment_type=PaymentTypes(name="Cash"),
+        )
+        request.logs = [Logs(status=0, user=user)]
+        session.add_all([request, budget, Transactions(budget=budget, status=5, value=1000000, is_income=True)])
+        await session.flush()
+        session.add(Transactions(request_id=request.id, status=0, value=-1000, is_income=False))
+        await session.commit()
+        yield request, user
+
+
+def auth_headers(user: Users) -> dict:
+    token = create_access_token(
+        {
+            "sub": "admin",
+            "user": {
+                "id": str(user.id),
+                "role_id": str(user.role_id),
+                "permissions": {"Заявки": ["update", "approve"]},
+            },
+        }
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_approval_is_one_commit_with_fixed_statement_count(client, async_session_test, seeded):
+    request, user = seeded
+    statements, commits = [], []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "commit", on_commit)
+    try:
+        response = await client.put(
+            "/requests",
+            json={"id": str(request.id), "approved": True, "status": 1},
+            headers=auth_headers(user)
+        )
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(Engine, "commit", on_commit)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["approved"] is True and body["status"] == 1
+    assert [(log["status"], log["approved"]) for log in body["logs"]] == [(0, None), (None, True), (1, None)]
+
+    assert len(commits) == EXPECTED_COMMITS
+    assert len(statements) == EXPECTED_STATEMENTS, "\n".join(" ".join(statement.split())[:120] for statement in statements)
+
+    async with async_session_test() as session:
+        transaction = (await session.execute(select(Transactions).filter_by(request_id=request.id))).scalar_one()
+        assert transaction.status == 1
+        messages = (await session.execute(select(Notifications.chat_id))).scalars().all()
+        assert messages == ["100", "100"]
+
+
+async def test_notification_text_uses_the_new_department_and_expense_type(client, async_session_test, seeded):
+    request, user = seeded
+    async with async_session_test() as session:
+        department, expense_type = Departments(name="Other department"), ExpenseTypes(name="Other expense")
+        cash = PaymentTypes(id=CASH_PAYMENT_TYPE, name="Наличные")
+        session.add_all([department, expense_type, cash])
+        await session.flush()
+        await session.execute(update(Requests).where(Requests.id == request.id).values(payment_type_id=cash.id))
+        await session.commit()
+
+    response = await client.put(
+        "/requests",
+        json={"id": str(request.id), "status": 1, "department_id": str(department.id), "expense_type_id": str(expense_type.id)},
+        headers=auth_headers(user)
+    )
+    assert response.status_code == 200, response.text
+
+    async with async_session_test() as session:
+        texts = [payload["text"] for payload in (await session.execute(select(Notifications.payload))).scalars().all()]
+    group_text = next(text for text in texts if text.startswith("📌"))
+    assert "Отдел: Other department" in group_text and "Тип затраты: Other expense" in group_text
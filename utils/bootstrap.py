@@ -0,0 +1,121 @@
+"""
+Permissions, admin role and admin user created at startup.
+
+`bootstrap` brings the database up to date with utils.permissions.permission_groups
+and the admin settings in a handful of set-based statements. Every statement is
+idempotent: groups, permissions (matched on group and name), the role and the
+user are inserted with ON CONFLICT DO NOTHING, and missing accesses with
+INSERT ... SELECT. The caller's
+transaction holds an advisory lock, so workers that boot together take turns. The
+checksum of what was created is stored in bootstrap_state. A boot with the same
+permissions and admin settings only reads the checksum and writes nothing; a boot
+that changes them drops the login permission cache of every role.
+"""
+import hashlib
+import json
+import uuid
+
+from sqlalchemy import and_, exists, func, literal, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from core.session import execute
+from utils.cache import notify_roles
+from models.accesses import Accesses
+from models.bootstrap_state import BootstrapState
+from models.permission_groups import PermissionGroups
+from models.permissions import Permissions
+from models.roles import Roles
+from models.users import Users
+from utils.permissions import permission_groups
+from utils.utils import Hasher
+
+
+BOOTSTRAP_LOCK = 7201701
+
+STATE = "permissions"
+
+
+def checksum(groups: dict = permission_groups) -> str:
+    # Пароль не входит: у существующего администратора он не меняется
+    content = json.dumps([groups, settings.admin_role], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+async def bootstrap(session, groups: dict = permission_groups) -> bool:
+    """
+    Creates what is missing; returns False when the stored checksum already matched.
+    """
+    await execute(session, text("SELECT pg_advisory_xact_lock(:key)"), {"key": BOOTSTRAP_LOCK})
+    current = checksum(groups)
+    stored = (await execute(session, select(BootstrapState.checksum).filter(BootstrapState.name == STATE))).scalar()
+    if stored == current:
+        return False
+
+    await execute(
+        session,
+        insert(PermissionGroups).values(
+            [{"id": uuid.uuid4(), "name": name, "is_active": True} for name in groups]
+        ).on_conflict_do_nothing(index_elements=[PermissionGroups.name])
+    )
+    group_ids = dict(
+        (await execute(session, select(PermissionGroups.name, PermissionGroups.id).filter(PermissionGroups.name.in_(list(groups))))).all()
+    )
+    permissions = [
+        {"id": uuid.uuid4(), "name": name, "action": action, "group_id": group_ids[group], "is_active": True}
+        for group, value in groups.items() for name, action in value.items()
+    ]
+    await execute(
+        session,
+        # Существующее право — то же имя в той же группе; его подпись (action) не меняется
+        insert(Permissions).values(permissions).on_conflict_do_nothing(index_elements=[Permissions.group_id, Permissions.name])
+    )
+
+    await execute(
+        session,
+        insert(Roles).values(
+            id=uuid.uuid4(), name=settings.admin_role, description='Superuser', is_active=True
+        ).on_conflict_do_nothing(index_elements=[Roles.name])
+    )
+    role_id = (await execute(session, select(Roles.id).filter(Roles.name == settings.admin_role))).scalar()
+
+    # У accesses нет уникального ключа на (role_id, permission_id): недостающие выбираются NOT EXISTS
+    await execute(
+        session,
+        insert(Accesses).from_select(
+            ["id", "permission_id", "role_id", "created_at"],
+            select(
+                func.gen_random_uuid(), Permissions.id, literal(role_id), func.now()
+            ).filter(
+                and_(
+                    tuple_(Permissions.group_id, Permissions.name).in_(
+                        [(permission["group_id"], permission["name"]) for permission in permissions]
+                    ),
+                    ~exists().where(and_(Accesses.role_id == role_id, Accesses.permission_id == Permissions.id))
+                )
+            )
+        )
+    )
+
+    # bcrypt считается только для нового администратора
+    if not (await execute(session, select(exists().where(Users.username == settings.admin_role)))).scalar():
+        await execute(
+            session,
+            insert(Users).values(
+                id=uuid.uuid4(),
+                username=settings.admin_role,
+                password=Hasher.get_password_hash(settings.admin_password),
+                role_id=role_id,
+                is_active=True
+            ).on_conflict_do_nothing(index_elements=[Users.username])
+        )
+
+    await execute(
+        session,
+        insert(BootstrapState).values(name=STATE, checksum=current, updated_at=func.now()).on_conflict_do_update(
+            index_elements=[BootstrapState.name],
+            set_={"checksum": current, "updated_at": func.now()}
+        )
+    )
+    await notify_roles(session)
+    return True
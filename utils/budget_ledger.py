@@ -0,0 +1,44 @@
+"""
+Maintenance of budget_ledger, the balance per department, expense type and month that
+approvals, /budget-balance and /requests/{id} read.
+
+Triggers keep the ledger in step with transactions, requests, budgets and expense
+types (migration 0010). `rebuild` sums the whole history again, for example after a
+TRUNCATE or a manual fix in psql; `verify` compares every row with the live sums and
+exits with 1 if any differ.
+
+Usage:
+    python -m utils.budget_ledger rebuild
+    python -m utils.budget_ledger verify
+"""
+import argparse
+import asyncio
+
+from dal.dao import BudgetLedgerDAO
+
+
+def main():
+    from core.session import session_maker
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+
+    with session_maker() as session:
+        if args.command == "rebuild":
+            asyncio.run(BudgetLedgerDAO.rebuild(session=session))
+            session.commit()
+            print("budget_ledger rebuilt")
+        else:
+            found = asyncio.run(BudgetLedgerDAO.verify(session=session))
+            for row in found:
+                print(
+                    f"{row.department_id} {row.month} {row.expense_type_id}: "
+                    f"budget {row.budget} != {row.live_budget}, expense {row.expense} != {row.live_expense}"
+                )
+            print("budget_ledger matches the transactions" if not found else f"{len(found)} differences")
+            raise SystemExit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
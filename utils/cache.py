@@ -0,0 +1,250 @@
+"""
+Result cache for the dashboard endpoints.
+
+Entries are keyed by endpoint, normalized filters and the role of the user, live
+for `ttl` seconds and are evicted least recently used beyond `maxsize`. Each entry
+records the departments and months (YYYY-MM, Tashkent) its result depends on,
+None meaning all of them.
+
+Writes are noticed by the database, not by the handlers: statement triggers on
+requests, transactions and budgets (migration 0007) send the touched
+(department_id, month) pairs with NOTIFY result_cache when the transaction
+commits. `listen` keeps a LISTEN connection per process and drops the matching
+entries of every uvicorn worker. Without a live LISTEN connection the cache
+serves nothing, so a worker that misses notifications never returns stale data.
+
+`role_cache` holds the compiled permission claims of each role for the login
+endpoints and `scope_cache` the departments and expense types of each role
+(utils/scope.py). Handlers that change roles send NOTIFY roles with the role id
+(empty: every role), received on the same connection.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import make_url, text
+
+from core.config import settings
+from core.session import execute
+
+
+CHANNEL = "result_cache"
+
+ROLES_CHANNEL = "roles"
+
+MISSING = object()
+
+
+def month_span(start_date: Optional[date], finish_date: Optional[date]) -> Optional[set]:
+    """
+    Months from start_date to finish_date as YYYY-MM, or None (all months) for an open range.
+    """
+    if start_date is None or finish_date is None:
+        return None
+    months = set()
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (finish_date.year, finish_date.month):
+        months.add(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class Entry:
+    __slots__ = ("value", "expires_at", "departments", "months")
+
+    def __init__(self, value, expires_at: float, departments: Optional[set], months: Optional[set]):
+        self.value = value
+        self.expires_at = expires_at
+        self.departments = departments
+        self.months = months
+
+    def depends_on(self, department_id: Optional[str], month: Optional[str]) -> bool:
+        return (
+            (self.departments is None or department_id is None or department_id in self.departments) and
+            (self.months is None or month is None or month in self.months)
+        )
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = 512, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # Уведомления приходят в потоке main_loop, запросы — в потоке API
+        self.lock = threading.Lock()
+        # Растёт с каждой инвалидацией: результат, посчитанный до неё, не сохраняется
+        self.generation = 0
+        self.connected = False
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @staticmethod
+    def key(endpoint: str, filters: dict, scope) -> tuple:
+        return endpoint, tuple(sorted((k, str(v)) for k, v in filters.items() if v is not None)), str(scope)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not self.connected or entry is None or entry.expires_at < time.monotonic():
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key, value, departments=None, months=None, generation: Optional[int] = None):
+        with self.lock:
+            if not self.connected or (generation is not None and generation != self.generation):
+                return
+            self.entries[key] = Entry(
+                value,
+                time.monotonic() + self.ttl,
+                None if departments is None else {str(department) for department in departments},
+                months
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(self, endpoint: str, filters: dict, scope, compute, departments=None, months=None):
+        """
+        Returns the cached result or awaits `compute()` and caches what it returns.
+        """
+        key = self.key(endpoint, filters, scope)
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.generation
+        value = await compute()
+        self.set(key, value, departments=departments, months=months, generation=generation)
+        return value
+
+    def invalidate(self, pairs: Optional[list] = None) -> int:
+        """
+        Drops the entries depending on any of the (department_id, month) pairs; None drops everything.
+        """
+        with self.lock:
+            self.generation += 1
+            if pairs is None:
+                keys = list(self.entries)
+            else:
+                keys = [
+                    key for key, entry in self.entries.items()
+                    if any(entry.depends_on(department_id, month) for department_id, month in pairs)
+                ]
+            for key in keys:
+                del self.entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "connected": self.connected,
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+class RoleCache(ResultCache):
+    """
+    Entries keyed by role id; invalidated by role instead of (department, month).
+    """
+    def invalidate(self, role_ids: Optional[list] = None) -> int:
+        with self.lock:
+            self.generation += 1
+            keys = list(self.entries) if role_ids is None else [key for key in map(str, role_ids) if key in self.entries]
+            for key in keys:
+                del self.entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def roles(self) -> list:
+        # Роли, для которых логину не нужен запрос прав
+        with self.lock:
+            if not self.connected:
+                return []
+            now = time.monotonic()
+            return [key for key, entry in self.entries.items() if entry.expires_at >= now]
+
+
+result_cache = ResultCache(maxsize=int(settings.RESULT_CACHE_SIZE), ttl=float(settings.RESULT_CACHE_TTL))
+
+role_cache = RoleCache(maxsize=int(settings.ROLE_CACHE_SIZE), ttl=float(settings.ROLE_CACHE_TTL))
+
+scope_cache = RoleCache(maxsize=int(settings.ROLE_CACHE_SIZE), ttl=float(settings.ROLE_CACHE_TTL))
+
+ROLE_CACHES = (role_cache, scope_cache)
+
+
+async def notify_roles(session, role_id=None):
+    """
+    Drops the role (None: every role) from the role caches of every worker once the session commits.
+    """
+    await execute(
+        session,
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": ROLES_CHANNEL, "payload": "" if role_id is None else str(role_id)}
+    )
+
+
+def on_notification(cache: ResultCache, payload: str):
+    try:
+        pairs = json.loads(payload)
+    except ValueError:
+        pairs = None
+    cache.invalidate(None if pairs is None else [tuple(pair) for pair in pairs])
+
+
+def invalidate_roles(role_id=None, caches: tuple = ROLE_CACHES):
+    for cache in caches:
+        cache.invalidate(None if role_id is None else [role_id])
+
+
+async def listen(
+        cache: ResultCache = result_cache, dsn: Optional[str] = None, retry_interval: float = 5.0,
+        stop: Optional[asyncio.Event] = None, roles: tuple = ROLE_CACHES
+):
+    """
+    Keeps a LISTEN connection open and applies invalidations to the result and role caches until `stop` is set.
+    """
+    import asyncpg
+
+    dsn = dsn or make_url(settings.DB_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(CHANNEL, lambda conn, pid, channel, payload: on_notification(cache, payload))
+            await connection.add_listener(ROLES_CHANNEL, lambda conn, pid, channel, payload: invalidate_roles(payload or None, roles))
+            # Пока соединения не было, уведомления терялись
+            cache.invalidate()
+            invalidate_roles(caches=roles)
+            for each in (cache, *roles):
+                each.connected = True
+            while not stop.is_set() and not connection.is_closed():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=retry_interval)
+                except asyncio.TimeoutError:
+                    await connection.execute("SELECT 1")
+        except Exception as e:
+            print("Result cache listener error: ", e)
+        finally:
+            for each in (cache, *roles):
+                each.connected = False
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        if not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=retry_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,118 @@
+"""
+Exchange rates of the Central Bank of Uzbekistan (cbu.uz) to sum.
+
+Rates live in the exchange_rates table, refreshed by the scheduled job in
+routers/life_span.py, and in an in-process cache keyed by (ccy, date), so
+update_request converts a sum without calling cbu.uz. A rate published for the
+requested day is cached for good; an earlier day's rate standing in for it (a
+weekend, or today before the bank publishes) only for EXCHANGE_RATE_FALLBACK_TTL
+seconds, so a worker picks up the new row the leader's job stores. The currency name stored on a
+request ("Доллар", "Евро", ...) is mapped to its ISO code by currencies.code.
+
+The fetcher is pluggable: tests install a stub with `set_fetcher`.
+"""
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from core.config import settings, timezonetash
+from core.session import execute
+from dal.dao import ExchangeRateDAO
+from models.currencies import Currencies
+
+
+CBU_URL = "https://cbu.uz/uz/arkhiv-kursov-valyut/json/"
+NATIONAL_CCY = "UZS"
+
+# fetcher() -> [(ccy, rate_date, rate), ...]
+Fetcher = Callable[[], List[Tuple[str, date, float]]]
+
+# (ccy, date) -> (rate, expires_at); expires_at None — курс этой самой даты, он не меняется
+_rates: Dict[Tuple[str, date], Tuple[float, Optional[float]]] = {}
+_currency_codes: Dict[str, Optional[str]] = {}
+
+
+def fetch_cbu_rates() -> List[Tuple[str, date, float]]:
+    import requests  # только в задаче планировщика, не при старте воркера
+
+    response = requests.get(CBU_URL, timeout=10)
+    response.raise_for_status()
+    return [
+        (item["Ccy"], datetime.strptime(item["Date"], "%d.%m.%Y").date(), float(item["Rate"]))
+        for item in response.json()
+    ]
+
+
+fetcher: Fetcher = fetch_cbu_rates
+
+
+def set_fetcher(new_fetcher: Fetcher):
+    global fetcher
+    fetcher = new_fetcher
+
+
+def clear_cache():
+    _rates.clear()
+    _currency_codes.clear()
+
+
+def today() -> date:
+    return datetime.now(timezonetash).date()
+
+
+async def get_currency_code(session, name: str) -> Optional[str]:
+    if name not in _currency_codes:
+        # Справочник маленький: при промахе перечитываем его целиком
+        rows = (await execute(session, select(Currencies.name, Currencies.code))).all()
+        _currency_codes.update({row.name: row.code for row in rows})
+    return _currency_codes.get(name)
+
+
+async def refresh_exchange_rates(session) -> int:
+    """
+    Fetches the current rates, stores the new ones and puts them into the cache.
+    The caller commits.
+    """
+    rates = await run_in_threadpool(fetcher)
+    await ExchangeRateDAO.add_rates(session=session, rates=rates)
+    for ccy, rate_date, rate in rates:
+        _rates[(ccy, rate_date)] = (rate, None)
+    return len(rates)
+
+
+async def get_exchange_rate(session, currency: str, rate_date: Optional[date] = None) -> Optional[float]:
+    """
+    Rate of the currency named `currency` to sum on `rate_date` (today by default).
+
+    Returns None when the currency has no ISO code or no rate is known; the caller
+    decides how to report it.
+    """
+    rate_date = rate_date or today()
+    ccy = await get_currency_code(session, currency)
+    if ccy is None:
+        return None
+    if ccy == NATIONAL_CCY:
+        return 1.0
+
+    key = (ccy, rate_date)
+    entry = _rates.get(key)
+    if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+        return entry[0]
+
+    row = await ExchangeRateDAO.get_rate(session=session, ccy=ccy, rate_date=rate_date)
+    if row is None:
+        # Таблица ещё пустая (первый запуск): один раз идём в ЦБ
+        try:
+            await refresh_exchange_rates(session)
+        except Exception as e:
+            print("Exchange rates error: ", e)
+            return None
+        row = await ExchangeRateDAO.get_rate(session=session, ccy=ccy, rate_date=rate_date)
+        if row is None:
+            return None
+    expires_at = None if row.rate_date == rate_date else time.monotonic() + int(settings.EXCHANGE_RATE_FALLBACK_TTL)
+    _rates[key] = (float(row.rate), expires_at)
+    return _rates[key][0]
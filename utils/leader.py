@@ -0,0 +1,121 @@
+"""
+Scheduler leadership across worker processes.
+
+Every uvicorn worker (and every container) imports routers/life_span.py and starts
+its own scheduler, but the jobs that change data run only in the leader. The
+leader holds a session-level advisory lock on a connection of its own. When the
+process dies or its connection drops (TCP keepalives detect a dead peer in about
+25 s), Postgres releases the lock, and the next worker that checks the lease takes
+it over. Followers check it every LEADER_RETRY_SECONDS, so that is the failover
+delay.
+
+`record_run` runs a job and writes it to job_runs with its duration and result.
+"""
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from core.config import settings
+from core.session import commit, close
+from dal.dao import JobRunDAO
+
+
+LEADER_LOCK = 7201601
+
+RUNNING, SUCCEEDED, FAILED = 0, 1, 2
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderLease:
+    def __init__(self, db_url: Optional[str] = None, key: int = LEADER_LOCK):
+        self.engine = create_engine(
+            db_url or settings.DB_URL,
+            poolclass=NullPool,
+            # Соединение лидера простаивает между проверками; keepalive замечает обрыв
+            connect_args={"keepalives": 1, "keepalives_idle": 10, "keepalives_interval": 5, "keepalives_count": 3},
+            isolation_level="AUTOCOMMIT"
+        )
+        self.key = key
+        self.connection = None
+        # Проверяют задачи планировщика из разных потоков
+        self.lock = threading.Lock()
+
+    def is_leader(self) -> bool:
+        """
+        True while this process holds the lease; takes it when nobody does.
+        """
+        with self.lock:
+            if self.connection is not None:
+                try:
+                    self.connection.execute(text("SELECT 1"))
+                    return True
+                except Exception as e:
+                    print("Scheduler leadership lost: ", e)
+                    self._drop()
+            try:
+                connection = self.engine.connect()
+            except Exception as e:
+                print("Scheduler leader election error: ", e)
+                return False
+            try:
+                acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+            except Exception as e:
+                print("Scheduler leader election error: ", e)
+                acquired = False
+            if not acquired:
+                connection.close()
+                return False
+            self.connection = connection
+            print(f"Scheduler leader: {worker_name()}")
+            return True
+
+    def _drop(self):
+        try:
+            self.connection.invalidate()
+        except Exception:
+            pass
+        self.connection = None
+
+    def release(self):
+        # Закрытие соединения снимает блокировку
+        with self.lock:
+            if self.connection is not None:
+                try:
+                    self.connection.close()
+                except Exception:
+                    pass
+                self.connection = None
+
+
+async def record_run(session_maker, job: str, run):
+    """
+    Awaits `run()` and records it in job_runs; what it returns is stored as the result.
+    """
+    session = session_maker()
+    try:
+        run_id = await JobRunDAO.start(session=session, job=job, worker=worker_name())
+        await commit(session)
+        started = time.perf_counter()
+        try:
+            result = await run()
+        except Exception as e:
+            print(f"Job {job} error: ", e)
+            await JobRunDAO.finish(session=session, run_id=run_id, status=FAILED, duration=time.perf_counter() - started, error=repr(e))
+        else:
+            if result is not None:
+                print(f"Job {job}: {result}")
+            await JobRunDAO.finish(
+                session=session, run_id=run_id, status=SUCCEEDED, duration=time.perf_counter() - started,
+                result=None if result is None else str(result)
+            )
+        await commit(session)
+    finally:
+        await close(session)
@@ -0,0 +1,174 @@
+"""
+Telegram notifications through an outbox.
+
+Handlers call `notify` / `notify_document` with their own session: the message is
+a row of the notifications table and is committed together with the change it is
+about, so the response never waits on Telegram and a rolled back change sends
+nothing. `TelegramWorker` delivers the rows in the background: one pooled
+httpx.AsyncClient, exponential backoff on network errors, 5xx and 429 (honouring
+retry_after) and at most one message per `chat_interval` seconds to the same chat.
+A chat's messages go out in the order they were written: a batch takes only the
+first pending message of each chat, so a message deferred by a retry, or being sent
+by the worker of another process, holds back the rest of its chat. The chat interval
+is checked against the sent_at of the chat's rows, so it holds across processes too.
+
+`settings.TELEGRAM_API_URL` or the `transport` argument of the worker point it at a
+fake Bot API server in tests.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.sql import func
+
+from core.config import settings
+from core.session import commit, rollback, close
+from dal.dao import NotificationDAO
+from models.notifications import Notifications
+
+
+PENDING, SENT, FAILED = 0, 1, 2
+
+
+def bot_token(bot: str) -> str:
+    return settings.ERROR_BOT if bot == "error" else settings.BOT_TOKEN
+
+
+async def notify(session, chat_id, text: str, keyboard: Optional[dict] = None, bot: str = "main"):
+    # Без chat_id (заявка без клиента) отправлять некому
+    if chat_id is None:
+        return None
+    payload = {"text": text}
+    if keyboard:
+        payload["reply_markup"] = keyboard
+    notification = Notifications(bot=bot, method="sendMessage", chat_id=str(chat_id), payload=payload)
+    session.add(notification)
+    return notification
+
+
+async def notify_document(session, chat_id, file_path: str):
+    if chat_id is None:
+        return None
+    notification = Notifications(method="sendDocument", chat_id=str(chat_id), payload={"file_path": file_path})
+    session.add(notification)
+    return notification
+
+
+class RetryLater(Exception):
+    def __init__(self, message, delay: Optional[float] = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+class TelegramWorker:
+    def __init__(
+            self,
+            session_maker,
+            base_url: Optional[str] = None,
+            transport: Optional["httpx.AsyncBaseTransport"] = None,
+            batch_size: int = 50,
+            poll_interval: float = 2.0,
+            max_attempts: int = 8,
+            backoff: float = 5.0,
+            chat_interval: float = 1.0,
+            concurrency: int = 10
+    ):
+        # httpx нужен только воркеру; handlers лишь пишут строки outbox
+        import httpx
+
+        self.session_maker = session_maker
+        self.client = httpx.AsyncClient(
+            base_url=base_url or settings.TELEGRAM_API_URL,
+            transport=transport,
+            timeout=httpx.Timeout(10.0, read=30.0),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        )
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.chat_interval = chat_interval
+        self._stopping = False
+
+    async def _post(self, notification: Notifications):
+        url = f"/bot{bot_token(notification.bot)}/{notification.method}"
+        if notification.method == "sendDocument":
+            with open(notification.payload["file_path"], "rb") as file:
+                return await self.client.post(url, data={"chat_id": notification.chat_id}, files={"document": file})
+        json = {"chat_id": notification.chat_id, "text": notification.payload["text"], "parse_mode": "HTML"}
+        if notification.payload.get("reply_markup"):
+            json["reply_markup"] = notification.payload["reply_markup"]
+        return await self.client.post(url, json=json)
+
+    async def _send(self, notification: Notifications):
+        import httpx
+
+        try:
+            response = await self._post(notification)
+        except httpx.HTTPError as e:
+            raise RetryLater(repr(e))
+        if response.status_code == 200:
+            return
+        if response.status_code == 429:
+            retry_after = response.json().get("parameters", {}).get("retry_after")
+            raise RetryLater(response.text, delay=retry_after)
+        if response.status_code >= 500:
+            raise RetryLater(response.text)
+        # 400/403: чат не найден, бот заблокирован — повтор не поможет
+        raise ValueError(response.text)
+
+    async def _deliver(self, notification: Notifications):
+        notification.attempts += 1
+        try:
+            await self._send(notification)
+        except RetryLater as e:
+            notification.last_error = str(e)
+            if notification.attempts >= self.max_attempts:
+                notification.status = FAILED
+            else:
+                delay = e.delay if e.delay is not None else self.backoff * 2 ** (notification.attempts - 1)
+                notification.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            return
+        except Exception as e:
+            notification.last_error = str(e)
+            notification.status = FAILED
+            return
+        notification.status = SENT
+        # Часы базы, как и now() в claim_due: воркеры разных хостов сравнивают одно время
+        notification.sent_at = func.clock_timestamp()
+
+    async def run_once(self) -> int:
+        """
+        Sends one batch of due notifications and returns how many were processed.
+        """
+        session = self.session_maker()
+        try:
+            # По одному сообщению на чат: следующее сообщение чата берётся после commit этого
+            notifications = await NotificationDAO.claim_due(
+                session=session, limit=self.batch_size, chat_interval=timedelta(seconds=self.chat_interval)
+            )
+            await asyncio.gather(*(self._deliver(notification) for notification in notifications))
+            await commit(session)
+            return len(notifications)
+        except Exception:
+            await rollback(session)
+            raise
+        finally:
+            await close(session)
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                print("Notifications worker error: ", e)
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+            elif processed < self.batch_size:
+                # Следующие сообщения тех же чатов
+                await asyncio.sleep(self.chat_interval)
+        await self.client.aclose()
+
+    def stop(self):
+        self._stopping = True
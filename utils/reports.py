@@ -0,0 +1,197 @@
+"""
+Background report jobs.
+
+POST /reports stores the filters as a row of the reports table; identical filters
+of the same user queued or running at the same time share one row (a partial
+unique index on kind + filters_hash, which covers the user). Only that user can
+poll or download the report. `ReportWorker` claims queued rows and builds each file in a
+process of a ProcessPoolExecutor, so the openpyxl work never holds the GIL of the
+API process. The builder writes progress to the row after every streamed chunk,
+saves the file under files/reports/<id>.xlsx and sets `expires_at`;
+`cleanup_reports` deletes expired rows and their files.
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import func, select
+
+from core.config import settings
+from core.session import execute, commit, rollback, close, stream
+from dal.dao import ClientDAO, ReportDAO, RequestDAO
+from schemas.requests import GenerateExcel
+from utils.utils import excel_generator
+
+
+QUEUED, RUNNING, DONE, FAILED = 0, 1, 2, 3
+
+REPORTS_DIR = "files/reports"
+
+
+def filters_hash(kind: str, filters: dict, user_id=None) -> str:
+    # Пользователь входит в ключ: чужая задача не отдаётся, даже с теми же фильтрами
+    return hashlib.sha256(json.dumps([kind, str(user_id), filters], sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def excel_filters(session, body: GenerateExcel) -> dict:
+    """
+    Turns the GenerateExcel body into RequestDAO.get_excel filters.
+    """
+    body_dict = body.model_dump(exclude_unset=True)
+    body_dict["finish_date"] = body.finish_date + timedelta(days=1)
+    filters = {k: v for k, v in body_dict.items() if v is not None}
+    if "client" in body_dict:
+        query = await ClientDAO.get_all(session=session, filters={"fullname": body.client}, profile=())
+        clients = (await execute(session, query)).scalars().all()
+        filters.pop("client", None)
+        filters["client_id"] = [client.id for client in clients]
+    return filters
+
+
+async def build_report(session_maker, report_id):
+    """
+    Builds the file of a claimed report. Works with sync and async session makers.
+    """
+    session = session_maker()
+    progress_session = session_maker()
+
+    async def progress(written):
+        await ReportDAO.set_state(session=progress_session, report_id=report_id, progress=written)
+        await commit(progress_session)
+
+    try:
+        report = (await execute(session, select(ReportDAO.model).filter_by(id=report_id))).scalar_one()
+        filters = await excel_filters(session=session, body=GenerateExcel.model_validate(report.filters))
+        query = await RequestDAO.get_excel(session=session, filters=filters)
+        total = (await execute(session, select(func.count()).select_from(query.order_by(None).subquery()))).scalar()
+        await ReportDAO.set_state(session=progress_session, report_id=report_id, total=total)
+        await commit(progress_session)
+
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        file_path = await excel_generator(
+            rows=stream(session, query),
+            file_name=os.path.join(REPORTS_DIR, f"{report_id}.xlsx"),
+            progress=progress
+        )
+        await ReportDAO.set_state(
+            session=progress_session,
+            report_id=report_id,
+            status=DONE,
+            progress=total,
+            file_path=file_path,
+            finished_at=func.now(),
+            expires_at=func.now() + timedelta(hours=int(settings.REPORT_TTL_HOURS))
+        )
+        await commit(progress_session)
+    except Exception as e:
+        await rollback(progress_session)
+        await fail_report(session=progress_session, report_id=report_id, error=repr(e))
+        raise
+    finally:
+        await close(session)
+        await close(progress_session)
+
+
+async def fail_report(session, report_id, error: str):
+    # Неудачная задача тоже удаляется по TTL, повторный запрос ставит новую
+    await ReportDAO.set_state(
+        session=session,
+        report_id=report_id,
+        status=FAILED,
+        error=error,
+        finished_at=func.now(),
+        expires_at=func.now() + timedelta(hours=int(settings.REPORT_TTL_HOURS))
+    )
+    await commit(session)
+
+
+def run_report(report_id):
+    # Точка входа процесса пула: свой engine и свой event loop
+    from core.session import session_maker
+
+    asyncio.run(build_report(session_maker, report_id))
+
+
+class ReportWorker:
+    def __init__(self, session_maker, processes: int = None, poll_interval: float = 2.0, stale_after: timedelta = timedelta(minutes=10)):
+        self.session_maker = session_maker
+        self.processes = processes or int(settings.REPORT_WORKERS)
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._pool = None
+        self._running = set()
+        self._stopping = False
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # spawn: дочерний процесс не наследует соединения пула engine родителя
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _build(self, report_id):
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.pool, run_report, report_id)
+        except Exception as e:
+            # Ошибка внутри build_report уже записана; здесь — упавший процесс пула
+            print("Report error: ", report_id, e)
+            session = self.session_maker()
+            try:
+                report = (await execute(session, select(ReportDAO.model.status).filter_by(id=report_id))).scalar()
+                if report == RUNNING:
+                    await fail_report(session=session, report_id=report_id, error=repr(e))
+            finally:
+                await close(session)
+
+    async def run_once(self) -> int:
+        """
+        Claims as many queued reports as there are free processes and starts building them.
+        """
+        free = self.processes - len(self._running)
+        if free <= 0:
+            return 0
+        session = self.session_maker()
+        try:
+            ids = await ReportDAO.claim(session=session, limit=free, stale_after=self.stale_after)
+            await commit(session)
+        except Exception:
+            await rollback(session)
+            raise
+        finally:
+            await close(session)
+        for report_id in ids:
+            task = asyncio.ensure_future(self._build(report_id))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        return len(ids)
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print("Reports worker error: ", e)
+            await asyncio.sleep(self.poll_interval)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def stop(self):
+        self._stopping = True
+
+
+async def cleanup_reports(session) -> int:
+    """
+    Deletes expired reports and their files.
+    """
+    file_paths = await ReportDAO.delete_expired(session=session)
+    await commit(session)
+    for file_path in file_paths:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+    return len(file_paths)
@@ -0,0 +1,98 @@
+"""
+Maintenance of request_rollups, the daily aggregates /financier-panel is served from.
+
+Triggers mark the days touched by changes to requests, logs and transactions;
+`RequestRollupDAO.refresh` (called by the refresh_rollups scheduler job, never by
+the panel) recomputes those days. `check_rollups` compares the panel built from the rollup with the
+live queries of RequestDAO.get_financier_metrics.
+
+Usage:
+    python -m utils.rollups rebuild
+    python -m utils.rollups check --start-date 2025-01-01 --finish-date 2025-12-31
+"""
+import argparse
+import asyncio
+import math
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from core.config import timezonetash
+from core.session import execute, commit, rollback
+from dal.dao import RequestDAO, RequestRollupDAO
+
+
+def differences(expected, actual, path: str = "") -> list:
+    """
+    Paths at which two panel results differ; numbers are compared with a small tolerance.
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        found = []
+        for key in sorted(set(expected) | set(actual), key=str):
+            if key not in expected or key not in actual:
+                found.append(f"{path}/{key}: {expected.get(key)!r} != {actual.get(key)!r}")
+            else:
+                found.extend(differences(expected[key], actual[key], f"{path}/{key}"))
+        return found
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: {len(expected)} items != {len(actual)} items"]
+        found = []
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            found.extend(differences(left, right, f"{path}[{index}]"))
+        return found
+    numbers = (int, float, Decimal)
+    if isinstance(expected, numbers) and isinstance(actual, numbers):
+        if math.isclose(float(expected), float(actual), rel_tol=1e-9, abs_tol=1e-6):
+            return []
+    elif expected == actual:
+        return []
+    return [f"{path}: {expected!r} != {actual!r}"]
+
+
+async def check_rollups(session, filters: dict) -> list:
+    """
+    Refreshes the rollup and returns the differences between the live panel and the rollup panel.
+    """
+    await RequestRollupDAO.refresh(session=session)
+    await commit(session)
+    try:
+        # Живые запросы берут func.date(...) в часовом поясе сессии, rollup — дни по Ташкенту
+        await execute(session, text(f"SET LOCAL TIME ZONE '{timezonetash.zone}'"))
+        live = await RequestDAO.get_financier_metrics(session=session, filters=filters)
+        rollup = await RequestRollupDAO.get_financier_metrics(session=session, filters=filters)
+    finally:
+        await rollback(session)
+    return differences(live, rollup)
+
+
+def main():
+    from core.session import session_maker
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "refresh", "check"])
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(date.today().year, 1, 1))
+    parser.add_argument("--finish-date", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+
+    with session_maker() as session:
+        if args.command == "rebuild":
+            asyncio.run(RequestRollupDAO.rebuild(session=session))
+            session.commit()
+            print("request_rollups rebuilt")
+        elif args.command == "refresh":
+            count = asyncio.run(RequestRollupDAO.refresh(session=session))
+            session.commit()
+            print(f"request_rollups: {count} days recomputed")
+        else:
+            filters = {"start_date": args.start_date, "finish_date": args.finish_date}
+            found = asyncio.run(check_rollups(session=session, filters=filters))
+            for difference in found:
+                print(difference)
+            print("request_rollups match the live queries" if not found else f"{len(found)} differences")
+            raise SystemExit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+What a user's role may see: its departments and expense types, and the clients of a
+/login-client token.
+
+`role_scope` is a FastAPI dependency, so it runs once per request whatever number of
+dependencies ask for it. The role part comes from one query (RoleDAO.get_scope) and
+is kept per role in utils.cache.scope_cache until PUT /roles, POST /departments or
+a change to an expense type (its checkable flag, or DELETE) send NOTIFY roles.
+Routers pass the ids to the DAO filters, which turn them into WHERE ... IN: nothing
+is filtered in Python.
+"""
+from typing import Optional
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from core.session import get_db
+from dal.dao import RoleDAO
+from utils.cache import MISSING, scope_cache
+from utils.utils import get_current_user
+
+
+class RoleScope:
+    __slots__ = ("role_id", "role_name", "departments", "expense_types", "checkable_expense_types", "clients")
+
+    def __init__(
+            self, role_id: Optional[str] = None, role_name: Optional[str] = None, departments: tuple = (),
+            expense_types: tuple = (), checkable_expense_types: tuple = (), clients: Optional[list] = None
+    ):
+        self.role_id = role_id
+        self.role_name = role_name
+        self.departments = list(departments)
+        self.expense_types = list(expense_types)
+        self.checkable_expense_types = list(checkable_expense_types)
+        self.clients = clients
+
+
+async def resolve_scope(session, user: dict) -> RoleScope:
+    role_id = user.get("role_id")
+    # В токене /login-client нет role_id: роль берётся по пользователю
+    if role_id in (None, "None"):
+        role_id = None
+    clients = user.get("clients") or None
+
+    row = scope_cache.get(role_id) if role_id is not None else MISSING
+    if row is MISSING:
+        generation = scope_cache.generation
+        row = await RoleDAO.get_scope(session=session, role_id=role_id, user_id=None if role_id else user["id"])
+        row = tuple(row) if row is not None else None
+        if row is not None:
+            scope_cache.set(str(row[0]), row, generation=generation)
+    if row is None:
+        return RoleScope(clients=clients)
+    role_id, role_name, departments, expense_types, checkable_expense_types = row
+    return RoleScope(str(role_id), role_name, departments, expense_types, checkable_expense_types, clients)
+
+
+async def role_scope(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)) -> RoleScope:
+    return await resolve_scope(db, current_user)
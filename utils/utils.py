@@ -1,10 +1,7 @@
-import json
 from datetime import datetime, timedelta
 from typing import Optional
-import pandas as pd
 import string
 import random
-import requests
 from fastapi import Depends, HTTPException, status, Security
 from fastapi.security import OAuth2PasswordBearer, HTTPBasicCredentials, HTTPBasic
 from jose import JWTError, jwt
@@ -15,8 +12,10 @@ from starlette import status
 import os
 from passlib.context import CryptContext
 from core.config import settings
-from core.session import get_db
+from core.session import get_db, session_maker
 from dal.dao import UserDAO
+from models.notifications import Notifications
+from utils.permissions import permission_mask, permissions_version
 
 
 
@@ -82,9 +81,7 @@ async def get_current_user(token: str = Depends(reuseable_oauth), session: Async
         # if username == settings.BOT_USER:
         #     # print("user is entering",settings.BOT_USER)
         #     return user
-        if expire_datetime is None:
-            return user
-        else:
+        if expire_datetime is not None:
             if datetime.fromtimestamp(expire_datetime) < datetime.now():
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,27 +99,34 @@ async def get_current_user(token: str = Depends(reuseable_oauth), session: Async
     if user is None:
         raise CREDENTIALS_EXCEPTION
 
+    user["permission_mask"] = token_permission_mask(user)
     return user
 
 
+def token_permission_mask(user: dict) -> int:
+    permissions = user.get("permissions")
+    # Токены до масок (в т.ч. бессрочный токен бота) несут карту прав: собираем маску из неё
+    if isinstance(permissions, dict):
+        return permission_mask(permissions)
+    if user.get("permissions_version") != permissions_version or not isinstance(permissions, str):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Token is outdated',
+            headers={'WWW-Authenticate': 'Bearer'},
+        )
+    return int(permissions, 16)
+
 
 class PermissionChecker:
 
     def __init__(self, required_permissions: dict):
         self.required_permissions = required_permissions
+        # Достаточно любого из перечисленных прав первой группы; маска считается один раз на эндпоинт
+        permission_group, required = next(iter(required_permissions.items()))
+        self.required_mask = permission_mask({permission_group: required})
 
     def __call__(self, user: dict = Depends(get_current_user)) -> dict:
-        # permissions = user['permissions']
-        # key, value = next(iter(self.required_permissions.items()))
-        # permissions = permissions.get(key)
-        # need_permissions = list(set(value) & set(permissions)) if permissions else None
-
-        user_permissions = user['permissions']
-        permission_group, required_permissions = next(iter(self.required_permissions.items()))
-        user_permissions = user_permissions.get(permission_group, None)
-        # need_permissions = set(required_permissions).issubset(user_permissions) if user_permissions else None
-        need_permissions = set(required_permissions).intersection(user_permissions) if user_permissions else None
-        if not need_permissions:
+        if not user["permission_mask"] & self.required_mask:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You do not have permission to use this api",
@@ -153,55 +157,6 @@ async def get_me(token: str = Depends(reuseable_oauth), session: Session = Depen
     return user_obj
 
 
-def send_telegram_message(chat_id, message_text, keyboard: Optional[dict] = None):
-    # Create the request payload
-    payload = {
-        "chat_id": chat_id,
-        "text": message_text,
-        "parse_mode": "HTML"
-    }
-    if keyboard:
-        payload['reply_markup'] = json.dumps(keyboard)
-
-    # Send the request to send the inline keyboard message
-    response = requests.post(
-        url=f"https://api.telegram.org/bot{settings.BOT_TOKEN}/sendMessage",
-        json=payload
-    )
-    # Check the response status
-    if response.status_code == 200:
-        return response
-    else:
-        print("Response text: ", response.text)
-        return None
-
-
-def send_telegram_document(chat_id, file_path):
-    # Open the file in binary mode
-    with open(file_path, "rb") as file:
-        # Prepare data and files
-        data = {
-            "chat_id": chat_id
-            # "caption": message_text  # Text message
-        }
-        files = {"document": file}  # Sending as a document
-
-        # Send POST request
-        response = requests.post(
-            url=f"https://api.telegram.org/bot{settings.BOT_TOKEN}/sendDocument",
-            data=data,
-            files=files
-        )
-    # Check the response status
-    if response.status_code == 200:
-        return response
-    else:
-        print("Response text: ", response.text)
-        return None
-
-
-
-
 def generate_random_string(length=10):
     characters = string.ascii_letters + string.digits  # A-Z, a-z, 0-9
     return ''.join(random.choices(characters, k=length))
@@ -209,23 +164,12 @@ def generate_random_string(length=10):
 
 
 def error_sender(error_message):
-    payload = {
-        "chat_id": settings.ERROR_GROUP,
-        "text": error_message,
-        "parse_mode": "HTML"
-    }
-
-    # Send the request to send the inline keyboard message
-    response = requests.post(
-        url=f"https://api.telegram.org/bot{settings.ERROR_BOT}/sendMessage",
-        json=payload
-    )
-    # Check the response status
-    if response.status_code == 200:
-        return response
-    else:
-        print("Response text: ", response.text)
-        return None
+    # Пишет в outbox отдельной сессией: у вызывающих (загрузка файлов) своей сессии нет
+    with session_maker() as session:
+        session.add(
+            Notifications(bot="error", method="sendMessage", chat_id=str(settings.ERROR_GROUP), payload={"text": error_message})
+        )
+        session.commit()
 
 
 status_data = {
@@ -243,55 +187,71 @@ approved_data = {
     None: "Не задано"
 }
 
-def excel_generator(data):
-    columns = {
-        "Номер заявки": [],
-        "Номер приходной": [],
-        "Дата запроса": [],
-        "Отдел": [],
-        "Одобрено": [],
-        "Кредит": [],
-        "Комментария": [],
-        "Тип расхода": [],
-        "Заказчик": [],
-        "Закупщик": [],
-        "Поставщик": [],
-        "Сумма": [],
-        "Валюта": [],
-        "Курс валюты": [],
-        "Запрошенная валюта": [],
-        "Тип оплаты": [],
-        "Дата оплаты": [],
-        "Статус": []
-    }
-    for row in data:
-        columns["Номер заявки"].append(row.number)
-        columns["Номер приходной"].append(row.acceptance_number)
-        columns["Дата запроса"].append(row.created_at.strftime("%d-%m-%Y"))
-        columns["Отдел"].append(row.department.name)
-        columns["Одобрено"].append(approved_data[row.approved])
-        columns["Кредит"].append(approved_data[row.credit])
-        columns["Комментария"].append(row.description)
-        columns["Тип расхода"].append(row.expense_type.name)
-        columns["Заказчик"].append(row.client.fullname)
-        columns["Закупщик"].append(row.buyer)
-        columns["Поставщик"].append(row.supplier)
-        columns["Сумма"].append(row.sum)
-        columns["Валюта"].append(row.currency)
-        # print("Request number: ", row.number, "Sum: ", row.sum)
-        if row.exchange_rate is not None:
-            columns["Курс валюты"].append(row.exchange_rate)
-            columns["Запрошенная валюта"].append(row.sum / row.exchange_rate)
-        else:
-            columns["Курс валюты"].append(" ")
-            columns["Запрошенная валюта"].append(row.sum)
-        columns["Тип оплаты"].append(row.payment_type.name)
-        columns["Дата оплаты"].append(row.payment_time.strftime("%d-%m-%Y")) if row.payment_time else columns["Дата оплаты"].append(" ")
-        columns['Статус'].append(status_data[row.status])
-
-    file_name = f"files/Finance orders от {datetime.now().strftime('%d.%m.%Y')}.xlsx"
-    df = pd.DataFrame(columns)
-    # Generate Excel file
-    df.to_excel(file_name, index=False)
+excel_columns = [
+    "Номер заявки",
+    "Номер приходной",
+    "Дата запроса",
+    "Отдел",
+    "Одобрено",
+    "Кредит",
+    "Комментария",
+    "Тип расхода",
+    "Заказчик",
+    "Закупщик",
+    "Поставщик",
+    "Сумма",
+    "Валюта",
+    "Курс валюты",
+    "Запрошенная валюта",
+    "Тип оплаты",
+    "Дата оплаты",
+    "Статус"
+]
+
+
+async def excel_generator(rows, file_name: Optional[str] = None, progress=None):
+    """
+    Writes the rows of RequestDAO.get_excel, as chunks from core.session.stream, to an .xlsx file.
+
+    The write-only workbook serializes each row as it is appended, so memory does not
+    grow with the number of rows. `progress`, if given, is awaited with the number of
+    rows written after each chunk.
+    """
+    # openpyxl (и numpy через него) грузится только для выгрузки, не при старте воркера
+    from openpyxl import Workbook
+
+    if file_name is None:
+        # Суффикс: две выгрузки за один день не перезаписывают друг друга
+        file_name = f"files/Finance orders от {datetime.now().strftime('%d.%m.%Y')} {generate_random_string(6)}.xlsx"
+    written = 0
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(excel_columns)
+    async for partition in rows:
+        for row in partition:
+            sheet.append([
+                row.number,
+                row.acceptance_number,
+                row.created_at.strftime("%d-%m-%Y"),
+                row.department,
+                approved_data[row.approved],
+                approved_data[row.credit],
+                row.description,
+                row.expense_type,
+                row.client,
+                row.buyer,
+                row.supplier,
+                row.sum,
+                row.currency,
+                row.exchange_rate if row.exchange_rate is not None else " ",
+                row.sum / row.exchange_rate if row.exchange_rate is not None else row.sum,
+                row.payment_type,
+                row.payment_time.strftime("%d-%m-%Y") if row.payment_time else " ",
+                status_data[row.status]
+            ])
+        written += len(partition)
+        if progress is not None:
+            await progress(written)
+    workbook.save(file_name)
     return file_name
 